@@ -0,0 +1,4 @@
+"""
+性能基准脚本
+在 backend 目录下以模块方式运行，例如：python -m benchmarks.knowledge_base_benchmark
+"""
@@ -0,0 +1,128 @@
+"""
+套餐项目调整耗时基准
+对比旧实现（每个移除项目一次查询、每个添加项目两次查询，最后重新加载全部项目计算总价）
+与当前的集合操作实现在不同调整数量下的 SQL 次数和耗时
+
+用法（在 backend 目录下）：
+    python -m benchmarks.adjust_items_benchmark [--changes 1,5,10,25,50] [--rounds 20]
+默认使用临时 SQLite 文件，可通过 DATABASE_URL 指定已建表的数据库
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'adjust_benchmark.db')}")
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import selectinload
+
+from models import Base, ExaminationItem, PackageItem, RecommendedPackage, User
+from services.recommendation_service import adjust_recommended_items
+from utils.database import AsyncSessionLocal, SessionLocal, async_engine, engine
+
+CATALOGUE_SIZE = 200
+BASE_ITEMS = 20
+
+
+async def legacy_adjust_recommended_items(db, package_id, add_items=None, remove_items=None):
+    """
+    旧实现：逐个项目查询、添加、删除
+    """
+    package = await db.get(RecommendedPackage, package_id)
+    for item_id in remove_items or []:
+        result = await db.execute(select(PackageItem).where(
+            PackageItem.package_id == package_id, PackageItem.item_id == item_id
+        ))
+        package_item = result.scalars().first()
+        if package_item:
+            await db.delete(package_item)
+    for item_id in add_items or []:
+        item = await db.get(ExaminationItem, item_id)
+        result = await db.execute(select(PackageItem).where(
+            PackageItem.package_id == package_id, PackageItem.item_id == item_id
+        ))
+        if not result.scalars().first():
+            db.add(PackageItem(package_id=package_id, item_id=item_id, item_name=item.name, item_price=item.price))
+    await db.flush()
+    result = await db.execute(select(PackageItem).where(PackageItem.package_id == package_id))
+    package.total_price = sum(item.item_price for item in result.scalars().all())
+    await db.commit()
+    result = await db.execute(
+        select(RecommendedPackage)
+        .options(selectinload(RecommendedPackage.package_items))
+        .where(RecommendedPackage.id == package_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().one()
+
+
+def setup():
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        if db.scalar(select(User.id).limit(1)) is None:
+            db.add(User(username="benchmark", email="benchmark@example.com", password_hash="x"))
+        if db.scalar(select(ExaminationItem.id).limit(1)) is None:
+            db.add_all(
+                ExaminationItem(name=f"体检项目{index}", category="检验科", price=50.0 + index, is_active=True)
+                for index in range(CATALOGUE_SIZE)
+            )
+        db.commit()
+        user_id = db.scalar(select(User.id).limit(1))
+        item_ids = list(db.scalars(select(ExaminationItem.id).order_by(ExaminationItem.id).limit(CATALOGUE_SIZE)))
+    return user_id, item_ids
+
+
+def create_package(user_id, item_ids):
+    with SessionLocal() as db:
+        package = RecommendedPackage(
+            user_id=user_id, name="基准套餐", total_price=0.0,
+            package_items=[PackageItem(item_id=item_id, item_name="", item_price=1.0) for item_id in item_ids[:BASE_ITEMS]]
+        )
+        db.add(package)
+        db.commit()
+        return package.id
+
+
+async def measure(adjust, user_id, item_ids, changes, rounds):
+    statements = 0
+
+    def count(*args):
+        nonlocal statements
+        statements += 1
+
+    remove = item_ids[:changes // 2]
+    add = item_ids[BASE_ITEMS:BASE_ITEMS + changes - len(remove)]
+    elapsed = 0.0
+    for _ in range(rounds):
+        package_id = create_package(user_id, item_ids)
+        event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+        try:
+            start = time.perf_counter()
+            async with AsyncSessionLocal() as db:
+                await adjust(db, package_id, add, remove)
+            elapsed += time.perf_counter() - start
+        finally:
+            event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+    return statements / rounds, elapsed / rounds
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="套餐项目调整耗时基准")
+    parser.add_argument("--changes", default="1,5,10,25,50", help="每次调整的项目数（逗号分隔）")
+    parser.add_argument("--rounds", type=int, default=20, help="每种调整数量的重复次数")
+    args = parser.parse_args()
+
+    user_id, item_ids = setup()
+    print(f"{'调整数':>6} {'旧实现SQL':>10} {'旧实现毫秒':>10} {'集合SQL':>8} {'集合毫秒':>8}")
+    for changes in (int(value) for value in args.changes.split(",")):
+        legacy_statements, legacy_elapsed = await measure(
+            legacy_adjust_recommended_items, user_id, item_ids, changes, args.rounds
+        )
+        statements, elapsed = await measure(adjust_recommended_items, user_id, item_ids, changes, args.rounds)
+        print(f"{changes:>6} {legacy_statements:>10.0f} {legacy_elapsed * 1e3:>10.2f} {statements:>8.0f} {elapsed * 1e3:>8.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
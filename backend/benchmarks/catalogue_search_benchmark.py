@@ -0,0 +1,82 @@
+"""
+体检项目检索耗时基准
+在不同规模的合成目录上统计 n-gram 索引的构建耗时和单次检索（含高亮）耗时，
+并与旧的名称子串扫描对比
+
+用法（在 backend 目录下）：
+    python -m benchmarks.catalogue_search_benchmark [--sizes 1000,5000,20000] [--rounds 200]
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from models import ExaminationItem
+from services.catalogue_service import CatalogueItem, CatalogueSnapshot
+
+BASE_ITEMS = [
+    ("血常规", "检验科", "检查红细胞、白细胞、血小板等血液指标"),
+    ("肝功能", "检验科", "检查转氨酶、胆红素等肝脏功能指标"),
+    ("肾功能", "检验科", "检查肌酐、尿素氮等肾脏功能指标"),
+    ("血脂四项", "检验科", "总胆固醇、甘油三酯、高密度及低密度脂蛋白"),
+    ("糖化血红蛋白", "检验科", "反映近三个月平均血糖水平"),
+    ("心电图", "功能科", "检查心律、心肌缺血等心脏电活动"),
+    ("心脏彩超", "超声科", "观察心脏结构和功能"),
+    ("腹部B超", "超声科", "检查肝、胆、胰、脾、肾"),
+    ("胸部CT", "放射科", "筛查肺结节、肺部炎症"),
+    ("头颅MRI", "放射科", "检查脑部结构病变"),
+    ("甲状腺彩超", "超声科", "筛查甲状腺结节"),
+    ("胃镜", "内镜中心", "检查食管、胃、十二指肠黏膜"),
+]
+QUERIES = ["血常规", "肝", "心脏", "CT", "甲状腺结节", "肺部", "血糖水平", "超声 肾"]
+
+
+def build_snapshot(size):
+    items = []
+    for index in range(size):
+        name, category, description = BASE_ITEMS[index % len(BASE_ITEMS)]
+        suffix = index // len(BASE_ITEMS)
+        items.append(CatalogueItem(ExaminationItem(
+            id=index + 1, name=f"{name}{suffix or ''}", category=category,
+            description=description, price=100.0, duration=10, is_active=True
+        )))
+    return CatalogueSnapshot(items, (size, None))
+
+
+def legacy_search(snapshot, keyword, limit=50):
+    keyword = keyword.lower()
+    return [item for item in snapshot.active_items if keyword in item.name.lower()][:limit]
+
+
+def timed(func, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for query in QUERIES:
+            func(query)
+    return (time.perf_counter() - start) / (rounds * len(QUERIES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="体检项目检索耗时基准")
+    parser.add_argument("--sizes", default="1000,5000,20000", help="目录规模（逗号分隔）")
+    parser.add_argument("--rounds", type=int, default=200, help="查询集重复次数")
+    args = parser.parse_args()
+
+    print(f"{'项目数':>8} {'构建毫秒':>10} {'检索毫秒':>10} {'子串扫描毫秒':>12}")
+    for size in (int(value) for value in args.sizes.split(",")):
+        start = time.perf_counter()
+        snapshot = build_snapshot(size)
+        build_ms = (time.perf_counter() - start) * 1e3
+        search_ms = timed(lambda query: snapshot.search_hits(keyword=query, limit=20), args.rounds) * 1e3
+        legacy_ms = timed(lambda query: legacy_search(snapshot, query, 20), args.rounds) * 1e3
+        print(f"{size:>8} {build_ms:>10.1f} {search_ms:>10.3f} {legacy_ms:>12.3f}")
+
+    snapshot = build_snapshot(len(BASE_ITEMS))
+    for query in QUERIES[:4]:
+        hits = snapshot.search_hits(keyword=query, limit=3)
+        print(f"  {query} -> " + "; ".join(f"{hit.item.name}({hit.score}) {hit.highlights}" for hit in hits))
+
+
+if __name__ == "__main__":
+    main()
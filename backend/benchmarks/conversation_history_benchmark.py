@@ -0,0 +1,93 @@
+"""
+对话历史导出内存与首字节耗时基准
+对不同长度的对话历史，比较旧接口（.all() 后组装整个列表并序列化）与流式导出的
+峰值内存（tracemalloc）、首行耗时和总耗时
+
+用法（在 backend 目录下）：
+    python -m benchmarks.conversation_history_benchmark [--turns 1000,10000,50000]
+默认使用临时 SQLite 文件，可通过 DATABASE_URL 指定已建表的数据库
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'conversation_benchmark.db')}")
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import insert
+
+from models import Base, User
+from models.user_profile import ConversationHistory
+from services.conversation_history_service import HISTORY_FIELDS, iter_conversation_history
+from utils.database import SessionLocal, engine
+
+RESPONSE_DATA = {"reply": "请问您最近是否有头痛、头晕等不适症状？" * 5, "options": ["有", "没有", "偶尔"], "step": 3}
+
+
+def create_user(turns):
+    with SessionLocal() as db:
+        user = User(username=f"conversation_benchmark_{turns}", email=f"conversation_{turns}@example.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        start = datetime(2024, 1, 1)
+        for first in range(0, turns, 5000):
+            db.execute(insert(ConversationHistory), [
+                {
+                    "user_id": user.id, "message": f"第{index}条消息", "sender": "user" if index % 2 else "ai",
+                    "main_step": "symptoms", "sub_step": index % 5, "extracted_entities": {"symptom": "头痛"},
+                    "response_data": RESPONSE_DATA, "created_at": start + timedelta(seconds=index)
+                }
+                for index in range(first, min(first + 5000, turns))
+            ])
+        db.commit()
+        return user.id
+
+
+def legacy_export(user_id):
+    # 旧接口：加载全部 ORM 对象，组装字典列表后整体序列化
+    with SessionLocal() as db:
+        conversations = db.query(ConversationHistory).filter(
+            ConversationHistory.user_id == user_id
+        ).order_by(ConversationHistory.created_at).all()
+        history = [{name: getattr(conv, name) for name in HISTORY_FIELDS} for conv in conversations]
+        yield json.dumps(jsonable_encoder({"history": history}), ensure_ascii=False)
+
+
+def measure(lines):
+    tracemalloc.start()
+    start = time.perf_counter()
+    first_line = None
+    size = 0
+    for line in lines:
+        if first_line is None:
+            first_line = time.perf_counter() - start
+        size += len(line)
+    total = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return first_line, total, peak / 1024 / 1024, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对话历史导出内存与首字节耗时基准")
+    parser.add_argument("--turns", default="1000,10000,50000", help="对话条数（逗号分隔）")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine)
+    print(f"{'条数':>7} {'方式':>6} {'首行毫秒':>8} {'总毫秒':>8} {'峰值MB':>7}")
+    for turns in (int(value) for value in args.turns.split(",")):
+        user_id = create_user(turns)
+        for label, lines in (
+            ("旧接口", legacy_export(user_id)),
+            ("流式", iter_conversation_history(user_id, list(HISTORY_FIELDS))),
+        ):
+            first_line, total, peak, _ = measure(lines)
+            print(f"{turns:>7} {label:>6} {first_line * 1e3:>8.1f} {total * 1e3:>8.1f} {peak:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
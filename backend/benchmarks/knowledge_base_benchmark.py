@@ -0,0 +1,136 @@
+"""
+知识库服务单轮对话耗时基准
+对比旧实现（每次查询全表拼接正则、ILIKE 查询并解析 JSON、追问时重复抽取症状）
+与当前实现（内存索引 + 请求内输入分析复用）在一次症状追问轮次中的耗时和 SQL 次数
+
+用法（在 backend 目录下）：
+    python -m benchmarks.knowledge_base_benchmark [--turns 2000] [--symptoms 200]
+默认使用内存 SQLite，可通过 DATABASE_URL 指定已初始化症状知识库的数据库
+"""
+import argparse
+import json
+import os
+import re
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import event
+
+from benchmarks.nlu_benchmark import legacy_knowledge_base_slots
+from models import Base
+from models.user_profile import SymptomKnowledge
+from services.knowledge_base_service import KnowledgeBaseService
+from utils.database import engine, SessionLocal
+
+BASE_SYMPTOMS = ["头晕", "胃部不适", "头痛", "失眠", "乏力", "胸闷", "心悸", "关节疼痛", "肌肉疼痛", "皮肤瘙痒"]
+
+UTTERANCES = [
+    ("头痛", "最近经常头痛，有点严重，大概3天了"),
+    ("胸闷", "偶尔胸闷，晚上比较明显"),
+    ("失眠", "一直失眠，每天只能睡四五个小时"),
+    ("头晕", "没有了"),
+]
+
+
+def seed(db, symptom_count: int) -> None:
+    """
+    写入测试用症状知识（JSON 字段按建表脚本的方式存为字符串）
+    """
+    Base.metadata.create_all(engine)
+    if db.query(SymptomKnowledge).count():
+        return
+    for i in range(symptom_count):
+        name = BASE_SYMPTOMS[i] if i < len(BASE_SYMPTOMS) else f"症状{i:04d}"
+        db.add(SymptomKnowledge(
+            symptom=name,
+            description=f"{name}的说明",
+            follow_up_questions=json.dumps([
+                {"question": f"{name}多久出现一次？", "key": "frequency"},
+                {"question": f"{name}持续多久了？", "key": "duration"},
+                {"question": f"{name}严重吗？", "key": "severity"},
+                {"question": f"{name}在什么情况下出现？", "key": "trigger"},
+            ], ensure_ascii=False),
+            related_symptoms=json.dumps(BASE_SYMPTOMS[:3], ensure_ascii=False)
+        ))
+    db.commit()
+
+
+class LegacyKnowledgeBase:
+    """
+    旧实现的等价逻辑，仅用于对比
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def get_symptom_knowledge(self, symptom):
+        knowledge = self.db.query(SymptomKnowledge).filter(SymptomKnowledge.symptom.ilike(f"%{symptom}%")).first()
+        if not knowledge:
+            return None
+        return {
+            "symptom": knowledge.symptom,
+            "follow_up_questions": json.loads(knowledge.follow_up_questions) if knowledge.follow_up_questions else [],
+            "related_symptoms": json.loads(knowledge.related_symptoms) if knowledge.related_symptoms else [],
+        }
+
+    def extract_symptom_entities(self, text):
+        keywords = [row[0] for row in self.db.query(SymptomKnowledge.symptom).all()]
+        pattern = r'(' + '|'.join(keywords) + r')'
+        return [match.group(0) for match in re.finditer(pattern, text, re.IGNORECASE)]
+
+    def turn(self, symptom, text):
+        legacy_knowledge_base_slots(text)
+        knowledge = self.get_symptom_knowledge(symptom)
+        self.extract_symptom_entities(text)
+        self.get_symptom_knowledge(symptom)
+        return knowledge
+
+
+def current_turn(db, symptom, text):
+    # 与 UserProfileService 一致：每个请求创建一个知识库服务实例
+    kb = KnowledgeBaseService(db)
+    collected = kb.process_symptom_response(symptom, text, {"symptom": symptom})
+    kb.generate_follow_up_questions(symptom, text)
+    kb.should_continue_ai_subflow(symptom, collected)
+    kb.extract_symptom_entities(text)
+
+
+def run(label, turn, turns, statements):
+    statements[0] = 0
+    start = time.perf_counter()
+    for i in range(turns):
+        symptom, text = UTTERANCES[i % len(UTTERANCES)]
+        turn(symptom, text)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<8} 每轮 {elapsed / turns * 1e6:9.1f} 微秒   每轮 SQL {statements[0] / turns:5.2f} 条")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="知识库服务单轮对话耗时基准")
+    parser.add_argument("--turns", type=int, default=2000, help="模拟的对话轮数")
+    parser.add_argument("--symptoms", type=int, default=200, help="症状知识条数（仅空库时写入）")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    seed(db, args.symptoms)
+
+    statements = [0]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_statements(*_):
+        statements[0] += 1
+
+    legacy = LegacyKnowledgeBase(db)
+    # 预热：构建内存索引
+    current_turn(db, *UTTERANCES[0])
+
+    before = run("旧实现", legacy.turn, args.turns, statements)
+    after = run("当前实现", lambda symptom, text: current_turn(db, symptom, text), args.turns, statements)
+    print(f"加速比 {before / after:.1f}x")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
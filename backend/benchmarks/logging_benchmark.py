@@ -0,0 +1,65 @@
+"""
+日志调用耗时基准
+比较同步 FileHandler（旧实现）与队列日志管道下单次 logger.info 在调用方线程中的耗时
+
+用法（在 backend 目录下）：
+    python -m benchmarks.logging_benchmark [--records 20000]
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from utils.logger import LOG_FORMAT, logging_pipeline, setup_logger
+
+
+def timed(logger, records):
+    latencies = []
+    for index in range(records):
+        start = time.perf_counter()
+        logger.info("基准日志 %d: 用户ID=%d, 数量=%d", index, index % 1000, index % 50)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return (
+        sum(latencies) / records * 1e6,
+        latencies[int(records * 0.99)] * 1e6,
+        latencies[-1] * 1e6,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="日志调用耗时基准")
+    parser.add_argument("--records", type=int, default=20000, help="日志条数")
+    args = parser.parse_args()
+
+    # 旧实现：记录器直接挂载同步 FileHandler，不向上传递
+    legacy = logging.getLogger("benchmark.legacy")
+    legacy.propagate = False
+    legacy.setLevel(logging.INFO)
+    file_handler = logging.FileHandler(os.path.join(tempfile.mkdtemp(), "legacy.log"), encoding="utf-8")
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    legacy.addHandler(file_handler)
+
+    # 队列管道只测调用方耗时，控制台输出会拖慢写入线程，暂时移除
+    queued = setup_logger("benchmark.queued")
+    listener_handlers = logging_pipeline.listener.handlers
+    logging_pipeline.listener.handlers = tuple(
+        handler for handler in listener_handlers if isinstance(handler, logging.FileHandler)
+    )
+
+    print(f"{'方式':>6} {'平均微秒':>8} {'P99微秒':>8} {'最大微秒':>10}")
+    for label, logger in (("同步文件", legacy), ("队列", queued)):
+        average, p99, worst = timed(logger, args.records)
+        print(f"{label:>6} {average:>8.1f} {p99:>8.1f} {worst:>10.1f}")
+
+    logging_pipeline.stop()
+    logging_pipeline.listener = None
+    file_handler.close()
+    print(f"队列状态: {logging_pipeline.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+NLU 实体抽取耗时基准
+对比旧实现（用户画像流程每次调用时构建正则表，知识库服务另有一套频率/持续时间/程度抽取，
+两个流程各自扫描输入）与共享的规则引擎（规则启动时编译，一次扫描得到全部槽位）
+
+用法（在 backend 目录下）：
+    python -m benchmarks.nlu_benchmark [--rounds 2000] [--rules core/ai/nlu_rules.json]
+"""
+import argparse
+import re
+import time
+
+from core.ai.nlu_engine import DEFAULT_RULES_PATH, NLURuleEngine
+
+CORPUS = [
+    "最近经常头痛，有点严重，大概3天了",
+    "偶尔胸闷，晚上比较明显",
+    "一直失眠，每天只能睡四五个小时",
+    "没有了",
+    "我最近总是头晕，特别是早上起床的时候",
+    "胃痛有两周了，饭后更厉害",
+    "这几天乏力，稍微走几步就累",
+    "很少运动，工作压力比较大",
+    "有时候会心悸，持续几分钟",
+    "近半个月天天失眠，非常难受",
+    "头痛不太严重，一般下午出现",
+    "最近身体不适，具体说不上来",
+    "没有其他症状",
+    "经常加班熬夜，这段时间胃不舒服",
+    "头晕伴随耳鸣，已经3个月了",
+    "剧烈头痛，持续了2天",
+    "每周都会胸闷一两次",
+    "从不吸烟，偶尔喝酒",
+    "no more",
+    "最近疼痛频繁，几年前也有过",
+]
+
+
+def legacy_portrait_entities(text):
+    """
+    旧的用户画像流程抽取（每次调用构建症状正则和频率、程度正则表）
+    """
+    entities = {}
+    matched_symptom = None
+    for symptom in ["头晕", "头痛", "胃痛", "胸闷", "乏力", "失眠"]:
+        if symptom in text:
+            matched_symptom = symptom
+            break
+    if not matched_symptom:
+        match = re.compile(r'最近\w*(头晕|头痛|胃痛|胸闷|乏力|失眠|不适|难受|疼痛|异常)\w*').search(text)
+        if match:
+            matched_symptom = match.group(1)
+    entities["symptom"] = matched_symptom
+    frequency_patterns = {
+        "经常": re.compile(r'经常|频繁|总是|常常'),
+        "偶尔": re.compile(r'偶尔|有时|时不时'),
+        "持续": re.compile(r'持续|一直|不断'),
+        "最近": re.compile(r'最近|近\w*天|这几天')
+    }
+    for frequency, pattern in frequency_patterns.items():
+        if pattern.search(text):
+            entities["frequency"] = frequency
+            break
+    severity_patterns = {
+        "严重": re.compile(r'严重|很|非常|厉害'),
+        "中等": re.compile(r'一般|中等|有点'),
+        "轻微": re.compile(r'轻微|稍微|不太')
+    }
+    for severity, pattern in severity_patterns.items():
+        if pattern.search(text):
+            entities["severity"] = severity
+            break
+    return entities
+
+
+def legacy_knowledge_base_slots(text):
+    """
+    旧的知识库服务抽取（频率、持续时间、程度、没有补充各扫描一遍）
+    """
+    slots = {}
+    for keyword in ["经常", "总是", "偶尔", "有时", "很少", "从不", "每天", "每周", "每月"]:
+        if keyword in text:
+            slots["frequency"] = keyword
+            break
+    for pattern in [r'(\d+天)', r'(\d+周)', r'(\d+月)', r'(\d+年)', r'(几天)', r'(几周)', r'(几个月)',
+                    r'(几年)', r'(最近)', r'(这段时间)', r'(一直)']:
+        match = re.search(pattern, text)
+        if match:
+            slots["duration"] = match.group(0)
+            break
+    for keyword in ["轻微", "轻度", "中度", "严重", "剧烈", "非常", "特别", "有点"]:
+        if keyword in text:
+            slots["severity"] = keyword
+            break
+    slots["no_more"] = any(keyword in text for keyword in ["没有", "没有了", "no more"])
+    return slots
+
+
+def legacy_turn(text):
+    # 旧实现中两个流程各自抽取
+    legacy_portrait_entities(text)
+    legacy_knowledge_base_slots(text)
+
+
+def engine_turn(engine, text):
+    result = engine.parse(text)
+    result.value("symptom")
+    result.value("frequency")
+    result.value("duration")
+    result.value("severity")
+    result.has("no_more")
+
+
+def run(label, turn, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in CORPUS:
+            turn(text)
+    elapsed = time.perf_counter() - start
+    per_utterance = elapsed / (rounds * len(CORPUS))
+    print(f"{label:<8} 每条 {per_utterance * 1e6:8.2f} 微秒")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NLU 实体抽取耗时基准")
+    parser.add_argument("--rounds", type=int, default=2000, help="语料重复轮数")
+    parser.add_argument("--rules", default=DEFAULT_RULES_PATH, help="规则文件路径")
+    args = parser.parse_args()
+
+    build_start = time.perf_counter()
+    engine = NLURuleEngine.from_file(args.rules)
+    print(f"规则编译耗时 {(time.perf_counter() - build_start) * 1e3:.2f} 毫秒（启动时一次）")
+
+    for text in CORPUS[:5]:
+        print(f"  {text} -> {engine.parse(text).to_entities()}")
+
+    before = run("旧实现", legacy_turn, args.rounds)
+    after = run("规则引擎", lambda text: engine_turn(engine, text), args.rounds)
+    print(f"加速比 {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+列表分页耗时基准
+对一个有大量预约的用户，比较偏移量分页与游标分页在不同页码下的单页查询耗时
+
+用法（在 backend 目录下）：
+    python -m benchmarks.pagination_benchmark [--rows 100000] [--pages 1,10,100,1000] [--limit 50] [--rounds 20]
+默认使用临时 SQLite 文件，可通过 DATABASE_URL 指定已建表的数据库
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'pagination_benchmark.db')}")
+
+from sqlalchemy import insert, select
+
+from models import Appointment, Base, User
+from services.appointment_service import get_user_appointments
+from utils.database import AsyncSessionLocal, SessionLocal, engine
+
+
+def setup(rows):
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        user_id = db.scalar(select(User.id).where(User.username == "pagination_benchmark"))
+        if user_id is None:
+            user = User(username="pagination_benchmark", email="pagination_benchmark@example.com", password_hash="x")
+            db.add(user)
+            db.flush()
+            user_id = user.id
+            start = datetime(2020, 1, 1)
+            db.execute(insert(Appointment), [
+                {
+                    "user_id": user_id, "examination_center_id": 1, "appointment_date": start,
+                    "appointment_time": "09:00", "created_at": start + timedelta(seconds=index // 2)
+                }
+                for index in range(rows)
+            ])
+        db.commit()
+    return user_id
+
+
+async def cursor_for_page(db, user_id, page, limit):
+    # 逐页翻到目标页，取得该页的游标
+    cursor = None
+    for _ in range(page):
+        cursor = (await get_user_appointments(db, user_id, limit=limit, cursor=cursor)).next_cursor
+    return cursor
+
+
+async def timed(coroutine_factory, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await coroutine_factory()
+    return (time.perf_counter() - start) / rounds
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="列表分页耗时基准")
+    parser.add_argument("--rows", type=int, default=100000, help="用户的预约数")
+    parser.add_argument("--pages", default="1,10,100,1000", help="测量的页码（逗号分隔）")
+    parser.add_argument("--limit", type=int, default=50, help="每页记录数")
+    parser.add_argument("--rounds", type=int, default=20, help="每个页码的重复次数")
+    args = parser.parse_args()
+
+    user_id = setup(args.rows)
+    print(f"{'页码':>6} {'偏移量毫秒':>10} {'游标毫秒':>8}")
+    async with AsyncSessionLocal() as db:
+        for page in (int(value) for value in args.pages.split(",")):
+            if page * args.limit >= args.rows:
+                continue
+            cursor = await cursor_for_page(db, user_id, page, args.limit)
+            offset_elapsed = await timed(
+                lambda: get_user_appointments(db, user_id, limit=args.limit, offset=page * args.limit), args.rounds
+            )
+            cursor_elapsed = await timed(
+                lambda: get_user_appointments(db, user_id, limit=args.limit, cursor=cursor), args.rounds
+            )
+            print(f"{page:>6} {offset_elapsed * 1e3:>10.2f} {cursor_elapsed * 1e3:>8.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+"""
+登录吞吐基准
+在不同 bcrypt 成本和工作线程数下，通过密码哈希工作池并发执行登录时的密码校验，
+统计每秒登录数和单次登录耗时（含排队），用于按登录 SLO 和 CPU 核数选择 PASSWORD_HASH_BCRYPT_ROUNDS
+
+用法（在 backend 目录下）：
+    python -m benchmarks.password_hashing_benchmark [--costs 10,11,12,13] [--workers 1,4] [--logins 32]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from utils.password_hashing import PasswordHashingPool, PasswordHashPolicy
+
+PASSWORD = "Benchmark#2024"
+
+
+async def measure(policy, workers, logins):
+    hashed = policy.hash(PASSWORD)
+    pool = PasswordHashingPool(workers, max_queue=logins)
+    latencies = []
+
+    async def login():
+        start = time.perf_counter()
+        assert await pool.run(policy.verify, PASSWORD, hashed)
+        latencies.append(time.perf_counter() - start)
+
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(logins)))
+        elapsed = time.perf_counter() - start
+    finally:
+        pool.shutdown()
+    latencies.sort()
+    return (
+        logins / elapsed,
+        statistics.median(latencies) * 1e3,
+        latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1e3,
+        pool.metrics.hash_latency.snapshot()["avg_ms"],
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="登录吞吐基准")
+    parser.add_argument("--costs", default="10,11,12,13", help="bcrypt 成本（逗号分隔）")
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}", help="工作线程数（逗号分隔）")
+    parser.add_argument("--logins", type=int, default=32, help="每组并发登录数")
+    args = parser.parse_args()
+
+    print(f"CPU 核数: {os.cpu_count()}")
+    print(f"{'成本':>4} {'线程':>4} {'登录/秒':>8} {'P50毫秒':>8} {'P95毫秒':>8} {'单次哈希毫秒':>12}")
+    for cost in (int(value) for value in args.costs.split(",")):
+        policy = PasswordHashPolicy("bcrypt", cost)
+        for workers in sorted({int(value) for value in args.workers.split(",")}):
+            throughput, p50, p95, hash_ms = await measure(policy, workers, args.logins)
+            print(f"{cost:>4} {workers:>4} {throughput:>8.1f} {p50:>8.1f} {p95:>8.1f} {hash_ms:>12.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
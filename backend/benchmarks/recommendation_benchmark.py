@@ -0,0 +1,90 @@
+"""
+推荐引擎打分耗时基准
+使用合成目录（项目名称取自常见体检项目）和一组画像，统计单个画像的打分与选套餐耗时，以及批量打分的吞吐
+
+用法（在 backend 目录下）：
+    python -m benchmarks.recommendation_benchmark [--items 2000] [--rounds 500]
+"""
+import argparse
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from core.ai.recommendation_engine import RecommendationEngine
+
+ITEM_NAMES = [
+    ("血常规", "检验科"), ("尿常规", "检验科"), ("肝功能", "检验科"), ("肾功能", "检验科"),
+    ("血脂四项", "检验科"), ("空腹血糖", "检验科"), ("糖化血红蛋白", "检验科"), ("甲状腺功能", "检验科"),
+    ("肿瘤标志物CEA", "检验科"), ("甲胎蛋白AFP", "检验科"), ("前列腺特异抗原PSA", "检验科"),
+    ("心电图", "功能科"), ("心脏彩超", "超声科"), ("颈动脉彩超", "超声科"), ("腹部B超", "超声科"),
+    ("乳腺彩超", "超声科"), ("妇科检查", "妇科"), ("宫颈TCT", "妇科"), ("胸部CT", "放射科"),
+    ("低剂量螺旋CT", "放射科"), ("头颅MRI", "放射科"), ("骨密度", "放射科"), ("眼底检查", "眼科"),
+    ("碳13呼气试验", "检验科"), ("胃镜", "内镜中心"), ("肺功能", "功能科"), ("一般检查", "一般检查"),
+]
+
+PORTRAITS = [
+    {"basic_info": {"age": 35, "gender": "女"}, "health_risk": "低风险", "lifestyle": {}, "symptoms": []},
+    {"basic_info": {"age": "52.0", "gender": "男"}, "health_risk": "高风险",
+     "lifestyle": {"smoking": "经常吸烟", "drinking": "偶尔饮酒", "exercise": "很少"},
+     "health_history": ["高血压"], "symptoms": [{"symptom": "胸闷"}, {"symptom": "头晕"}]},
+    {"basic_info": {"age": 64, "gender": "女"}, "health_risk": "中风险",
+     "health_history": {"chronic_diseases": ["糖尿病"], "family_medical_history": ["胃癌"]},
+     "focus_areas": [{"area_name": "消化系统", "reason": "经常胃痛", "priority": "高"}]},
+]
+
+
+def build_items(count):
+    items = []
+    for index in range(count):
+        name, category = ITEM_NAMES[index % len(ITEM_NAMES)]
+        items.append(SimpleNamespace(
+            id=index + 1,
+            name=f"{name}{index // len(ITEM_NAMES) or ''}",
+            category=category,
+            description=None,
+            price=float(30 + (index * 37) % 600),
+        ))
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description="推荐引擎打分耗时基准")
+    parser.add_argument("--items", type=int, default=2000, help="目录项目数")
+    parser.add_argument("--rounds", type=int, default=500, help="每个画像的重复次数")
+    parser.add_argument("--batch", type=int, default=1000, help="批量打分的画像数")
+    args = parser.parse_args()
+
+    build_start = time.perf_counter()
+    engine = RecommendationEngine(build_items(args.items), version="benchmark")
+    print(f"引擎构建耗时 {(time.perf_counter() - build_start) * 1e3:.2f} 毫秒（每个目录版本一次），项目数 {args.items}")
+
+    for portrait in PORTRAITS:
+        plans = engine.recommend(portrait)
+        print(f"  {portrait['basic_info']} -> " + "; ".join(
+            f"{plan.name} {plan.total_price:.0f}元 {len(plan.items)}项" for plan in plans
+        ))
+
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        for portrait in PORTRAITS:
+            engine.score(portrait)
+    per_score = (time.perf_counter() - start) / (args.rounds * len(PORTRAITS))
+
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        for portrait in PORTRAITS:
+            engine.recommend(portrait)
+    per_recommend = (time.perf_counter() - start) / (args.rounds * len(PORTRAITS))
+    print(f"打分     每个画像 {per_score * 1e3:8.3f} 毫秒")
+    print(f"打分+选套餐 每个画像 {per_recommend * 1e3:8.3f} 毫秒")
+
+    features = np.stack([engine.featurize(PORTRAITS[index % len(PORTRAITS)]) for index in range(args.batch)])
+    start = time.perf_counter()
+    engine.score_features(features)
+    elapsed = time.perf_counter() - start
+    print(f"批量打分 {args.batch} 个画像 {elapsed * 1e3:.2f} 毫秒（每个 {elapsed / args.batch * 1e6:.1f} 微秒）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+规则式 NLU 引擎
+用户画像问卷（UserPortraitFlowService）和智能交互（KnowledgeBaseService）共用的实体抽取：
+症状、频率、持续时间、程度以及“没有其他补充”。
+
+规则来自 JSON 规则文件（默认 core/ai/nlu_rules.json，可通过 NLU_RULES_PATH 指定），
+在应用启动时加载并编译一次：
+- 所有槽位的关键词合并为一个 Aho-Corasick 自动机
+- 所有正则规则合并为一个前瞻正则（每个位置都尝试匹配，允许与关键词及其他位置的匹配重叠）
+每条输入只需自动机和组合正则各扫描一遍，即可得到全部槽位的候选；同一槽位按规则优先级取值。
+"""
+import json
+import logging
+import os
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from utils import config
+from utils.aho_corasick import AhoCorasick, fold_case
+
+logger = logging.getLogger("app.core.nlu")
+
+# 默认规则文件
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nlu_rules.json")
+
+
+class NLUMatch(NamedTuple):
+    """
+    单个槽位候选
+    """
+    slot: str
+    value: str
+    text: str
+    start: int
+    end: int
+    priority: int  # 规则在槽位中的序号，越小越优先
+
+
+class NLUResult:
+    """
+    单条输入的抽取结果
+    """
+
+    __slots__ = ("text", "matches")
+
+    def __init__(self, text: str, matches: List[NLUMatch]):
+        self.text = text
+        self.matches = matches
+
+    def get(self, slot: str, start: Optional[int] = None, end: Optional[int] = None) -> Optional[NLUMatch]:
+        """
+        获取槽位的最佳候选
+        :param slot: 槽位名
+        :param start: 只考虑从该位置之后开始的候选（可选）
+        :param end: 只考虑在该位置之前结束的候选（可选）
+        :return: 优先级最高的候选（同优先级取最靠前的），没有时返回 None
+        """
+        best = None
+        # 候选通常只有几个，直接遍历比预先排序、分组更快
+        for match in self.matches:
+            if match.slot != slot:
+                continue
+            if (start is not None and match.start < start) or (end is not None and match.end > end):
+                continue
+            if best is None or (match.priority, match.start) < (best.priority, best.start):
+                best = match
+        return best
+
+    def value(self, slot: str, start: Optional[int] = None, end: Optional[int] = None) -> Optional[str]:
+        """
+        获取槽位的取值
+        :return: 最佳候选的取值，没有时返回 None
+        """
+        match = self.get(slot, start, end)
+        return match.value if match else None
+
+    def has(self, slot: str) -> bool:
+        return any(match.slot == slot for match in self.matches)
+
+    def to_entities(self) -> Dict[str, str]:
+        """
+        转换为 {槽位: 取值} 字典（只包含有候选的槽位）
+        """
+        slots = dict.fromkeys(match.slot for match in self.matches)
+        return {slot: self.get(slot).value for slot in slots}
+
+
+class NLURuleEngine:
+    """
+    编译后的规则引擎
+    构建后只读，可在多线程间共享
+    """
+
+    def __init__(self, rules: Dict[str, Any]):
+        """
+        :param rules: 规则定义，格式见 nlu_rules.json（正则规则中不能使用命名分组）
+        """
+        self.version = rules.get("version")
+        self.slots: List[str] = list(rules.get("slots", {}))
+        # 关键词 -> [(槽位, 取值, 优先级)]，同一关键词可属于多个槽位（如“一直”既是频率也是持续时间）
+        self._keyword_outputs: Dict[str, List[Tuple[str, Optional[str], int]]] = {}
+        pattern_rules = []
+        alternatives = []
+
+        for slot, slot_rules in rules.get("slots", {}).items():
+            for priority, rule in enumerate(slot_rules):
+                value = rule.get("value")
+                for keyword in rule.get("keywords", ()):
+                    self._keyword_outputs.setdefault(fold_case(keyword), []).append((slot, value, priority))
+                for pattern in rule.get("patterns", ()):
+                    group_name = f"r{len(pattern_rules)}"
+                    alternatives.append(f"(?P<{group_name}>{pattern})")
+                    pattern_rules.append((group_name, slot, value, rule.get("value_group"), priority))
+
+        self.matcher = AhoCorasick(self._keyword_outputs)
+        # 零宽前瞻使 finditer 在每个位置都尝试一次，正则之间、正则与关键词之间的重叠都能保留
+        self.pattern = re.compile(f"(?=(?:{'|'.join(alternatives)}))", re.IGNORECASE) if alternatives else None
+        # 规则分组编号 -> (槽位, 取值, 取值分组编号, 优先级)
+        # 规则分组包含自身的子分组，最后闭合的总是规则分组，可直接用 lastindex 定位命中的规则
+        self._pattern_outputs: Dict[int, Tuple[str, Optional[str], Optional[int], int]] = {}
+        for group_name, slot, value, value_group, priority in pattern_rules:
+            index = self.pattern.groupindex[group_name]
+            self._pattern_outputs[index] = (slot, value, index + value_group if value_group else None, priority)
+
+    @classmethod
+    def from_file(cls, path: str) -> "NLURuleEngine":
+        """
+        从 JSON 规则文件构建引擎
+        :param path: 规则文件路径
+        :return: 规则引擎
+        """
+        with open(path, encoding="utf-8") as rules_file:
+            rules = json.load(rules_file)
+        engine = cls(rules)
+        logger.info(
+            f"NLU 规则已加载: 文件={path}, 版本={engine.version}, "
+            f"关键词={len(engine.matcher)}, 正则={len(engine._pattern_outputs)}"
+        )
+        return engine
+
+    def parse(self, text: str) -> NLUResult:
+        """
+        抽取输入中的全部槽位候选
+        :param text: 用户输入
+        :return: 抽取结果
+        """
+        matches: List[NLUMatch] = []
+        if not text:
+            return NLUResult(text, matches)
+
+        keyword_outputs = self._keyword_outputs
+        for start, end, keyword in self.matcher.iter_matches(text):
+            matched = text[start:end]
+            for slot, value, priority in keyword_outputs[keyword]:
+                matches.append(NLUMatch(slot, value if value is not None else matched, matched, start, end, priority))
+
+        if self.pattern is not None:
+            pattern_outputs = self._pattern_outputs
+            for lookahead in self.pattern.finditer(text):
+                index = lookahead.lastindex
+                slot, value, value_group, priority = pattern_outputs[index]
+                start, end = lookahead.span(index)
+                matched = text[start:end]
+                if value_group:
+                    value = lookahead.group(value_group)
+                matches.append(NLUMatch(slot, value if value is not None else matched, matched, start, end, priority))
+
+        return NLUResult(text, matches)
+
+
+# 当前进程的规则引擎，应用启动时加载
+_engine: Optional[NLURuleEngine] = None
+
+
+def load_nlu_engine(path: Optional[str] = None) -> NLURuleEngine:
+    """
+    加载（或重新加载）规则文件并替换当前引擎
+    :param path: 规则文件路径，默认使用 NLU_RULES_PATH 或内置规则文件
+    :return: 新的规则引擎
+    """
+    global _engine
+    # 新引擎构建完成后整体替换，正在使用旧引擎的请求不受影响
+    engine = NLURuleEngine.from_file(path or config.NLU_RULES_PATH or DEFAULT_RULES_PATH)
+    _engine = engine
+    return engine
+
+
+def get_nlu_engine() -> NLURuleEngine:
+    """
+    获取规则引擎，未加载时（如脚本中使用）首次调用时加载
+    :return: 规则引擎
+    """
+    engine = _engine
+    if engine is None:
+        engine = load_nlu_engine()
+    return engine
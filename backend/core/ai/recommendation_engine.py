@@ -0,0 +1,453 @@
+"""
+体检项目推荐引擎
+由用户画像（年龄、性别、风险等级、生活习惯、健康史、症状、重点关注）构建特征向量，
+通过“画像特征 x 项目标签”的权重矩阵一次性为目录中的全部体检项目打分，再按分数在预算内挑选套餐项目。
+
+- 项目标签矩阵（项目数 x 标签数）按目录版本构建一次并复用
+- 打分为两次矩阵乘法：项目分 = 项目标签矩阵 @ (权重矩阵^T @ 用户特征)，批量打分同理
+- 排序使用 (分数降序, 项目ID升序)，同一画像与目录版本的结果完全确定，可直接缓存
+"""
+import hashlib
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils import config
+from utils.aho_corasick import AhoCorasick
+
+logger = logging.getLogger("app.core.recommendation")
+
+# 用户画像特征：(特征名, 推荐理由中的描述)
+FEATURES: List[Tuple[str, str]] = [
+    ("bias", "基础健康检查"),
+    ("age_40", "年龄40岁以上"),
+    ("age_50", "年龄50岁以上"),
+    ("age_60", "年龄60岁以上"),
+    ("male", "男性"),
+    ("female", "女性"),
+    ("risk_medium", "健康风险中等"),
+    ("risk_high", "健康风险较高"),
+    ("smoking", "吸烟"),
+    ("drinking", "饮酒"),
+    ("sedentary", "缺乏运动"),
+    ("chronic", "有慢性病史"),
+    ("family_history", "有家族病史"),
+    ("cardio", "心血管相关情况"),
+    ("digestive", "消化系统相关情况"),
+    ("respiratory", "呼吸系统相关情况"),
+    ("neuro", "头部及神经相关情况"),
+    ("liver", "肝胆相关情况"),
+    ("kidney", "肾脏及泌尿相关情况"),
+    ("metabolic", "血糖及代谢相关情况"),
+    ("thyroid", "甲状腺相关情况"),
+    ("bone", "骨关节相关情况"),
+    ("eye", "视力相关情况"),
+    ("tumor", "肿瘤筛查需求"),
+]
+
+# 体检项目标签及识别关键词（匹配项目名称和分类计 1 分，只在描述中出现计 0.5 分）
+TAG_KEYWORDS: Dict[str, List[str]] = {
+    "basic": ["血常规", "尿常规", "一般检查", "身高", "体重", "血压", "内科", "外科"],
+    "cardio": ["心电图", "心脏", "心肌", "颈动脉", "血脂", "动脉硬化"],
+    "digestive": ["胃镜", "肠镜", "幽门螺杆菌", "碳13", "碳14", "腹部", "消化", "便常规", "大便"],
+    "respiratory": ["胸部", "胸片", "胸透", "肺", "呼吸"],
+    "neuro": ["头颅", "脑", "颈椎", "经颅", "神经"],
+    "liver": ["肝", "乙肝", "丙肝", "胆"],
+    "kidney": ["肾", "尿", "泌尿"],
+    "metabolic": ["血糖", "糖化", "胰岛素", "尿酸", "血脂"],
+    "thyroid": ["甲状腺", "甲功"],
+    "bone": ["骨密度", "骨", "关节", "腰椎"],
+    "eye": ["眼", "视力", "眼底"],
+    "tumor": ["肿瘤", "癌", "CEA", "AFP", "PSA", "低剂量"],
+    "gyn": ["妇科", "乳腺", "宫颈", "HPV", "TCT", "子宫", "卵巢"],
+    "prostate": ["前列腺", "PSA"],
+}
+TAGS: List[str] = list(TAG_KEYWORDS)
+
+# 从健康史、症状、重点关注、体检报告文本中识别的情况特征
+CONDITION_KEYWORDS: Dict[str, List[str]] = {
+    "chronic": ["高血压", "糖尿病", "冠心病", "慢性"],
+    "family_history": ["家族", "遗传"],
+    "cardio": ["高血压", "心脏", "胸闷", "胸痛", "心悸", "冠心病", "血脂", "心血管"],
+    "digestive": ["胃", "腹痛", "腹胀", "腹泻", "便秘", "恶心", "呕吐", "消化", "反酸"],
+    "respiratory": ["咳嗽", "咳痰", "气短", "哮喘", "肺", "呼吸"],
+    "neuro": ["头痛", "头晕", "失眠", "记忆力", "中风", "脑"],
+    "liver": ["肝", "胆"],
+    "kidney": ["肾", "尿频", "尿急", "尿痛", "泌尿"],
+    "metabolic": ["糖尿病", "血糖", "肥胖", "痛风", "尿酸", "代谢"],
+    "thyroid": ["甲状腺", "甲亢", "甲减"],
+    "bone": ["关节", "骨", "腰痛", "颈椎", "腰椎"],
+    "eye": ["视力", "眼"],
+    "tumor": ["肿瘤", "癌", "结节"],
+}
+
+# 权重：特征 -> {标签: 权重}
+WEIGHTS: Dict[str, Dict[str, float]] = {
+    "bias": {"basic": 3.0, "cardio": 0.5, "liver": 0.5, "kidney": 0.5, "metabolic": 0.5,
+             "digestive": 0.3, "respiratory": 0.3, "eye": 0.2},
+    "age_40": {"cardio": 1.0, "metabolic": 1.0, "tumor": 0.8, "digestive": 0.5, "bone": 0.3, "thyroid": 0.3},
+    "age_50": {"tumor": 1.0, "bone": 1.0, "cardio": 0.5, "neuro": 0.5, "eye": 0.5, "prostate": 1.0, "gyn": 0.5},
+    "age_60": {"neuro": 1.0, "bone": 0.5, "cardio": 0.5, "eye": 0.5},
+    "male": {"prostate": 0.5},
+    "female": {"gyn": 1.0, "thyroid": 0.5, "bone": 0.3},
+    "risk_medium": {"cardio": 0.3, "metabolic": 0.3, "tumor": 0.3},
+    "risk_high": {"cardio": 0.8, "metabolic": 0.6, "tumor": 0.8, "liver": 0.3, "kidney": 0.3},
+    "smoking": {"respiratory": 2.0, "cardio": 0.8, "tumor": 0.8},
+    "drinking": {"liver": 2.0, "digestive": 1.0, "metabolic": 0.3},
+    "sedentary": {"metabolic": 1.0, "cardio": 0.8, "bone": 0.3},
+    "chronic": {"cardio": 1.0, "metabolic": 1.0, "kidney": 0.8, "eye": 0.3},
+    "family_history": {"tumor": 1.0, "cardio": 0.8, "metabolic": 0.8},
+    "cardio": {"cardio": 2.5, "metabolic": 0.5},
+    "digestive": {"digestive": 2.5, "liver": 0.5},
+    "respiratory": {"respiratory": 2.5},
+    "neuro": {"neuro": 2.5, "cardio": 0.5},
+    "liver": {"liver": 2.5, "digestive": 0.5},
+    "kidney": {"kidney": 2.5},
+    "metabolic": {"metabolic": 2.5, "cardio": 0.5, "kidney": 0.3},
+    "thyroid": {"thyroid": 2.5},
+    "bone": {"bone": 2.5},
+    "eye": {"eye": 2.5},
+    "tumor": {"tumor": 2.5},
+}
+
+# 排除规则：具备该特征的用户不推荐带有这些标签的项目
+EXCLUSIONS: Dict[str, List[str]] = {
+    "male": ["gyn"],
+    "female": ["prostate"],
+}
+
+
+# 规则版本：规则变化后，按旧规则生成的推荐结果不再复用
+RULES_VERSION = hashlib.sha1(
+    json.dumps([FEATURES, TAG_KEYWORDS, CONDITION_KEYWORDS, WEIGHTS, EXCLUSIONS], ensure_ascii=False).encode("utf-8")
+).hexdigest()[:16]
+
+# 参与推荐的画像字段，推荐结果指纹由这些字段的内容计算
+PORTRAIT_FIELDS = (
+    "health_risk", "basic_info", "health_history", "lifestyle", "symptoms", "medical_reports", "focus_areas"
+)
+
+
+def _package_templates() -> List[Dict[str, Any]]:
+    return [
+        {
+            "name": "基础体检套餐",
+            "description": "适合健康状况良好的人群",
+            "budget": config.RECOMMENDATION_BASIC_BUDGET,
+            "max_items": 8,
+        },
+        {
+            "name": "全面体检套餐",
+            "description": "适合关注全面健康的人群",
+            "budget": config.RECOMMENDATION_COMPREHENSIVE_BUDGET,
+            "max_items": 15,
+        },
+    ]
+
+
+def _field(portrait: Any, name: str) -> Any:
+    # 兼容 ORM 对象和字典（批量任务在子进程中传递字典）
+    if isinstance(portrait, dict):
+        return portrait.get(name)
+    return getattr(portrait, name, None)
+
+
+def _flatten_text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return " ".join(f"{key} {_flatten_text(item)}" for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return " ".join(_flatten_text(item) for item in value)
+    return str(value)
+
+
+def _parse_age(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _habit(value: Any, negatives: Iterable[str]) -> bool:
+    # 生活习惯可能是布尔值（问卷流程）或选项文本（对话流程，如“从不吸烟”“偶尔饮酒”）
+    if isinstance(value, bool):
+        return value
+    if not value:
+        return False
+    text = str(value)
+    return not any(negative in text for negative in negatives)
+
+
+class PackagePlan:
+    """
+    推荐套餐方案（未持久化）
+    """
+
+    __slots__ = ("name", "description", "items", "total_price", "reason", "fingerprint")
+
+    def __init__(self, name: str, description: str, items: List[Any], reason: str, fingerprint: Optional[str] = None):
+        self.name = name
+        self.description = description
+        self.items = items
+        self.total_price = round(float(sum(item.price for item in items)), 2)
+        self.reason = reason
+        # 生成该方案的画像与目录指纹，画像、目录、规则或预算不变时结果相同，可直接复用
+        self.fingerprint = fingerprint
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "item_ids": [item.id for item in self.items],
+            "total_price": self.total_price,
+            "reason": self.reason,
+        }
+
+
+class RecommendationEngine:
+    """
+    推荐引擎
+    针对一个目录版本构建，只读，可在多个请求间共享
+    """
+
+    def __init__(self, items: Sequence[Any], version: Optional[str] = None):
+        """
+        :param items: 可推荐的体检项目（需有 id、name、category、description、price 属性）
+        :param version: 目录版本，用于判断引擎是否需要重建
+        """
+        self.version = version
+        self.items = list(items)
+        self.feature_index = {name: index for index, (name, _) in enumerate(FEATURES)}
+        self.feature_labels = [label for _, label in FEATURES]
+        tag_index = {tag: index for index, tag in enumerate(TAGS)}
+
+        # 权重矩阵和排除矩阵：特征 x 标签
+        self.weights = np.zeros((len(FEATURES), len(TAGS)), dtype=np.float64)
+        for feature, tag_weights in WEIGHTS.items():
+            for tag, weight in tag_weights.items():
+                self.weights[self.feature_index[feature], tag_index[tag]] = weight
+        self.exclusions = np.zeros_like(self.weights)
+        for feature, tags in EXCLUSIONS.items():
+            for tag in tags:
+                self.exclusions[self.feature_index[feature], tag_index[tag]] = 1.0
+
+        # 项目标签矩阵：项目 x 标签
+        self.item_tags = np.zeros((len(self.items), len(TAGS)), dtype=np.float64)
+        for row, item in enumerate(self.items):
+            title = f"{item.name} {item.category or ''}".upper()
+            description = (item.description or "").upper()
+            for column, tag in enumerate(TAGS):
+                keywords = TAG_KEYWORDS[tag]
+                if any(keyword.upper() in title for keyword in keywords):
+                    self.item_tags[row, column] = 1.0
+                elif any(keyword.upper() in description for keyword in keywords):
+                    self.item_tags[row, column] = 0.5
+        self.item_ids = np.array([item.id for item in self.items], dtype=np.int64)
+        self.item_prices = np.array([item.price or 0.0 for item in self.items], dtype=np.float64)
+
+        self._condition_matcher = AhoCorasick(
+            keyword for keywords in CONDITION_KEYWORDS.values() for keyword in keywords
+        )
+        self._keyword_features: Dict[str, List[int]] = {}
+        for feature, keywords in CONDITION_KEYWORDS.items():
+            for keyword in keywords:
+                self._keyword_features.setdefault(keyword, []).append(self.feature_index[feature])
+
+    def fingerprint(self, portrait: Any, templates: Optional[List[Dict[str, Any]]] = None) -> str:
+        """
+        计算推荐结果指纹
+        由画像内容、目录版本、规则版本和套餐模板（预算）共同决定，任何一项变化指纹都会变化
+        :param portrait: 用户画像
+        :param templates: 套餐模板，默认基础与全面两个套餐
+        :return: 十六进制指纹
+        """
+        content = json.dumps(
+            [
+                self.version,
+                RULES_VERSION,
+                templates or _package_templates(),
+                [_field(portrait, name) for name in PORTRAIT_FIELDS],
+            ],
+            ensure_ascii=False, sort_keys=True, default=str
+        )
+        return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+    def featurize(self, portrait: Any) -> np.ndarray:
+        """
+        由用户画像构建特征向量
+        :param portrait: UserPortrait 或同名字段的字典
+        :return: 特征向量（0/1）
+        """
+        vector = np.zeros(len(FEATURES), dtype=np.float64)
+        index = self.feature_index
+        vector[index["bias"]] = 1.0
+
+        basic_info = _field(portrait, "basic_info") or {}
+        if isinstance(basic_info, dict):
+            age = _parse_age(basic_info.get("age"))
+            if age is not None:
+                vector[index["age_40"]] = age >= 40
+                vector[index["age_50"]] = age >= 50
+                vector[index["age_60"]] = age >= 60
+            gender = str(basic_info.get("gender") or "")
+            if gender in ("男", "male", "M"):
+                vector[index["male"]] = 1.0
+            elif gender in ("女", "female", "F"):
+                vector[index["female"]] = 1.0
+
+        health_risk = _field(portrait, "health_risk") or ""
+        if "高" in health_risk:
+            vector[index["risk_high"]] = 1.0
+        elif "中" in health_risk:
+            vector[index["risk_medium"]] = 1.0
+
+        lifestyle = _field(portrait, "lifestyle") or {}
+        if isinstance(lifestyle, dict):
+            if _habit(lifestyle.get("smoking"), ("从不", "已戒", "不吸")):
+                vector[index["smoking"]] = 1.0
+            if _habit(lifestyle.get("alcohol", lifestyle.get("drinking")), ("从不", "不饮", "不喝")):
+                vector[index["drinking"]] = 1.0
+            exercise = str(lifestyle.get("exercise_frequency") or lifestyle.get("exercise") or "")
+            if exercise in ("很少", "几乎不运动"):
+                vector[index["sedentary"]] = 1.0
+
+        health_history = _field(portrait, "health_history") or {}
+        if isinstance(health_history, dict):
+            if health_history.get("chronic_diseases"):
+                vector[index["chronic"]] = 1.0
+            if health_history.get("family_medical_history"):
+                vector[index["family_history"]] = 1.0
+
+        # 健康史、症状、重点关注、体检报告中的情况关键词
+        text = " ".join(
+            _flatten_text(_field(portrait, name))
+            for name in ("health_history", "symptoms", "focus_areas", "medical_reports")
+        )
+        for _, _, keyword in self._condition_matcher.iter_matches(text):
+            for feature in self._keyword_features.get(keyword, ()):
+                vector[feature] = 1.0
+        return vector
+
+    def score_features(self, features: np.ndarray) -> np.ndarray:
+        """
+        为全部项目打分
+        :param features: 单个特征向量 (特征数,) 或特征矩阵 (用户数, 特征数)
+        :return: 项目分数 (项目数,) 或 (用户数, 项目数)，被排除的项目为 -inf
+        """
+        scores = (features @ self.weights) @ self.item_tags.T
+        excluded = ((features @ self.exclusions) @ self.item_tags.T) > 0
+        return np.where(excluded, -np.inf, scores)
+
+    def score(self, portrait: Any) -> np.ndarray:
+        """
+        为全部项目打分
+        :param portrait: 用户画像
+        :return: 项目分数 (项目数,)
+        """
+        return self.score_features(self.featurize(portrait))
+
+    def rank(self, scores: np.ndarray) -> np.ndarray:
+        """
+        按分数降序、项目ID升序排列的项目下标（只包含正分项目）
+        """
+        order = np.lexsort((self.item_ids, -scores))
+        return order[scores[order] > 0]
+
+    def _reason(self, features: np.ndarray, selected: np.ndarray, package_name: str) -> str:
+        # 取对所选项目贡献最大的画像特征作为推荐理由
+        contribution = features * (self.weights @ self.item_tags[selected].sum(axis=0))
+        contribution[self.feature_index["bias"]] = 0.0
+        top = [index for index in np.argsort(-contribution, kind="stable")[:3] if contribution[index] > 0]
+        if not top:
+            return f"根据您的健康画像，推荐{package_name}中的项目"
+        labels = "、".join(self.feature_labels[index] for index in top)
+        return f"根据您的健康画像（{labels}），推荐{package_name}中的项目"
+
+    def recommend(self, portrait: Any, templates: Optional[List[Dict[str, Any]]] = None) -> List[PackagePlan]:
+        """
+        为用户生成推荐套餐方案
+        每个套餐按项目分数从高到低依次加入，超出预算的项目跳过，达到项目数上限为止
+        :param portrait: 用户画像
+        :param templates: 套餐模板（名称、描述、预算、项目数上限），默认基础与全面两个套餐
+        :return: 套餐方案列表（没有可推荐项目的套餐不返回）
+        """
+        templates = templates or _package_templates()
+        features = self.featurize(portrait)
+        return self._select(features, self.score_features(features), templates, self.fingerprint(portrait, templates))
+
+    def recommend_batch(
+        self,
+        portraits: Sequence[Any],
+        templates: Optional[List[Dict[str, Any]]] = None
+    ) -> List[List[PackagePlan]]:
+        """
+        批量生成推荐套餐方案，所有画像的打分合并为一次矩阵运算
+        :param portraits: 用户画像列表
+        :param templates: 套餐模板，默认基础与全面两个套餐
+        :return: 与 portraits 一一对应的套餐方案列表
+        """
+        if not portraits:
+            return []
+        templates = templates or _package_templates()
+        features = np.stack([self.featurize(portrait) for portrait in portraits])
+        scores = self.score_features(features)
+        return [
+            self._select(features[row], scores[row], templates, self.fingerprint(portrait, templates))
+            for row, portrait in enumerate(portraits)
+        ]
+
+    def _select(
+        self,
+        features: np.ndarray,
+        scores: np.ndarray,
+        templates: List[Dict[str, Any]],
+        fingerprint: str
+    ) -> List[PackagePlan]:
+        order = self.rank(scores)
+        # 逐项挑选在 Python 列表上进行，避免逐个读取 numpy 标量
+        ranked = list(zip(order.tolist(), self.item_prices[order].tolist()))
+        plans = []
+        for template in templates:
+            remaining = float(template["budget"])
+            selected = []
+            for index, price in ranked:
+                if price <= remaining:
+                    selected.append(index)
+                    remaining -= price
+                    if len(selected) >= template["max_items"]:
+                        break
+            if not selected:
+                continue
+            selected = np.array(selected, dtype=np.int64)
+            plans.append(PackagePlan(
+                name=template["name"],
+                description=template["description"],
+                items=[self.items[index] for index in selected],
+                reason=self._reason(features, selected, template["name"]),
+                fingerprint=fingerprint
+            ))
+        return plans
+
+
+# 当前目录版本对应的引擎
+_engine: Optional[RecommendationEngine] = None
+
+
+def get_recommendation_engine(catalogue: Any) -> RecommendationEngine:
+    """
+    获取与目录快照版本一致的推荐引擎，目录变化时重建
+    :param catalogue: 体检项目目录快照（CatalogueSnapshot）
+    :return: 推荐引擎
+    """
+    global _engine
+    engine = _engine
+    if engine is None or engine.version != catalogue.version:
+        engine = RecommendationEngine(catalogue.active_items, version=catalogue.version)
+        _engine = engine
+        logger.info(f"推荐引擎已构建: 目录版本={catalogue.version}, 项目数={len(engine.items)}")
+    return engine
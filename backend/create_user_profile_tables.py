@@ -77,6 +77,9 @@ def create_user_profile_tables():
     create_indexes = [
         "CREATE INDEX IF NOT EXISTS idx_user_profiles_user_id ON user_profiles(user_id);",
         "CREATE INDEX IF NOT EXISTS idx_symptom_knowledge_symptom ON symptom_knowledge(symptom);",
+        # 症状模糊查询使用的三元组索引
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm;",
+        "CREATE INDEX IF NOT EXISTS idx_symptom_knowledge_symptom_trgm ON symptom_knowledge USING gin (symptom gin_trgm_ops);",
         "CREATE INDEX IF NOT EXISTS idx_conversation_history_user_id ON conversation_history(user_id);",
         "CREATE INDEX IF NOT EXISTS idx_conversation_history_created_at ON conversation_history(created_at);",
         "CREATE INDEX IF NOT EXISTS idx_user_flow_state_user_id ON user_flow_state(user_id);"
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+批量生成推荐套餐脚本
+体检项目目录或价格调整后，为全部有用户画像的用户重新生成推荐套餐：
+
+- 按 user_id 流式读取用户画像并切分为连续的区间块，由进程池并行处理
+- 块内画像合并为一次矩阵运算打分，套餐和套餐项目批量写入（insert_recommended_packages），整块在一个事务中提交
+- 已有相同画像与目录指纹套餐的用户跳过，目录未变化时重跑不会产生新套餐
+- 已完成的块记录在进度文件中，中断后加 --resume 继续；未记录完成的块重跑时，
+  已提交的用户因指纹相同被跳过，不会产生重复，也不会改动用户在任务期间在线生成或调整的套餐
+
+用法（在 backend 目录下）：
+    python generate_recommendations.py [--chunk-size 500] [--workers 4]
+                                       [--progress-file recommendation_progress.json] [--resume]
+"""
+import argparse
+import bisect
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from core.ai.recommendation_engine import RecommendationEngine
+from models import RecommendedPackage, UserPortrait
+from services.catalogue_service import load_catalogue
+from services.recommendation_service import insert_recommended_packages
+from utils.database import SessionLocal, engine
+from utils.error_handler import handle_database_error
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# 工作进程内的推荐引擎，进程启动时按目录构建一次
+_worker_engine: Optional[RecommendationEngine] = None
+
+
+def _init_worker() -> None:
+    """
+    工作进程初始化：丢弃从父进程继承的连接池，加载目录并构建推荐引擎
+    """
+    global _worker_engine
+    engine.dispose(close=False)
+    with SessionLocal() as db:
+        catalogue = load_catalogue(db)
+    _worker_engine = RecommendationEngine(catalogue.active_items, version=catalogue.version)
+
+
+def process_chunk(first_user_id: int, last_user_id: int, catalogue_version: str) -> Tuple[int, int]:
+    """
+    为一个用户区间生成推荐套餐
+    :param first_user_id: 区间内第一个用户ID
+    :param last_user_id: 区间内最后一个用户ID
+    :param catalogue_version: 任务使用的目录版本
+    :return: (处理的用户数, 写入的套餐数)
+    """
+    if _worker_engine is None:
+        _init_worker()
+    recommendation_engine = _worker_engine
+    if recommendation_engine.version != catalogue_version:
+        raise RuntimeError(
+            f"体检项目目录在任务期间发生变化: 任务版本={catalogue_version}, 当前版本={recommendation_engine.version}"
+        )
+
+    in_chunk = UserPortrait.user_id.between(first_user_id, last_user_id)
+    with SessionLocal() as db:
+        try:
+            portraits: Dict[int, UserPortrait] = {}
+            for portrait in db.scalars(select(UserPortrait).where(in_chunk).order_by(UserPortrait.user_id, UserPortrait.id)):
+                # 同一用户有多条画像时与在线推荐一致，取第一条
+                portraits.setdefault(portrait.user_id, portrait)
+            user_ids = list(portraits)
+            plans_per_user = recommendation_engine.recommend_batch(list(portraits.values()))
+
+            # 画像和目录都未变化的用户已有相同指纹的套餐，不重复生成；
+            # 块在一个事务中提交，中断重跑时已提交的部分也按此跳过
+            user_plans = [(user_id, plan) for user_id, plans in zip(user_ids, plans_per_user) for plan in plans]
+            unchanged = set(db.execute(
+                select(RecommendedPackage.user_id, RecommendedPackage.source_fingerprint).where(
+                    RecommendedPackage.user_id.between(first_user_id, last_user_id),
+                    RecommendedPackage.source_fingerprint.in_({plan.fingerprint for _, plan in user_plans})
+                )
+            ).tuples().all()) if user_plans else set()
+            package_ids = insert_recommended_packages(db, [
+                (user_id, plan) for user_id, plan in user_plans if (user_id, plan.fingerprint) not in unchanged
+            ])
+            db.commit()
+            return len(user_ids), len(package_ids)
+        except Exception as e:
+            handle_database_error(db, e)
+            raise
+
+
+class Progress:
+    """
+    任务进度文件
+    记录任务开始时间、目录版本和已完成的用户区间，每完成一个块原子地重写一次
+    """
+
+    def __init__(self, path: str, catalogue_version: str, started_at: str, completed: List[List[int]] = None):
+        self.path = path
+        self.catalogue_version = catalogue_version
+        self.started_at = started_at
+        self.completed = sorted(completed or [])
+        self.users = 0
+        self.packages = 0
+
+    @classmethod
+    def load(cls, path: str) -> Optional["Progress"]:
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as progress_file:
+            data = json.load(progress_file)
+        progress = cls(path, data["catalogue_version"], data["started_at"], data.get("completed"))
+        progress.users = data.get("users", 0)
+        progress.packages = data.get("packages", 0)
+        return progress
+
+    def is_completed(self, user_id: int) -> bool:
+        index = bisect.bisect_right(self.completed, [user_id, float("inf")]) - 1
+        return index >= 0 and self.completed[index][0] <= user_id <= self.completed[index][1]
+
+    def mark_completed(self, first_user_id: int, last_user_id: int, users: int, packages: int) -> None:
+        bisect.insort(self.completed, [first_user_id, last_user_id])
+        self.users += users
+        self.packages += packages
+        self.save()
+
+    def save(self) -> None:
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as progress_file:
+            json.dump({
+                "catalogue_version": self.catalogue_version,
+                "started_at": self.started_at,
+                "completed": self.completed,
+                "users": self.users,
+                "packages": self.packages,
+            }, progress_file, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+
+def iter_chunks(db, chunk_size: int, progress: Progress) -> Iterator[Tuple[int, int]]:
+    """
+    按 user_id 分页读取有画像的用户，切分为不包含已完成用户的连续区间
+    每页一个短查询并立即结束事务，读取过程不会长时间占用连接或阻塞工作进程的写入
+    :return: (区间内第一个用户ID, 最后一个用户ID) 的迭代器
+    """
+    first = last = None
+    count = 0
+    after = None
+    while True:
+        query = select(UserPortrait.user_id).distinct().order_by(UserPortrait.user_id).limit(chunk_size)
+        if after is not None:
+            query = query.where(UserPortrait.user_id > after)
+        user_ids = db.scalars(query).all()
+        db.commit()
+        if not user_ids:
+            break
+        after = user_ids[-1]
+        for user_id in user_ids:
+            if progress.is_completed(user_id):
+                # 区间不跨越已完成的区间
+                if count:
+                    yield first, last
+                    count = 0
+                continue
+            if not count:
+                first = user_id
+            last = user_id
+            count += 1
+            if count >= chunk_size:
+                yield first, last
+                count = 0
+    if count:
+        yield first, last
+
+
+def generate_recommendations(chunk_size: int, workers: int, progress_file: str, resume: bool) -> None:
+    """
+    为全部用户批量生成推荐套餐
+    :param chunk_size: 每块的用户数
+    :param workers: 工作进程数，0 表示在当前进程中处理
+    :param progress_file: 进度文件路径
+    :param resume: 是否从进度文件继续
+    """
+    with SessionLocal() as db:
+        catalogue_version = load_catalogue(db).version
+
+    progress = Progress.load(progress_file) if resume else None
+    if progress is not None and progress.catalogue_version != catalogue_version:
+        logger.warning(f"进度文件的目录版本 {progress.catalogue_version} 与当前目录 {catalogue_version} 不一致，重新开始")
+        progress = None
+    if progress is None:
+        progress = Progress(progress_file, catalogue_version, datetime.now().isoformat())
+        progress.save()
+    else:
+        logger.info(f"从进度文件继续: 已完成用户={progress.users}, 已写入套餐={progress.packages}")
+
+    start = time.perf_counter()
+
+    def record(chunk: Tuple[int, int], users: int, packages: int) -> None:
+        progress.mark_completed(chunk[0], chunk[1], users, packages)
+        logger.info(f"用户 {chunk[0]}-{chunk[1]} 已完成: 用户={users}, 套餐={packages}, 累计用户={progress.users}")
+
+    with SessionLocal() as db:
+        chunks = iter_chunks(db, chunk_size, progress)
+        if workers <= 0:
+            for chunk in chunks:
+                record(chunk, *process_chunk(*chunk, catalogue_version))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                # 同时提交的块数有上限，用户ID边流式读取边分发
+                pending = {}
+                for chunk in chunks:
+                    pending[pool.submit(process_chunk, *chunk, catalogue_version)] = chunk
+                    if len(pending) >= workers * 2:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            record(pending.pop(future), *future.result())
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record(pending.pop(future), *future.result())
+
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"推荐套餐批量生成完成: 用户={progress.users}, 套餐={progress.packages}, "
+        f"目录版本={catalogue_version}, 耗时={elapsed:.1f}秒"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="为全部用户批量生成推荐套餐")
+    parser.add_argument("--chunk-size", type=int, default=500, help="每块的用户数")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="工作进程数，0 表示不使用进程池")
+    parser.add_argument("--progress-file", default="recommendation_progress.json", help="进度文件路径")
+    parser.add_argument("--resume", action="store_true", help="从进度文件继续上次中断的任务")
+    args = parser.parse_args()
+    generate_recommendations(args.chunk_size, args.workers, args.progress_file, args.resume)
+
+
+if __name__ == "__main__":
+    main()
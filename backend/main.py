@@ -9,8 +9,15 @@ from dotenv import load_dotenv
 
 # 导入自定义模块
 from utils.error_handler import global_exception_handler, CustomException
-from utils.database import get_db, init_db
-from utils.logger import setup_logger
+from utils.database import get_db, init_db, get_pool_status, close_async_db
+from utils.cache import cache, get_cache_stats
+from services.conversation_log import conversation_log
+from services.user_portrait_service import flow_state_checkpointer
+from services.recommendation_service import recommendation_cache_metrics
+from utils.security import principal_cache_metrics
+from utils.password_hashing import password_hashing_pool, password_policy
+from core.ai.nlu_engine import load_nlu_engine
+from utils.logger import setup_logger, logging_pipeline
 from api.example import router as example_router
 from middleware import auth_middleware, cors_middleware, log_middleware
 
@@ -107,6 +114,18 @@ async def startup_event():
             logger.error(f"数据库初始化失败: {str(db_error)}", exc_info=True)
             logger.warning("应用将继续运行，但部分功能可能不可用")
         
+        # 加载并编译 NLU 规则
+        load_nlu_engine()
+        
+        # 启动缓存失效通知订阅（仅配置 Redis 时生效）
+        await cache.start()
+        
+        # 启动对话历史批量写入线程
+        conversation_log.start()
+        
+        # 启动问卷流程状态空闲检查点线程
+        flow_state_checkpointer.start()
+        
         logger.info("应用启动成功")
     except Exception as e:
         logger.error(f"应用启动过程中发生错误: {str(e)}", exc_info=True)
@@ -122,7 +141,16 @@ async def shutdown_event():
     """
     try:
         logger.info("应用关闭中...")
-        # 在这里可以添加资源清理代码
+        # 写入缓冲中的对话历史（需在释放连接池之前）
+        conversation_log.stop()
+        # 写入未持久化的问卷流程状态
+        flow_state_checkpointer.stop()
+        # 释放异步数据库连接池
+        await close_async_db()
+        # 关闭缓存的 Redis 连接
+        await cache.close()
+        # 关闭密码哈希工作池
+        password_hashing_pool.shutdown()
         logger.info("应用关闭成功")
     except Exception as e:
         logger.error(f"应用关闭过程中发生错误: {str(e)}")
@@ -170,6 +198,65 @@ def health_check(db: Session = Depends(get_db)):
         )
 
 
+
+@app.get("/health/db-pool")
+def db_pool_status():
+    """
+    数据库连接池状态接口
+    返回连接池配置、当前借出/溢出连接数以及连接获取耗时分布
+    """
+    return {
+        "status": "success",
+        "message": "获取连接池状态成功",
+        "data": get_pool_status()
+    }
+
+
+@app.get("/health/password-hashing")
+def password_hashing_status():
+    """
+    密码哈希工作池状态接口
+    返回当前哈希策略、工作线程数、当前排队数、拒绝与重新哈希次数以及排队等待和计算耗时分布
+    """
+    return {
+        "status": "success",
+        "message": "获取密码哈希工作池状态成功",
+        "data": {
+            **password_hashing_pool.stats(),
+            "policy": {"algorithm": password_policy.scheme, "cost": password_policy.rounds}
+        }
+    }
+
+
+@app.get("/health/logging")
+def logging_status():
+    """
+    日志队列状态接口
+    返回日志队列容量、当前积压条数以及已写入和因队列满丢弃的条数
+    """
+    return {
+        "status": "success",
+        "message": "获取日志队列状态成功",
+        "data": logging_pipeline.stats()
+    }
+
+
+@app.get("/health/cache")
+def cache_status():
+    """
+    缓存状态接口
+    返回进程内缓存条目数、各级命中率、合并加载次数及 Redis 可用性，以及推荐结果和认证用户缓存的命中率
+    """
+    return {
+        "status": "success",
+        "message": "获取缓存状态成功",
+        "data": {
+            **get_cache_stats(),
+            "recommendations": recommendation_cache_metrics.snapshot(),
+            "principals": principal_cache_metrics.snapshot()
+        }
+    }
+
 # 启动应用的入口点
 if __name__ == "__main__":
     # 获取端口号，默认为8000
@@ -40,6 +40,9 @@ from .appointment import Appointment
 # 导入交互相关模型
 from .interaction import Interaction, QuestionnaireProgress
 
+# 导入 JSON 列增量更新相关模型
+from .json_patch import JsonFieldEntry
+
 # 导出所有模型
 __all__ = [
     # 基础模型
@@ -84,4 +87,7 @@ __all__ = [
     # 交互相关模型
     "Interaction",
     "QuestionnaireProgress",
+    
+    # JSON 列增量更新相关模型
+    "JsonFieldEntry",
 ]
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -17,6 +17,10 @@ class Appointment(Base):
     预约表模型
     """
     __tablename__ = "appointments"
+    __table_args__ = (
+        # 用户预约列表按创建时间游标分页
+        Index("idx_appointments_user_created", "user_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True, comment="预约ID")
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, comment="用户ID")
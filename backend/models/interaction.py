@@ -3,6 +3,7 @@ from sqlalchemy.orm import relationship
 from datetime import datetime
 
 from .base import Base
+from .json_patch import JsonDocument
 
 
 def get_current_time():
@@ -42,6 +43,11 @@ class QuestionnaireProgress(Base):
     total_questions = Column(Integer, nullable=False, comment="总题数")
     answered_questions = Column(Integer, nullable=False, default=0, comment="已答题数")
     is_completed = Column(Boolean, default=False, comment="是否完成")
+    current_step = Column(String(50), nullable=True, comment="当前步骤")
+    completed_steps = Column(JSON, nullable=True, comment="已完成步骤")
+    current_state = Column(String(50), nullable=True, default="normal", comment="当前状态：normal 或 symptom_dynamic")
+    session_data = Column(JsonDocument, nullable=True, comment="问卷过程数据（通过 JsonColumnPatcher 增量更新）")
+    state_touched_at = Column(Float, nullable=True, comment="已写入的流程状态的修改时间，后台检查点不会用更早的状态覆盖")
     created_at = Column(DateTime, default=get_current_time, comment="创建时间")
     updated_at = Column(DateTime, default=get_current_time, onupdate=get_current_time, comment="更新时间")
     
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from datetime import datetime
+
+from .base import Base
+
+# 会话数据等需要增量更新的 JSON 列类型：PostgreSQL 上使用 JSONB（支持 jsonb_set），其他数据库使用 JSON
+JsonDocument = JSON().with_variant(JSONB(), "postgresql")
+
+
+class JsonFieldEntry(Base):
+    """
+    JSON 列增量更新附属表模型
+    非 PostgreSQL 数据库上，JSON 列的增量修改按路径逐条记录在本表中，读取时叠加到列值上；
+    整体替换列值时清除对应记录
+    """
+    __tablename__ = "json_field_entries"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # 所属的表、行和列
+    table_name = Column(String(64), nullable=False)
+    row_id = Column(Integer, nullable=False)
+    column_name = Column(String(64), nullable=False)
+
+    # 修改路径（JSON Pointer，如 /basic_info/name）和新值
+    path = Column(String(500), nullable=False)
+    value = Column(JSON, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("idx_json_field_entries_owner", "table_name", "row_id", "column_name"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, JSON, text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, JSON, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -17,6 +17,10 @@ class Recommendation(Base):
     推荐表模型
     """
     __tablename__ = "recommendations"
+    __table_args__ = (
+        # 用户推荐记录列表按推荐时间游标分页
+        Index("idx_recommendations_user_recommended", "user_id", "recommended_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True, comment="推荐ID")
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, comment="用户ID")
@@ -58,6 +62,9 @@ class RecommendedPackage(Base):
     推荐套餐表模型
     """
     __tablename__ = "recommended_packages"
+    __table_args__ = (
+        Index("idx_recommended_packages_user_fingerprint", "user_id", "source_fingerprint"),
+    )
     
     id = Column(Integer, primary_key=True, index=True, comment="套餐ID")
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, comment="用户ID")
@@ -65,6 +72,7 @@ class RecommendedPackage(Base):
     description = Column(String(500), nullable=True, comment="套餐描述")
     total_price = Column(Float, nullable=False, comment="套餐总价")
     recommended_reason = Column(String(1000), nullable=True, comment="推荐理由")
+    source_fingerprint = Column(String(40), nullable=True, comment="生成时的画像与目录指纹，相同指纹的请求直接复用")
     created_at = Column(DateTime, default=get_current_time, comment="创建时间")
     updated_at = Column(DateTime, default=get_current_time, onupdate=get_current_time, comment="更新时间")
     
@@ -80,6 +88,10 @@ class PackageItem(Base):
     套餐项目表模型
     """
     __tablename__ = "package_items"
+    __table_args__ = (
+        # 同一套餐中的项目不重复，批量添加时按该索引跳过已有项目
+        Index("uq_package_items_package_item", "package_id", "item_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True, comment="套餐项目ID")
     package_id = Column(Integer, ForeignKey("recommended_packages.id"), nullable=False, comment="套餐ID")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -41,6 +41,10 @@ class ExaminationReport(Base):
     体检报告表模型
     """
     __tablename__ = "examination_reports"
+    __table_args__ = (
+        # 用户报告列表按创建时间游标分页
+        Index("idx_examination_reports_user_created", "user_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True, comment="报告ID")
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, comment="用户ID")
@@ -65,6 +69,10 @@ class ReportInterpretation(Base):
     报告解读表模型
     """
     __tablename__ = "report_interpretations"
+    __table_args__ = (
+        # 用户解读列表按创建时间游标分页
+        Index("idx_report_interpretations_user_created", "user_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True, comment="解读ID")
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, comment="用户ID")
@@ -3,6 +3,7 @@ from sqlalchemy.orm import relationship
 from datetime import datetime
 
 from .base import Base
+from .json_patch import JsonDocument
 
 
 class UserPortrait(Base):
@@ -60,6 +61,9 @@ class SymptomKnowledge(Base):
     id = Column(Integer, primary_key=True, index=True)
     symptom = Column(String(100), nullable=False, index=True)  # 症状名称
     
+    # 症状描述
+    description = Column(Text, nullable=True)
+    
     # 追问问题集合
     follow_up_questions = Column(JSON, nullable=False)  # 存储追问问题列表
     
@@ -69,6 +73,9 @@ class SymptomKnowledge(Base):
     # 相关检查项目
     related_examinations = Column(JSON, nullable=True)  # 相关检查项目列表
     
+    # 相关症状
+    related_symptoms = Column(JSON, nullable=True)  # 相关症状名称列表
+    
     # 创建时间和更新时间
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -118,7 +125,7 @@ class UserFlowState(Base):
     is_ai_sub_process = Column(String(10), default=False)  # 是否在AI动态子流程中
     
     # 临时数据
-    temp_data = Column(JSON, nullable=True)  # 临时存储的数据
+    temp_data = Column(JsonDocument, nullable=True)  # 临时存储的数据（通过 JsonColumnPatcher 增量更新）
     
     # 创建时间和更新时间
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,11 +1,12 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import date, time
 from typing import Optional, List
 
-from utils.database import get_db
+from utils.database import get_async_db
 from utils.security import get_current_user
 from services import appointment_service
+from models import Appointment
 from schemas import user_schemas
 from utils.error_handler import handle_exceptions, CustomException
 
@@ -22,7 +23,7 @@ async def create_appointment(
     appointment_date: date,
     appointment_time: time,
     examination_items: List[int],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """
@@ -65,7 +66,8 @@ async def get_user_appointments(
     status: Optional[str] = None,
     limit: int = 50,
     offset: int = 0,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """
@@ -73,9 +75,10 @@ async def get_user_appointments(
     - **status**: 预约状态（可选）：pending, confirmed, cancelled, completed
     - **limit**: 返回的记录数量，默认50
     - **offset**: 偏移量，默认0
+    - **cursor**: 上一页返回的 next_cursor（可选，传入时忽略 offset）
     """
     appointments = await appointment_service.get_user_appointments(
-        db, current_user.id, status, limit, offset
+        db, current_user.id, status, limit, offset, cursor
     )
     
     # 构造响应数据
@@ -101,7 +104,8 @@ async def get_user_appointments(
             "appointments": response_data,
             "total": len(response_data),
             "limit": limit,
-            "offset": offset
+            "offset": offset,
+            "next_cursor": appointments.next_cursor
         }
     )
 
@@ -110,7 +114,7 @@ async def get_user_appointments(
 async def update_appointment_status(
     appointment_id: int,
     new_status: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """
@@ -119,7 +123,7 @@ async def update_appointment_status(
     - **new_status**: 新状态：pending, confirmed, cancelled, completed
     """
     # 先检查预约是否属于当前用户
-    appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
+    appointment = await db.get(Appointment, appointment_id)
     if not appointment:
         raise CustomException(
             status_code=404,
@@ -161,7 +165,7 @@ async def update_appointment_status(
 @handle_exceptions
 async def cancel_appointment(
     appointment_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """
@@ -1,11 +1,11 @@
 from fastapi import APIRouter, Depends, UploadFile, File
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import os
 import shutil
 from datetime import datetime
 from typing import Optional
 
-from utils.database import get_db
+from utils.database import get_async_db
 from utils.security import get_current_user
 from services import health_info_service
 from schemas import user_schemas
@@ -27,7 +27,7 @@ if not os.path.exists(REPORT_STORAGE_PATH):
 @handle_exceptions
 async def submit_health_information(
     data: dict,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """
@@ -74,7 +74,7 @@ async def upload_medical_report(
     file: UploadFile = File(...),
     report_date: Optional[str] = None,
     report_type: Optional[str] = "体检报告",
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """
@@ -128,7 +128,7 @@ async def upload_medical_report(
 @handle_exceptions
 async def update_health_information(
     data: dict,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """
@@ -173,7 +173,7 @@ async def update_health_information(
 @handle_exceptions
 async def get_user_health_info(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """
@@ -207,7 +207,7 @@ async def get_user_health_info(
 @router.get("/generate-portrait", response_model=user_schemas.ApiResponse)
 @handle_exceptions
 async def generate_user_portrait(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """
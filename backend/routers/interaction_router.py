@@ -1,10 +1,10 @@
 from fastapi import APIRouter, Depends, UploadFile, File
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import os
 import shutil
 from datetime import datetime
 
-from utils.database import get_db
+from utils.database import get_async_db
 from utils.security import get_current_user
 from services import interaction_service
 from schemas import user_schemas
@@ -26,7 +26,7 @@ if not os.path.exists(VOICE_STORAGE_PATH):
 @handle_exceptions
 async def send_text(
     content: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """
@@ -54,7 +54,7 @@ async def send_text(
 async def send_voice(
     file: UploadFile = File(...),
     duration: float = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """
@@ -102,7 +102,7 @@ async def send_voice(
 async def get_history(
     limit: int = 50,
     offset: int = 0,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """
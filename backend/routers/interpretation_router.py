@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
-from utils.database import get_db
+from utils.database import get_async_db, get_async_read_db
 from utils.security import get_current_user
 from services import interpretation_service
+from models import ExaminationReport, ReportInterpretation
 from schemas import user_schemas
 from utils.error_handler import handle_exceptions, CustomException
 
@@ -19,7 +20,7 @@ async def create_report_interpretation(
     report_id: int,
     interpretation_content: str,
     suggestions: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """
@@ -29,7 +30,7 @@ async def create_report_interpretation(
     - **suggestions**: 建议
     """
     # 检查报告是否属于当前用户
-    report = db.query(ExaminationReport).filter(ExaminationReport.id == report_id).first()
+    report = await db.get(ExaminationReport, report_id)
     if not report:
         raise CustomException(
             status_code=404,
@@ -72,7 +73,7 @@ async def create_report_interpretation(
 @handle_exceptions
 async def get_report_interpretation(
     report_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """
@@ -106,7 +107,7 @@ async def update_report_interpretation(
     interpretation_id: int,
     interpretation_content: Optional[str] = None,
     suggestions: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """
@@ -116,9 +117,7 @@ async def update_report_interpretation(
     - **suggestions**: 新的建议（可选）
     """
     # 检查解读是否属于当前用户
-    interpretation = db.query(ReportInterpretation).filter(
-        ReportInterpretation.id == interpretation_id
-    ).first()
+    interpretation = await db.get(ReportInterpretation, interpretation_id)
     if not interpretation:
         raise CustomException(
             status_code=404,
@@ -160,25 +159,25 @@ async def update_report_interpretation(
 async def get_user_interpretations(
     limit: int = 50,
     offset: int = 0,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
     current_user = Depends(get_current_user)
 ):
     """
     获取用户的所有报告解读接口
     - **limit**: 返回的记录数量，默认50
     - **offset**: 偏移量，默认0
+    - **cursor**: 上一页返回的 next_cursor（可选，传入时忽略 offset）
     """
     interpretations = await interpretation_service.get_user_interpretations(
-        db, current_user.id, limit, offset
+        db, current_user.id, limit, offset, cursor
     )
     
     # 构造响应数据
     response_data = []
     for interpretation in interpretations:
         # 获取关联的报告信息
-        report = db.query(ExaminationReport).filter(
-            ExaminationReport.id == interpretation.report_id
-        ).first()
+        report = await db.get(ExaminationReport, interpretation.report_id)
         
         report_info = None
         if report:
@@ -205,6 +204,7 @@ async def get_user_interpretations(
             "interpretations": response_data,
             "total": len(response_data),
             "limit": limit,
-            "offset": offset
+            "offset": offset,
+            "next_cursor": interpretations.next_cursor
         }
     )
\ No newline at end of file
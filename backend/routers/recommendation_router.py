@@ -1,8 +1,8 @@
 from fastapi import APIRouter, Depends, Body
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List, Dict, Any
 
-from utils.database import get_db
+from utils.database import get_async_db, get_async_read_db
 from utils.security import get_current_user
 from services import recommendation_service
 from schemas import user_schemas
@@ -16,7 +16,7 @@ router = APIRouter(
 @router.get("/packages", response_model=user_schemas.ApiResponse)
 @handle_exceptions
 async def get_recommended_packages(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """
@@ -29,7 +29,7 @@ async def get_recommended_packages(
     for package in packages:
         # 获取套餐中的项目
         package_items = []
-        for item in package.items:
+        for item in package.package_items:
             package_items.append({
                 "id": item.id,
                 "item_id": item.item_id,
@@ -61,7 +61,7 @@ async def adjust_recommended_items(
     package_id: int,
     add_items: Optional[List[int]] = None,
     remove_items: Optional[List[int]] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """
@@ -84,7 +84,7 @@ async def adjust_recommended_items(
     
     # 构造响应数据
     package_items = []
-    for item in package.items:
+    for item in package.package_items:
         package_items.append({
             "id": item.id,
             "item_id": item.item_id,
@@ -116,24 +116,27 @@ async def get_examination_items(
     keyword: Optional[str] = None,
     limit: int = 50,
     offset: int = 0,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
     current_user = Depends(get_current_user)
 ):
     """
     获取体检项目列表接口
     - **category**: 项目分类（可选）
-    - **keyword**: 关键词搜索（可选）
+    - **keyword**: 关键词搜索（可选，在名称、分类、描述中检索，结果按相关度排序）
     - **limit**: 返回的记录数量，默认50
     - **offset**: 偏移量，默认0
+    - **cursor**: 上一页返回的 next_cursor（可选，传入时忽略 offset；翻页时 category、keyword 需与上一页一致）
     """
-    items = await recommendation_service.get_examination_items(
-        db, category, keyword, limit, offset
+    hits = await recommendation_service.search_examination_items(
+        db, category, keyword, limit, offset, cursor
     )
     
     # 构造响应数据
     response_data = []
-    for item in items:
-        response_data.append({
+    for hit in hits:
+        item = hit.item
+        item_data = {
             "id": item.id,
             "name": item.name,
             "description": item.description,
@@ -141,7 +144,11 @@ async def get_examination_items(
             "price": item.price,
             "duration": item.duration,
             "is_active": item.is_active
-        })
+        }
+        if keyword:
+            item_data["score"] = hit.score
+            item_data["highlights"] = hit.highlights
+        response_data.append(item_data)
     
     return user_schemas.ApiResponse(
         status="success",
@@ -150,7 +157,8 @@ async def get_examination_items(
             "items": response_data,
             "total": len(response_data),
             "limit": limit,
-            "offset": offset
+            "offset": offset,
+            "next_cursor": hits.next_cursor
         }
     )
 
@@ -158,7 +166,7 @@ async def get_examination_items(
 @handle_exceptions
 async def create_recommendation(
     request: Dict[str, Any] = Body(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """
@@ -207,17 +215,19 @@ async def create_recommendation(
 async def get_user_recommendations(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """
     获取用户推荐记录列表接口
     - **skip**: 跳过的记录数，默认0
     - **limit**: 返回的最大记录数，默认100
+    - **cursor**: 上一页返回的 next_cursor（可选，传入时忽略 skip）
     """
     # 获取用户推荐记录
     recommendations = await recommendation_service.get_user_recommendations(
-        db, current_user.id, skip, limit
+        db, current_user.id, skip, limit, cursor
     )
     
     # 构造响应数据
@@ -241,6 +251,7 @@ async def get_user_recommendations(
             "recommendations": response_data,
             "total": len(response_data),
             "skip": skip,
-            "limit": limit
+            "limit": limit,
+            "next_cursor": recommendations.next_cursor
         }
     )
\ No newline at end of file
@@ -1,13 +1,14 @@
 from fastapi import APIRouter, Depends, UploadFile, File
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import os
 import shutil
 from datetime import datetime
 from typing import Optional
 
-from utils.database import get_db
+from utils.database import get_async_db, get_async_read_db
 from utils.security import get_current_user
 from services import report_service
+from models import Appointment, ExaminationReport
 from schemas import user_schemas
 from utils.error_handler import handle_exceptions, CustomException
 
@@ -29,7 +30,7 @@ async def create_examination_report(
     appointment_id: int,
     report_data: dict,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """
@@ -39,7 +40,7 @@ async def create_examination_report(
     - **file**: 报告文件
     """
     # 检查预约是否属于当前用户
-    appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
+    appointment = await db.get(Appointment, appointment_id)
     if not appointment:
         raise CustomException(
             status_code=404,
@@ -98,7 +99,8 @@ async def get_user_reports(
     status: Optional[str] = None,
     limit: int = 50,
     offset: int = 0,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
     current_user = Depends(get_current_user)
 ):
     """
@@ -106,9 +108,10 @@ async def get_user_reports(
     - **status**: 报告状态（可选）：generated, interpreted, archived
     - **limit**: 返回的记录数量，默认50
     - **offset**: 偏移量，默认0
+    - **cursor**: 上一页返回的 next_cursor（可选，传入时忽略 offset）
     """
     reports = await report_service.get_user_reports(
-        db, current_user.id, status, limit, offset
+        db, current_user.id, status, limit, offset, cursor
     )
     
     # 构造响应数据
@@ -130,7 +133,8 @@ async def get_user_reports(
             "reports": response_data,
             "total": len(response_data),
             "limit": limit,
-            "offset": offset
+            "offset": offset,
+            "next_cursor": reports.next_cursor
         }
     )
 
@@ -138,7 +142,7 @@ async def get_user_reports(
 @handle_exceptions
 async def get_report_detail(
     report_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """
@@ -170,7 +174,7 @@ async def get_report_detail(
 async def update_report_status(
     report_id: int,
     new_status: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """
@@ -179,7 +183,7 @@ async def update_report_status(
     - **new_status**: 新状态：generated, interpreted, archived
     """
     # 先检查报告是否属于当前用户
-    report = db.query(ExaminationReport).filter(ExaminationReport.id == report_id).first()
+    report = await db.get(ExaminationReport, report_id)
     if not report:
         raise CustomException(
             status_code=404,
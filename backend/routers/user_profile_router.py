@@ -1,6 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 
 from models.user import User
@@ -14,8 +17,12 @@ from schemas.user_profile_schemas import (
 from schemas.user_schemas import ApiResponse
 from services.user_profile_service import UserProfileService
 from services.knowledge_base_service import KnowledgeBaseService
-from utils.database import get_db
+from services.symptom_knowledge_store import invalidate_symptom_knowledge
+from services.conversation_log import conversation_log
+from services.conversation_history_service import iter_conversation_history, parse_fields
+from utils.database import SessionLocal, get_db
 from utils.security import get_current_user
+from utils.error_handler import CustomException
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -280,6 +287,9 @@ async def get_conversation_history(
         if not user_id:
             raise HTTPException(status_code=401, detail="用户未认证")
         
+        # 先写入该用户缓冲中的对话历史，并从主库读取，保证刚产生的消息可见
+        await asyncio.to_thread(conversation_log.flush_user, user_id)
+        
         # 查询对话历史
         conversations = db.query(ConversationHistory).filter(
             ConversationHistory.user_id == user_id
@@ -306,6 +316,39 @@ async def get_conversation_history(
         raise HTTPException(status_code=500, detail="获取对话历史失败")
 
 
+@router.get("/conversation-history/stream")
+async def stream_conversation_history(
+    since: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    流式获取对话历史（NDJSON，每行一条记录，按时间正序）
+    - **since**: 只返回该时间及之后的记录（可选）
+    - **cursor**: 上次返回的 next_cursor，只返回其后的记录（可选）
+    - **fields**: 逗号分隔的返回字段（可选，默认全部；始终包含 id、created_at）
+    - **limit**: 最多返回的记录数（可选，默认不限）
+    
+    最后一行为 {"next_cursor": ...}，达到 limit 且还有更多记录时可用于继续获取，否则为 null
+    """
+    user_id = current_user.id
+    if not user_id:
+        raise HTTPException(status_code=401, detail="用户未认证")
+    
+    # 先写入该用户缓冲中的对话历史，并从主库读取，保证刚产生的消息可见
+    await asyncio.to_thread(conversation_log.flush_user, user_id)
+    
+    try:
+        lines = iter_conversation_history(
+            user_id, parse_fields(fields), since, cursor, limit, session_factory=SessionLocal
+        )
+    except CustomException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
 @router.delete("/conversation-history")
 async def clear_conversation_history(
     current_user: User = Depends(get_current_user),
@@ -319,6 +362,9 @@ async def clear_conversation_history(
         if not user_id:
             raise HTTPException(status_code=401, detail="用户未认证")
         
+        # 丢弃尚未写入的对话历史，再删除已写入的记录
+        await asyncio.to_thread(conversation_log.discard_user, user_id)
+        
         # 删除对话历史
         db.query(ConversationHistory).filter(
             ConversationHistory.user_id == user_id
@@ -424,6 +470,8 @@ async def create_symptom_knowledge(
         )
         db.add(new_symptom)
         db.commit()
+        # 症状知识库变化，重建内存索引
+        await invalidate_symptom_knowledge()
         
         return {"message": f"症状 {symptom} 知识创建成功"}
     except HTTPException:
@@ -466,6 +514,8 @@ async def update_symptom_knowledge(
         
         symptom_info.updated_at = datetime.utcnow()
         db.commit()
+        # 症状知识库变化，重建内存索引
+        await invalidate_symptom_knowledge()
         
         return {"message": f"症状 {symptom} 知识更新成功"}
     except HTTPException:
@@ -498,6 +548,8 @@ async def delete_symptom_knowledge(
         # 删除症状
         db.delete(symptom_info)
         db.commit()
+        # 症状知识库变化，重建内存索引
+        await invalidate_symptom_knowledge()
         
         return {"message": f"症状 {symptom} 知识删除成功"}
     except HTTPException:
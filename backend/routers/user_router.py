@@ -87,7 +87,7 @@ async def reset_password(
     - **new_password**: 新密码
     """
     # 验证当前密码
-    if not user_service.verify_password(reset_data.current_password, current_user.password_hash):
+    if not await user_service.verify_password_async(reset_data.current_password, current_user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail={
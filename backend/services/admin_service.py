@@ -0,0 +1,48 @@
+from sqlalchemy.orm import Session
+import logging
+
+from models import User
+from utils.security import invalidate_principal
+from utils.error_handler import (
+    CustomException,
+    handle_database_error,
+    log_error,
+    db_transaction
+)
+
+logger = logging.getLogger("app.services.admin")
+
+
+async def update_user_status(db: Session, user_id: int, is_active: bool) -> User or None:
+    """
+    更新用户状态（启用/禁用）
+    :param db: 数据库会话
+    :param user_id: 用户ID
+    :param is_active: 是否启用
+    :return: 更新后的用户对象，用户不存在时返回None
+    """
+    try:
+        async with db_transaction(db):
+            user = db.query(User).filter(User.id == user_id).first()
+            if not user:
+                return None
+
+            user.is_active = is_active
+            db.commit()
+            db.refresh(user)
+            # 状态变更后失效认证用户缓存，下一次请求读取最新状态
+            await invalidate_principal(user.username)
+
+            logger.info(f"用户状态更新成功: {user.username} (ID: {user.id}), 启用={is_active}")
+            return user
+
+    except CustomException as e:
+        raise
+    except Exception as e:
+        handle_database_error(db, e)
+        log_error("UpdateUserStatusError", f"更新用户状态失败: {str(e)}", exc_info=True)
+        raise CustomException(
+            status_code=500,
+            message="更新用户状态失败，请稍后重试",
+            error_type="UserStatusUpdateError"
+        )
@@ -1,14 +1,16 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, date, time
 import logging
 
 from models import User, Appointment, ExaminationItem
-from utils.error_handler import CustomException, handle_database_error, log_error, db_transaction
+from utils.error_handler import CustomException, handle_async_database_error, log_error, db_transaction
+from utils.pagination import CursorPage, paginate
 
 logger = logging.getLogger("app.services.appointment")
 
 async def create_appointment(
-    db: Session,
+    db: AsyncSession,
     user_id: int,
     hospital_id: int,
     department_id: int,
@@ -30,7 +32,7 @@ async def create_appointment(
     try:
         async with db_transaction(db):
             # 检查用户是否存在
-            user = db.query(User).filter(User.id == user_id).first()
+            user = await db.get(User, user_id)
             if not user:
                 raise CustomException(
                     status_code=404,
@@ -47,7 +49,8 @@ async def create_appointment(
                 )
             
             # 检查体检项目是否存在
-            items = db.query(ExaminationItem).filter(ExaminationItem.id.in_(examination_items)).all()
+            result = await db.execute(select(ExaminationItem).where(ExaminationItem.id.in_(examination_items)))
+            items = result.scalars().all()
             if len(items) != len(examination_items):
                 raise CustomException(
                     status_code=404,
@@ -72,8 +75,8 @@ async def create_appointment(
             )
             
             db.add(appointment)
-            db.commit()
-            db.refresh(appointment)
+            await db.commit()
+            await db.refresh(appointment)
             
             logger.info(f"用户创建体检预约: 用户ID={user_id}, 预约ID={appointment.id}")
             return appointment
@@ -81,7 +84,7 @@ async def create_appointment(
     except CustomException as e:
         raise
     except Exception as e:
-        handle_database_error(db, e)
+        await handle_async_database_error(db, e)
         log_error("CreateAppointmentError", f"创建预约失败: {str(e)}", exc_info=True)
         raise CustomException(
             status_code=500,
@@ -90,35 +93,41 @@ async def create_appointment(
         )
 
 async def get_user_appointments(
-    db: Session,
+    db: AsyncSession,
     user_id: int,
     status: str = None,
     limit: int = 50,
-    offset: int = 0
-) -> list[Appointment]:
+    offset: int = 0,
+    cursor: str = None
+) -> CursorPage:
     """
     获取用户预约列表
     :param db: 数据库会话
     :param user_id: 用户ID
     :param status: 预约状态（可选）
     :param limit: 返回的记录数量
-    :param offset: 偏移量
-    :return: 预约列表
+    :param offset: 偏移量（未传游标时使用）
+    :param cursor: 上一页返回的游标（可选）
+    :return: 预约列表，next_cursor 为下一页游标
     """
     try:
         # 构建查询
-        query = db.query(Appointment).filter(Appointment.user_id == user_id)
+        query = select(Appointment).where(Appointment.user_id == user_id)
         
         # 按状态筛选
         if status:
-            query = query.filter(Appointment.status == status)
+            query = query.where(Appointment.status == status)
         
         # 按创建时间倒序排序
-        appointments = query.order_by(Appointment.created_at.desc()).offset(offset).limit(limit).all()
+        appointments = await paginate(
+            db, query, (Appointment.created_at, Appointment.id), limit, offset, cursor
+        )
         
         logger.info(f"获取用户预约列表: 用户ID={user_id}, 数量={len(appointments)}")
         return appointments
         
+    except CustomException:
+        raise
     except Exception as e:
         log_error("GetUserAppointmentsError", f"获取用户预约列表失败: {str(e)}")
         raise CustomException(
@@ -128,7 +137,7 @@ async def get_user_appointments(
         )
 
 async def update_appointment_status(
-    db: Session,
+    db: AsyncSession,
     appointment_id: int,
     new_status: str
 ) -> Appointment:
@@ -142,7 +151,7 @@ async def update_appointment_status(
     try:
         async with db_transaction(db):
             # 检查预约是否存在
-            appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
+            appointment = await db.get(Appointment, appointment_id)
             if not appointment:
                 raise CustomException(
                     status_code=404,
@@ -163,8 +172,8 @@ async def update_appointment_status(
             appointment.status = new_status
             appointment.updated_at = datetime.now()
             
-            db.commit()
-            db.refresh(appointment)
+            await db.commit()
+            await db.refresh(appointment)
             
             logger.info(f"更新预约状态: 预约ID={appointment_id}, 新状态={new_status}")
             return appointment
@@ -172,7 +181,7 @@ async def update_appointment_status(
     except CustomException as e:
         raise
     except Exception as e:
-        handle_database_error(db, e)
+        await handle_async_database_error(db, e)
         log_error("UpdateAppointmentStatusError", f"更新预约状态失败: {str(e)}", exc_info=True)
         raise CustomException(
             status_code=500,
@@ -181,7 +190,7 @@ async def update_appointment_status(
         )
 
 async def cancel_appointment(
-    db: Session,
+    db: AsyncSession,
     appointment_id: int,
     user_id: int
 ) -> Appointment:
@@ -194,7 +203,7 @@ async def cancel_appointment(
     """
     try:
         # 检查预约是否存在
-        appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
+        appointment = await db.get(Appointment, appointment_id)
         if not appointment:
             raise CustomException(
                 status_code=404,
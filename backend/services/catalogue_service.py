@@ -0,0 +1,353 @@
+"""
+体检项目目录服务
+在进程内维护体检项目目录的只读快照（按ID、按分类、按名称排序），推荐与项目浏览直接读取快照，
+稳定状态下不再查询 examination_items 表。
+
+快照失效方式：
+1. 通过 ORM 新增/修改/删除体检项目并提交后，自动失效本进程快照，并经缓存模块通知其他进程
+2. 快照到期（CATALOGUE_REFRESH_INTERVAL）后比对目录指纹（条目数与最后更新时间），
+   只有指纹变化时才重新加载，用于兜底直接修改数据库等情况
+"""
+import asyncio
+import bisect
+import hashlib
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models import ExaminationItem
+from utils import config
+from utils.cache import cache, cached
+from utils.error_handler import CustomException, log_error
+from utils.ngram_index import Highlighter, NGramIndex
+from utils.pagination import CursorPage, decode_cursor, encode_cursor
+
+logger = logging.getLogger("app.services.catalogue")
+
+# 会话 info 中标记本事务修改过体检项目的键
+CATALOGUE_DIRTY_KEY = "catalogue_dirty"
+
+# 提交后触发的目录缓存失效任务，保留引用避免任务被回收
+_invalidation_tasks: Set[asyncio.Task] = set()
+
+# 关键词检索的字段权重
+SEARCH_FIELD_WEIGHTS = {"name": 3.0, "category": 2.0, "description": 1.0}
+
+
+class CatalogueItem:
+    """
+    体检项目快照条目
+    与 ExaminationItem 字段一致的只读对象，脱离数据库会话使用
+    """
+
+    __slots__ = ("id", "name", "description", "category", "price", "duration", "is_active", "updated_at")
+
+    def __init__(self, item: ExaminationItem):
+        self.id = item.id
+        self.name = item.name
+        self.description = item.description
+        self.category = item.category
+        self.price = item.price
+        self.duration = item.duration
+        self.is_active = item.is_active
+        self.updated_at = item.updated_at
+
+    def __repr__(self) -> str:
+        return f"<CatalogueItem id={self.id} name={self.name}>"
+
+
+class SearchHit:
+    """
+    体检项目检索结果
+    """
+
+    __slots__ = ("item", "score", "highlights")
+
+    def __init__(self, item: CatalogueItem, score: float = 0.0, highlights: Optional[Dict[str, str]] = None):
+        """
+        :param item: 项目快照条目
+        :param score: 相关度（无关键词时为 0）
+        :param highlights: {字段名: 带 <em> 标记的文本}，只包含有命中的字段
+        """
+        self.item = item
+        self.score = score
+        self.highlights = highlights or {}
+
+
+class CatalogueSnapshot:
+    """
+    体检项目目录快照
+    构建后不再修改，可在多个请求间安全共享
+    """
+
+    def __init__(self, items: List[CatalogueItem], source_fingerprint: Tuple):
+        """
+        :param items: 全部体检项目（含停用项目）
+        :param source_fingerprint: 构建时的目录指纹（条目数、最后更新时间），用于到期复核
+        """
+        self.source_fingerprint = source_fingerprint
+        self.by_id: Dict[int, CatalogueItem] = {item.id: item for item in items}
+        # 启用的项目按名称排序，分类列表保持同样的顺序
+        self.active_items: Tuple[CatalogueItem, ...] = tuple(
+            sorted((item for item in items if item.is_active), key=lambda item: (item.name, item.id))
+        )
+        by_category: Dict[str, List[CatalogueItem]] = {}
+        for item in self.active_items:
+            by_category.setdefault(item.category, []).append(item)
+        self.by_category: Dict[str, Tuple[CatalogueItem, ...]] = {
+            category: tuple(category_items) for category, category_items in by_category.items()
+        }
+        # 列表的排序键，游标分页时二分定位上一页最后一条之后的位置
+        self._sort_keys: Dict[Optional[str], List[Tuple[str, int]]] = {
+            category: [(item.name, item.id) for item in category_items]
+            for category, category_items in [(None, self.active_items), *self.by_category.items()]
+        }
+        # 启用项目的 n-gram 索引，按名称、分类、描述检索
+        # 相关度相同时名称短的在前，其次按名称、ID
+        by_name_length = sorted(range(len(self.active_items)), key=lambda position: len(self.active_items[position].name))
+        tie_breaker = [0] * len(self.active_items)
+        for rank, position in enumerate(by_name_length):
+            tie_breaker[position] = rank
+        self._search_index = NGramIndex(
+            [{"name": item.name, "category": item.category, "description": item.description} for item in self.active_items],
+            SEARCH_FIELD_WEIGHTS,
+            tie_breaker=tie_breaker
+        )
+        self._positions: Dict[int, int] = {item.id: position for position, item in enumerate(self.active_items)}
+        # 版本号由目录内容计算，各进程加载到相同目录时版本一致，可作为下游缓存键的一部分
+        digest = hashlib.sha1()
+        for item in sorted(items, key=lambda item: item.id):
+            digest.update(repr((item.id, item.name, item.category, item.price, item.is_active, item.updated_at)).encode("utf-8"))
+        self.version = digest.hexdigest()[:16]
+
+    def get(self, item_id: int) -> Optional[CatalogueItem]:
+        """
+        按ID获取项目（含停用项目）
+        :param item_id: 项目ID
+        :return: 项目快照条目，不存在时返回 None
+        """
+        return self.by_id.get(item_id)
+
+    def search(
+        self,
+        category: str = None,
+        keyword: str = None,
+        limit: int = 50,
+        offset: int = 0,
+        cursor: str = None
+    ) -> CursorPage:
+        """
+        按分类和关键词筛选启用的项目
+        :param category: 项目分类（可选）
+        :param keyword: 关键词（可选，在名称、分类、描述中检索，不区分大小写）
+        :param limit: 返回的记录数量
+        :param offset: 偏移量（未传游标时使用）
+        :param cursor: 上一页返回的游标（可选）
+        :return: 项目列表，有关键词时按相关度排序，否则按名称排序；next_cursor 为下一页游标
+        """
+        hits = self.search_hits(category, keyword, limit, offset, highlight=False, cursor=cursor)
+        return CursorPage((hit.item for hit in hits), hits.next_cursor)
+
+    def search_hits(
+        self,
+        category: str = None,
+        keyword: str = None,
+        limit: int = 50,
+        offset: int = 0,
+        highlight: bool = True,
+        cursor: str = None
+    ) -> CursorPage:
+        """
+        按分类和关键词检索启用的项目
+        有关键词时按 n-gram 相关度排序（名称权重最高，其次分类、描述），相关度相同时名称短的在前，其次按名称、ID
+        游标记录上一页最后一条的排序值：无关键词时为 (名称, ID)，有关键词时为 (相关度, 次序值)
+        :param category: 项目分类（可选）
+        :param keyword: 关键词（可选）
+        :param limit: 返回的记录数量
+        :param offset: 偏移量（未传游标时使用）
+        :param highlight: 是否生成高亮片段（只为返回的这一页生成）
+        :param cursor: 上一页返回的游标（可选）
+        :return: 检索结果列表，next_cursor 为下一页游标
+        """
+        if not keyword or not keyword.strip():
+            items = self.by_category.get(category, ()) if category else self.active_items
+            if cursor:
+                name, item_id = self._decode_cursor(cursor, str)
+                offset = bisect.bisect_right(self._sort_keys.get(category or None, []), (name, item_id))
+            page = items[offset:offset + limit]
+            next_cursor = None
+            if page and offset + limit < len(items):
+                next_cursor = encode_cursor([page[-1].name, page[-1].id])
+            return CursorPage((SearchHit(item) for item in page), next_cursor)
+
+        candidates = None
+        if category:
+            candidates = {self._positions[item.id] for item in self.by_category.get(category, ())}
+        if cursor:
+            page = self._search_index.search(keyword, candidates, limit=limit + 1, after=self._decode_cursor(cursor, float))
+        else:
+            page = self._search_index.search(keyword, candidates, limit=offset + limit + 1)[offset:]
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            position, score = page[-1]
+            next_cursor = encode_cursor([score, self._search_index.tie_rank(position)])
+        highlighter = Highlighter(keyword) if highlight else None
+        hits = CursorPage(next_cursor=next_cursor)
+        for position, score in page:
+            item = self.active_items[position]
+            highlights = highlighter.highlight_fields(
+                {"name": item.name, "category": item.category, "description": item.description}, SEARCH_FIELD_WEIGHTS
+            ) if highlighter else None
+            hits.append(SearchHit(item, round(score, 4), highlights))
+        return hits
+
+    @staticmethod
+    def _decode_cursor(cursor: str, key_type: type) -> Tuple:
+        # 列表游标的第一个值为名称，检索游标为相关度；游标与查询方式不符时视为无效
+        first, second = decode_cursor(cursor, 2)
+        valid_first = isinstance(first, str) if key_type is str else isinstance(first, (int, float)) and not isinstance(first, bool)
+        if not valid_first or not isinstance(second, int) or isinstance(second, bool):
+            raise CustomException(
+                status_code=400,
+                message="无效的分页游标",
+                error_type="InvalidCursor"
+            )
+        return first, second
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+
+# 当前快照，到期复核时用于比对指纹
+_current_snapshot: Optional[CatalogueSnapshot] = None
+# 本进程提交过项目变更后置位，下次加载跳过指纹比对直接重建
+_force_rebuild = False
+
+
+async def _fetch_fingerprint(db: AsyncSession) -> Tuple:
+    result = await db.execute(select(func.count(ExaminationItem.id), func.max(ExaminationItem.updated_at)))
+    count, last_updated = result.one()
+    return count, last_updated
+
+
+@cached("catalogue", ttl=config.CATALOGUE_REFRESH_INTERVAL, key_builder=lambda db: "snapshot", local_only=True)
+async def _load_snapshot(db: AsyncSession) -> CatalogueSnapshot:
+    global _current_snapshot, _force_rebuild
+
+    fingerprint = await _fetch_fingerprint(db)
+    if _current_snapshot is not None and not _force_rebuild and _current_snapshot.source_fingerprint == fingerprint:
+        return _current_snapshot
+
+    _force_rebuild = False
+    result = await db.execute(select(ExaminationItem))
+    items = [CatalogueItem(item) for item in result.scalars().all()]
+    snapshot = CatalogueSnapshot(items, fingerprint)
+    _current_snapshot = snapshot
+    logger.info(f"体检项目目录快照已重建: 版本={snapshot.version}, 项目数={len(snapshot)}, 启用={len(snapshot.active_items)}")
+    return snapshot
+
+
+async def get_catalogue(db: AsyncSession) -> CatalogueSnapshot:
+    """
+    获取体检项目目录快照
+    快照有效时直接返回，不访问数据库；并发请求同时触发重建时只会加载一次
+    :param db: 数据库会话（仅在需要复核或重建时使用）
+    :return: 目录快照
+    """
+    try:
+        return await _load_snapshot(db)
+    except Exception as e:
+        log_error("LoadCatalogueError", f"加载体检项目目录失败: {str(e)}", exc_info=True)
+        raise CustomException(
+            status_code=500,
+            message="加载体检项目目录失败，请稍后重试",
+            error_type="CatalogueLoadError"
+        )
+
+
+def load_catalogue(db: Session) -> CatalogueSnapshot:
+    """
+    直接从数据库构建目录快照（同步，不读取也不替换进程内快照）
+    供离线任务（如批量生成推荐）使用
+    :param db: 同步数据库会话
+    :return: 目录快照
+    """
+    count, last_updated = db.execute(
+        select(func.count(ExaminationItem.id), func.max(ExaminationItem.updated_at))
+    ).one()
+    items = [CatalogueItem(item) for item in db.scalars(select(ExaminationItem))]
+    return CatalogueSnapshot(items, (count, last_updated))
+
+
+async def invalidate_catalogue() -> None:
+    """
+    失效目录快照（所有进程）
+    下次访问时重新加载
+    """
+    global _force_rebuild
+    _force_rebuild = True
+    await _load_snapshot.invalidate_all()
+
+
+def _mark_local_stale() -> None:
+    global _force_rebuild
+    _force_rebuild = True
+    cache.local.delete_prefix(cache.make_key(_load_snapshot.namespace))
+
+
+def _on_cache_invalidated(target: str) -> None:
+    # 其他进程失效目录时同样跳过指纹比对，保证重建
+    global _force_rebuild
+    if target.startswith(cache.make_key(_load_snapshot.namespace)):
+        _force_rebuild = True
+
+
+cache.add_invalidation_listener(_on_cache_invalidated)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_item_changes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, ExaminationItem):
+            session.info[CATALOGUE_DIRTY_KEY] = True
+            return
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_bulk_item_changes(orm_execute_state):
+    # update()/delete()/insert() 语句不经过 flush，单独识别
+    if orm_execute_state.is_select:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ is ExaminationItem:
+        orm_execute_state.session.info[CATALOGUE_DIRTY_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    if not session.info.pop(CATALOGUE_DIRTY_KEY, False):
+        return
+    _mark_local_stale()
+    # 在事件循环中提交时同时通知其他进程；同步上下文中只失效本进程，其他进程依靠到期复核
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    task = loop.create_task(invalidate_catalogue())
+    _invalidation_tasks.add(task)
+    task.add_done_callback(_invalidation_done)
+
+
+def _invalidation_done(task: asyncio.Task) -> None:
+    _invalidation_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"体检项目目录缓存失效失败: {str(task.exception())}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_item_changes(session):
+    session.info.pop(CATALOGUE_DIRTY_KEY, None)
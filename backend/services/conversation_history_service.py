@@ -0,0 +1,115 @@
+"""
+对话历史流式导出
+按 (created_at, id) 正序逐批读取对话历史并逐行输出 NDJSON，内存占用与历史长度无关：
+
+- 只查询请求的字段，未请求 response_data、extracted_entities 等 JSON 列时不读取
+- 行以 yield_per 分批获取（PostgreSQL 使用服务端游标），每批序列化后即可发送
+- 可按 since（起始时间）和 cursor（上次导出返回的游标）筛选，最后一行为 {"next_cursor": ...}
+"""
+import json
+import logging
+from datetime import datetime
+from typing import Callable, Iterator, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models.user_profile import ConversationHistory
+from utils import config
+from utils.database import create_read_session
+from utils.error_handler import CustomException
+from utils.pagination import cursor_condition, row_cursor, sort_keys
+
+logger = logging.getLogger("app.services.conversation_history")
+
+# 可导出的字段，顺序即输出顺序
+HISTORY_FIELDS = (
+    "id", "message", "sender", "main_step", "sub_step", "is_ai_sub_process",
+    "extracted_entities", "response_data", "created_at"
+)
+
+_SORT_COLUMNS = (ConversationHistory.created_at, ConversationHistory.id)
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """
+    解析字段投影参数
+    :param fields: 逗号分隔的字段名，为空时导出全部字段
+    :return: 字段名列表，始终包含 id 和 created_at（用于生成游标）
+    """
+    if not fields or not fields.strip():
+        return list(HISTORY_FIELDS)
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested.difference(HISTORY_FIELDS)
+    if unknown:
+        raise CustomException(
+            status_code=400,
+            message=f"不支持的字段: {', '.join(sorted(unknown))}",
+            error_type="InvalidFields"
+        )
+    requested.update(("id", "created_at"))
+    return [name for name in HISTORY_FIELDS if name in requested]
+
+
+def _to_json(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+
+def iter_conversation_history(
+    user_id: int,
+    fields: List[str],
+    since: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    batch_size: int = None,
+    session_factory: Callable[[], Session] = create_read_session
+) -> Iterator[str]:
+    """
+    流式导出用户的对话历史
+    查询条件（含游标）在调用时校验，开始输出前即可返回 400；返回的迭代器自行打开会话，
+    在响应发送完毕或客户端断开后关闭
+    :param user_id: 用户ID
+    :param fields: 导出的字段（parse_fields 的结果）
+    :param since: 只导出该时间及之后的记录（可选）
+    :param cursor: 上次导出返回的游标，只导出其后的记录（可选）
+    :param limit: 最多导出的记录数（可选）
+    :param batch_size: 每批读取的行数
+    :param session_factory: 会话工厂，默认使用只读会话（可能读到副本上的延迟数据）
+    :return: NDJSON 行的迭代器
+    """
+    query = select(*(getattr(ConversationHistory, name) for name in fields)).where(
+        ConversationHistory.user_id == user_id
+    )
+    if since is not None:
+        query = query.where(ConversationHistory.created_at >= since)
+    if cursor:
+        query = query.where(cursor_condition(_SORT_COLUMNS, cursor, descending=False))
+    query = query.order_by(*sort_keys(_SORT_COLUMNS))
+    if limit is not None:
+        query = query.limit(limit + 1)
+    query = query.execution_options(yield_per=batch_size or config.CONVERSATION_HISTORY_STREAM_BATCH_SIZE)
+    return _stream(user_id, query, limit, session_factory)
+
+
+def _stream(user_id: int, query, limit: Optional[int], session_factory: Callable[[], Session]) -> Iterator[str]:
+    count = 0
+    last = None
+    next_cursor = None
+    db = session_factory()
+    try:
+        rows = db.execute(query)
+        for row in rows:
+            if limit is not None and count >= limit:
+                # 多取的一行说明还有更多记录
+                next_cursor = row_cursor(last, _SORT_COLUMNS)
+                break
+            yield json.dumps(row._asdict(), ensure_ascii=False, default=_to_json) + "\n"
+            last = row
+            count += 1
+        rows.close()
+    finally:
+        db.close()
+    logger.info(f"导出对话历史: 用户ID={user_id}, 数量={count}")
+    yield json.dumps({"next_cursor": next_cursor}) + "\n"
@@ -0,0 +1,251 @@
+"""
+对话历史异步批量写入
+对话接口只把 ConversationHistory 记录放入内存缓冲区，由后台线程按条数/时间阈值批量插入，
+写历史不再占用对话请求的提交耗时。应用关闭时会写入剩余记录；测试或需要立即可见时调用 flush()。
+
+批量插入因数据错误（违反非空、外键等约束）失败时改为逐条写入，单独写入仍失败的记录移入死信列表并记录日志，
+不会阻塞其他记录；数据库不可用等其他错误时整批放回缓冲区，下次重试。
+"""
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from models.user_profile import ConversationHistory
+from utils import config
+from utils.database import SessionLocal
+from utils.metrics import Counter
+
+logger = logging.getLogger("app.services.conversation_log")
+
+# 由记录本身数据导致的写入错误，重试不会成功
+ROW_ERRORS = (IntegrityError, DataError)
+
+
+class ConversationLog:
+    """
+    对话历史写入缓冲区
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+        max_pending: int = 10000,
+        session_factory=SessionLocal,
+        max_dead_letters: int = 1000
+    ):
+        """
+        :param batch_size: 缓冲达到该条数时唤醒后台线程写入
+        :param flush_interval: 最长缓冲时间(秒)
+        :param max_pending: 缓冲上限，写入失败回填时超出部分丢弃
+        :param session_factory: 数据库会话工厂
+        :param max_dead_letters: 死信列表最多保留的记录数
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.session_factory = session_factory
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        # 保证同一时间只有一个批次在写入，discard_user 等操作可等待写入完成
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # 无法写入的记录及错误信息，仅保留最近的 max_dead_letters 条
+        self.dead_letters = deque(maxlen=max_dead_letters)
+        self.rows_written = Counter()
+        self.batches_written = Counter()
+        self.flush_failures = Counter()
+        self.rows_dropped = Counter()
+        self.rows_dead_lettered = Counter()
+
+    def append(self, **fields) -> None:
+        """
+        记录一条对话历史
+        :param fields: ConversationHistory 的列值，未提供 created_at 时使用当前时间
+        """
+        fields.setdefault("created_at", datetime.utcnow())
+        with self._lock:
+            self._pending.append(fields)
+            pending = len(self._pending)
+        if pending >= self.batch_size:
+            if self._thread is not None:
+                self._wakeup.set()
+            else:
+                # 未启动后台线程（如脚本中使用）时直接写入
+                self.flush()
+
+    def flush(self) -> int:
+        """
+        立即写入缓冲区中的全部记录
+        :return: 写入的记录数
+        """
+        with self._flush_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+            return self._write(rows)
+
+    def flush_user(self, user_id: int) -> int:
+        """
+        立即写入指定用户缓冲中的记录（读取该用户的对话历史前调用）
+        会等待正在进行的写入完成，返回时该用户此前追加的记录均已提交；会阻塞，异步代码中应在线程中调用
+        :param user_id: 用户ID
+        :return: 写入的记录数
+        """
+        with self._flush_lock:
+            with self._lock:
+                rows = [row for row in self._pending if row.get("user_id") == user_id]
+                if rows:
+                    self._pending = [row for row in self._pending if row.get("user_id") != user_id]
+            return self._write(rows)
+
+    def _write(self, rows: List[Dict[str, Any]]) -> int:
+        if not rows:
+            return 0
+        try:
+            self._insert(rows)
+        except ROW_ERRORS as e:
+            self.flush_failures.inc()
+            logger.warning(f"批量写入对话历史失败，{len(rows)}条记录改为逐条写入: {str(e)}")
+            written = self._insert_each(rows)
+        except Exception as e:
+            self.flush_failures.inc()
+            self._requeue(rows)
+            logger.error(f"批量写入对话历史失败，{len(rows)}条记录将在下次重试: {str(e)}")
+            return 0
+        else:
+            written = len(rows)
+        self.rows_written.inc(written)
+        self.batches_written.inc()
+        return written
+
+    def _insert(self, rows: List[Dict[str, Any]]) -> None:
+        db = self.session_factory()
+        try:
+            db.execute(insert(ConversationHistory), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _insert_each(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        逐条写入批量插入失败的记录
+        数据错误的记录移入死信列表；遇到其他错误时停止，剩余记录放回缓冲区
+        :return: 写入的记录数
+        """
+        written = 0
+        for index, row in enumerate(rows):
+            try:
+                self._insert([row])
+            except ROW_ERRORS as e:
+                self.dead_letters.append({"row": row, "error": str(e)})
+                self.rows_dead_lettered.inc()
+                logger.error(
+                    f"对话历史记录无法写入，已移入死信列表: user_id={row.get('user_id')}, "
+                    f"sender={row.get('sender')}, 错误={str(e)}"
+                )
+            except Exception as e:
+                self._requeue(rows[index:])
+                logger.error(f"逐条写入对话历史失败，{len(rows) - index}条记录将在下次重试: {str(e)}")
+                break
+            else:
+                written += 1
+        return written
+
+    def _requeue(self, rows: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            merged = rows + self._pending
+            overflow = len(merged) - self.max_pending
+            if overflow > 0:
+                # 数据库持续不可用时丢弃最旧的记录，避免内存无限增长
+                merged = merged[overflow:]
+                self.rows_dropped.inc(overflow)
+                logger.error(f"对话历史缓冲区已满，丢弃{overflow}条最旧的记录")
+            self._pending = merged
+
+    def discard_user(self, user_id: int) -> int:
+        """
+        丢弃指定用户尚未写入的记录（清除对话历史时使用）
+        会等待正在进行的写入完成，避免已取出的记录在删除之后才落库；会阻塞，异步代码中应在线程中调用
+        :param user_id: 用户ID
+        :return: 丢弃的记录数
+        """
+        with self._flush_lock:
+            with self._lock:
+                kept = [row for row in self._pending if row.get("user_id") != user_id]
+                discarded = len(self._pending) - len(kept)
+                self._pending = kept
+            return discarded
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"对话历史写入线程异常: {str(e)}", exc_info=True)
+
+    def start(self) -> None:
+        """
+        启动后台写入线程
+        应用启动时调用
+        """
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="conversation-log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        停止后台写入线程并写入剩余记录
+        应用关闭时调用
+        :param timeout: 等待线程退出的最长时间(秒)
+        """
+        if self._thread is not None:
+            self._stopping.set()
+            self._wakeup.set()
+            self._thread.join(timeout)
+            self._thread = None
+        written = self.flush()
+        if self.pending:
+            logger.error(f"应用关闭时仍有{self.pending}条对话历史未能写入")
+        elif written:
+            logger.info(f"应用关闭前写入剩余对话历史: {written}条")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取写入状态
+        :return: 缓冲条数、已写入条数/批次、失败、丢弃与死信条数
+        """
+        return {
+            "pending": self.pending,
+            "rows_written": self.rows_written.value,
+            "batches_written": self.batches_written.value,
+            "flush_failures": self.flush_failures.value,
+            "rows_dropped": self.rows_dropped.value,
+            "rows_dead_lettered": self.rows_dead_lettered.value,
+            "dead_letters": len(self.dead_letters)
+        }
+
+
+# 全局对话历史写入缓冲区
+conversation_log = ConversationLog(
+    batch_size=config.CONVERSATION_LOG_BATCH_SIZE,
+    flush_interval=config.CONVERSATION_LOG_FLUSH_INTERVAL,
+    max_pending=config.CONVERSATION_LOG_MAX_PENDING
+)
@@ -0,0 +1,294 @@
+"""
+用户画像问卷流程状态存储
+问卷进行中的状态（当前步骤、已完成步骤、动态追问进度、已填写数据）保存在内存或 Redis 中，
+每一轮问答只读写存储，不再逐轮提交 questionnaire_progress 表。
+
+状态在以下时机写入数据库（检查点）：
+1. 主流程步骤完成、跳过、重置、动态追问结束或画像生成时，由流程服务同步写入
+2. 未写入数据库的状态空闲超过 FLOW_STATE_IDLE_CHECKPOINT 秒后，由后台线程写入
+3. 应用关闭时写入全部未持久化的状态
+
+状态字典格式：
+    {"current_step": str, "completed_steps": [str], "current_state": str, "session_data": dict,
+     "dirty": bool, "touched_at": float}
+"""
+import copy
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from utils import config
+from utils.metrics import Counter
+
+try:
+    import redis
+except ImportError:  # redis 为可选依赖
+    redis = None
+
+logger = logging.getLogger("app.services.flow_state")
+
+
+class MemoryFlowStateStore:
+    """
+    进程内流程状态存储
+    适用于单进程部署；读写均返回副本，调用方修改状态后需显式写回
+    """
+
+    def __init__(self, ttl: float = 86400.0):
+        """
+        :param ttl: 状态保留时间(秒)，超过后读取时视为不存在
+        """
+        self.ttl = ttl
+        self._states: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            state = self._states.get(user_id)
+            if state is None:
+                return None
+            if time.time() - state["touched_at"] >= self.ttl:
+                # 过期前未写入数据库的状态由空闲检查点保证已持久化
+                del self._states[user_id]
+                return None
+            return copy.deepcopy(state)
+
+    def set(self, user_id: int, state: Dict[str, Any]) -> None:
+        with self._lock:
+            self._states[user_id] = copy.deepcopy(state)
+
+    def delete(self, user_id: int) -> None:
+        with self._lock:
+            self._states.pop(user_id, None)
+
+    def idle_dirty_users(self, idle_seconds: float) -> List[int]:
+        """
+        获取空闲超过指定时间且未写入数据库的用户
+        :param idle_seconds: 空闲时间(秒)，为 0 时返回全部未持久化的用户
+        :return: 用户ID列表
+        """
+        threshold = time.time() - idle_seconds
+        with self._lock:
+            return [
+                user_id for user_id, state in self._states.items()
+                if state.get("dirty") and state["touched_at"] <= threshold
+            ]
+
+    def mark_clean(self, user_id: int, touched_at: float) -> None:
+        """
+        标记状态已写入数据库
+        写入期间状态又被修改（touched_at 变化）时保持未持久化标记
+        :param user_id: 用户ID
+        :param touched_at: 写入数据库的那份状态的修改时间
+        """
+        with self._lock:
+            state = self._states.get(user_id)
+            if state is not None and state["touched_at"] == touched_at:
+                state["dirty"] = False
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+
+class RedisFlowStateStore:
+    """
+    Redis 流程状态存储
+    多进程部署时使用，同一用户的请求落到任意进程都能读到最新状态。
+    未持久化的用户记录在有序集合中（分值为修改时间），空闲检查点按分值范围查询
+    """
+
+    def __init__(self, client: Any, key_prefix: str = "hes", ttl: float = 86400.0):
+        """
+        :param client: 同步 Redis 客户端
+        :param key_prefix: 键前缀
+        :param ttl: 状态保留时间(秒)
+        """
+        self.client = client
+        self.ttl = int(ttl)
+        self.key_prefix = key_prefix
+        self.dirty_key = f"{key_prefix}:flow_state:dirty"
+
+    def _key(self, user_id: int) -> str:
+        return f"{self.key_prefix}:flow_state:{user_id}"
+
+    def _decode(self, user_id: int, raw: Optional[bytes]) -> Optional[Dict[str, Any]]:
+        if raw is None:
+            return None
+        try:
+            return json.loads(raw)
+        except ValueError:
+            logger.warning(f"流程状态无法解析，已忽略: 用户ID={user_id}")
+            return None
+
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        return self._decode(user_id, self.client.get(self._key(user_id)))
+
+    def set(self, user_id: int, state: Dict[str, Any]) -> None:
+        pipe = self.client.pipeline()
+        self._write(pipe, user_id, state)
+        pipe.execute()
+
+    def _write(self, pipe: Any, user_id: int, state: Dict[str, Any]) -> None:
+        pipe.set(self._key(user_id), json.dumps(state, ensure_ascii=False, default=str), ex=self.ttl)
+        if state.get("dirty"):
+            pipe.zadd(self.dirty_key, {str(user_id): state["touched_at"]})
+        else:
+            pipe.zrem(self.dirty_key, str(user_id))
+
+    def delete(self, user_id: int) -> None:
+        pipe = self.client.pipeline()
+        pipe.delete(self._key(user_id))
+        pipe.zrem(self.dirty_key, str(user_id))
+        pipe.execute()
+
+    def idle_dirty_users(self, idle_seconds: float) -> List[int]:
+        threshold = time.time() - idle_seconds
+        return [int(member) for member in self.client.zrangebyscore(self.dirty_key, "-inf", threshold)]
+
+    def mark_clean(self, user_id: int, touched_at: float) -> None:
+        """
+        标记状态已写入数据库
+        读取和写回在 WATCH 事务中完成：期间状态被其他请求修改时事务不执行，新状态及其未持久化标记保持不变
+        :param user_id: 用户ID
+        :param touched_at: 写入数据库的那份状态的修改时间
+        """
+        key = self._key(user_id)
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                state = self._decode(user_id, pipe.get(key))
+                if state is not None and state.get("touched_at") != touched_at:
+                    return
+                pipe.multi()
+                if state is None:
+                    pipe.zrem(self.dirty_key, str(user_id))
+                else:
+                    state["dirty"] = False
+                    self._write(pipe, user_id, state)
+                pipe.execute()
+            except redis.WatchError:
+                logger.debug(f"流程状态在写入数据库期间被修改，保持未持久化: 用户ID={user_id}")
+
+    def __len__(self) -> int:
+        return self.client.zcard(self.dirty_key)
+
+
+def create_flow_state_store():
+    """
+    按配置创建流程状态存储
+    FLOW_STATE_BACKEND 为 redis（或留空且配置了 REDIS_URL）时使用 Redis，否则使用进程内存储
+    :return: 流程状态存储
+    """
+    backend = config.FLOW_STATE_BACKEND or ("redis" if config.REDIS_URL else "memory")
+    if backend == "redis":
+        if redis is None or not config.REDIS_URL:
+            logger.warning("流程状态存储配置为 redis，但 redis 依赖或 REDIS_URL 不可用，改用进程内存储")
+        else:
+            client = redis.Redis.from_url(
+                config.REDIS_URL,
+                socket_timeout=config.REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=config.REDIS_SOCKET_TIMEOUT
+            )
+            return RedisFlowStateStore(client, key_prefix=config.CACHE_KEY_PREFIX, ttl=config.FLOW_STATE_TTL)
+    return MemoryFlowStateStore(ttl=config.FLOW_STATE_TTL)
+
+
+class FlowStateCheckpointer:
+    """
+    空闲流程状态检查点线程
+    定期把空闲的未持久化状态写入数据库，保证进程退出或状态过期时不丢失问卷进度
+    """
+
+    def __init__(
+        self,
+        store,
+        checkpoint: Callable[[int, Dict[str, Any]], None],
+        idle_seconds: float = 300.0,
+        interval: Optional[float] = None
+    ):
+        """
+        :param store: 流程状态存储
+        :param checkpoint: 写入单个用户状态的函数，参数为用户ID和状态字典
+        :param idle_seconds: 状态空闲超过该时间(秒)后写入
+        :param interval: 扫描间隔(秒)，默认为空闲时间的一半（最长 60 秒）
+        """
+        self.store = store
+        self.checkpoint = checkpoint
+        self.idle_seconds = idle_seconds
+        self.interval = interval if interval is not None else max(1.0, min(idle_seconds / 2, 60.0))
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.checkpoints_written = Counter()
+        self.checkpoint_failures = Counter()
+
+    def run_once(self, idle_seconds: Optional[float] = None) -> int:
+        """
+        写入一次空闲状态
+        :param idle_seconds: 空闲时间(秒)，默认使用初始化时的配置；为 0 时写入全部未持久化状态
+        :return: 写入的状态数
+        """
+        idle_seconds = self.idle_seconds if idle_seconds is None else idle_seconds
+        written = 0
+        for user_id in self.store.idle_dirty_users(idle_seconds):
+            state = self.store.get(user_id)
+            if state is None or not state.get("dirty"):
+                continue
+            try:
+                self.checkpoint(user_id, state)
+                self.store.mark_clean(user_id, state["touched_at"])
+            except Exception as e:
+                self.checkpoint_failures.inc()
+                logger.error(f"写入问卷流程状态失败，将在下次重试: 用户ID={user_id}, 错误={str(e)}")
+                continue
+            written += 1
+        if written:
+            self.checkpoints_written.inc(written)
+        return written
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"问卷流程状态检查点线程异常: {str(e)}", exc_info=True)
+
+    def start(self) -> None:
+        """
+        启动后台检查点线程
+        应用启动时调用
+        """
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="flow-state-checkpointer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        停止后台线程并写入全部未持久化的状态
+        应用关闭时调用
+        :param timeout: 等待线程退出的最长时间(秒)
+        """
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join(timeout)
+            self._thread = None
+        try:
+            written = self.run_once(idle_seconds=0)
+        except Exception as e:
+            logger.error(f"应用关闭时写入问卷流程状态失败: {str(e)}")
+            return
+        if written:
+            logger.info(f"应用关闭前写入问卷流程状态: {written}个")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "checkpoints_written": self.checkpoints_written.value,
+            "checkpoint_failures": self.checkpoint_failures.value
+        }
+
+
+# 全局流程状态存储
+flow_state_store = create_flow_state_store()
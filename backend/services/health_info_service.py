@@ -1,14 +1,15 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 import logging
 
 from models import User, UserProfile, HealthInfo, MedicalReport, UserPortrait
-from utils.error_handler import CustomException, handle_database_error, log_error, db_transaction
+from utils.error_handler import CustomException, handle_async_database_error, log_error, db_transaction
 
 logger = logging.getLogger("app.services.health_info")
 
 async def submit_health_info(
-    db: Session,
+    db: AsyncSession,
     user_id: int,
     health_data: dict
 ) -> HealthInfo:
@@ -22,7 +23,7 @@ async def submit_health_info(
     try:
         async with db_transaction(db):
             # 检查用户是否存在
-            user = db.query(User).filter(User.id == user_id).first()
+            user = await db.get(User, user_id)
             if not user:
                 raise CustomException(
                     status_code=404,
@@ -47,18 +48,19 @@ async def submit_health_info(
             )
             
             # 检查是否已存在健康信息，如果有则更新，没有则创建
-            existing_health_info = db.query(HealthInfo).filter(HealthInfo.user_id == user_id).first()
+            result = await db.execute(select(HealthInfo).where(HealthInfo.user_id == user_id))
+            existing_health_info = result.scalars().first()
             if existing_health_info:
                 for key, value in health_info.__dict__.items():
                     if key != "id" and value is not None:
                         setattr(existing_health_info, key, value)
-                db.commit()
-                db.refresh(existing_health_info)
+                await db.commit()
+                await db.refresh(existing_health_info)
                 health_info = existing_health_info
             else:
                 db.add(health_info)
-                db.commit()
-                db.refresh(health_info)
+                await db.commit()
+                await db.refresh(health_info)
             
             logger.info(f"用户提交健康信息: 用户ID={user_id}")
             return health_info
@@ -66,7 +68,7 @@ async def submit_health_info(
     except CustomException as e:
         raise
     except Exception as e:
-        handle_database_error(db, e)
+        await handle_async_database_error(db, e)
         log_error("SubmitHealthInfoError", f"提交健康信息失败: {str(e)}", exc_info=True)
         raise CustomException(
             status_code=500,
@@ -75,7 +77,7 @@ async def submit_health_info(
         )
 
 async def upload_medical_report(
-    db: Session,
+    db: AsyncSession,
     user_id: int,
     report_url: str,
     report_date: datetime,
@@ -93,7 +95,7 @@ async def upload_medical_report(
     try:
         async with db_transaction(db):
             # 检查用户是否存在
-            user = db.query(User).filter(User.id == user_id).first()
+            user = await db.get(User, user_id)
             if not user:
                 raise CustomException(
                     status_code=404,
@@ -111,8 +113,8 @@ async def upload_medical_report(
             )
             
             db.add(medical_report)
-            db.commit()
-            db.refresh(medical_report)
+            await db.commit()
+            await db.refresh(medical_report)
             
             logger.info(f"用户上传体检报告: 用户ID={user_id}, 报告ID={medical_report.id}")
             return medical_report
@@ -120,7 +122,7 @@ async def upload_medical_report(
     except CustomException as e:
         raise
     except Exception as e:
-        handle_database_error(db, e)
+        await handle_async_database_error(db, e)
         log_error("UploadMedicalReportError", f"上传体检报告失败: {str(e)}", exc_info=True)
         raise CustomException(
             status_code=500,
@@ -129,7 +131,7 @@ async def upload_medical_report(
         )
 
 async def update_health_info(
-    db: Session,
+    db: AsyncSession,
     user_id: int,
     health_data: dict
 ) -> HealthInfo:
@@ -143,7 +145,7 @@ async def update_health_info(
     try:
         async with db_transaction(db):
             # 检查用户是否存在
-            user = db.query(User).filter(User.id == user_id).first()
+            user = await db.get(User, user_id)
             if not user:
                 raise CustomException(
                     status_code=404,
@@ -152,7 +154,8 @@ async def update_health_info(
                 )
             
             # 查找现有的健康信息记录
-            existing_health_info = db.query(HealthInfo).filter(HealthInfo.user_id == user_id).first()
+            result = await db.execute(select(HealthInfo).where(HealthInfo.user_id == user_id))
+            existing_health_info = result.scalars().first()
             
             if existing_health_info:
                 # 更新现有记录
@@ -160,8 +163,8 @@ async def update_health_info(
                     if hasattr(existing_health_info, key) and value is not None:
                         setattr(existing_health_info, key, value)
                 existing_health_info.updated_at = datetime.now()
-                db.commit()
-                db.refresh(existing_health_info)
+                await db.commit()
+                await db.refresh(existing_health_info)
                 health_info = existing_health_info
             else:
                 # 创建新的健康信息记录
@@ -180,8 +183,8 @@ async def update_health_info(
                     updated_at=datetime.now()
                 )
                 db.add(health_info)
-                db.commit()
-                db.refresh(health_info)
+                await db.commit()
+                await db.refresh(health_info)
             
             logger.info(f"用户更新健康信息: 用户ID={user_id}")
             return health_info
@@ -189,7 +192,7 @@ async def update_health_info(
     except CustomException as e:
         raise
     except Exception as e:
-        handle_database_error(db, e)
+        await handle_async_database_error(db, e)
         log_error("UpdateHealthInfoError", f"更新健康信息失败: {str(e)}", exc_info=True)
         raise CustomException(
             status_code=500,
@@ -198,7 +201,7 @@ async def update_health_info(
         )
 
 async def get_user_health_info(
-    db: Session,
+    db: AsyncSession,
     user_id: int
 ) -> HealthInfo:
     """
@@ -209,7 +212,7 @@ async def get_user_health_info(
     """
     try:
         # 检查用户是否存在
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await db.get(User, user_id)
         if not user:
             raise CustomException(
                 status_code=404,
@@ -218,7 +221,8 @@ async def get_user_health_info(
             )
         
         # 获取用户健康信息
-        health_info = db.query(HealthInfo).filter(HealthInfo.user_id == user_id).first()
+        result = await db.execute(select(HealthInfo).where(HealthInfo.user_id == user_id))
+        health_info = result.scalars().first()
         
         if not health_info:
             raise CustomException(
@@ -240,7 +244,7 @@ async def get_user_health_info(
         )
 
 async def generate_user_portrait(
-    db: Session,
+    db: AsyncSession,
     user_id: int
 ) -> UserPortrait:
     """
@@ -251,7 +255,7 @@ async def generate_user_portrait(
     """
     try:
         # 检查用户是否存在
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await db.get(User, user_id)
         if not user:
             raise CustomException(
                 status_code=404,
@@ -260,8 +264,10 @@ async def generate_user_portrait(
             )
             
         # 获取用户健康信息和体检报告
-        health_info = db.query(HealthInfo).filter(HealthInfo.user_id == user_id).first()
-        medical_reports = db.query(MedicalReport).filter(MedicalReport.user_id == user_id).all()
+        result = await db.execute(select(HealthInfo).where(HealthInfo.user_id == user_id))
+        health_info = result.scalars().first()
+        result = await db.execute(select(MedicalReport).where(MedicalReport.user_id == user_id))
+        medical_reports = result.scalars().all()
         
         # 这里应该有更复杂的用户画像生成逻辑
         # 为了演示，我们简单地创建一个用户画像
@@ -269,7 +275,8 @@ async def generate_user_portrait(
         recommended_frequency = "每年一次"
         
         # 检查是否已存在用户画像，如果有则更新，没有则创建
-        user_portrait = db.query(UserPortrait).filter(UserPortrait.user_id == user_id).first()
+        result = await db.execute(select(UserPortrait).where(UserPortrait.user_id == user_id))
+        user_portrait = result.scalars().first()
         
         if user_portrait:
             # 更新用户画像
@@ -286,8 +293,8 @@ async def generate_user_portrait(
             )
             db.add(user_portrait)
         
-        db.commit()
-        db.refresh(user_portrait)
+        await db.commit()
+        await db.refresh(user_portrait)
         
         logger.info(f"生成用户画像: 用户ID={user_id}")
         return user_portrait
@@ -1,14 +1,15 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 import logging
 
 from models import Interaction, User
-from utils.error_handler import CustomException, handle_database_error, log_error, db_transaction
+from utils.error_handler import CustomException, handle_async_database_error, log_error, db_transaction
 
 logger = logging.getLogger("app.services.interaction")
 
 async def send_text_message(
-    db: Session,
+    db: AsyncSession,
     user_id: int,
     message_content: str
 ) -> Interaction:
@@ -22,7 +23,7 @@ async def send_text_message(
     try:
         async with db_transaction(db):
             # 检查用户是否存在
-            user = db.query(User).filter(User.id == user_id).first()
+            user = await db.get(User, user_id)
             if not user:
                 raise CustomException(
                     status_code=404,
@@ -40,8 +41,8 @@ async def send_text_message(
             )
             
             db.add(interaction)
-            db.commit()
-            db.refresh(interaction)
+            await db.commit()
+            await db.refresh(interaction)
             
             logger.info(f"用户发送文字消息: 用户ID={user_id}")
             return interaction
@@ -49,7 +50,7 @@ async def send_text_message(
     except CustomException as e:
         raise
     except Exception as e:
-        handle_database_error(db, e)
+        await handle_async_database_error(db, e)
         log_error("SendTextMessageError", f"发送文字消息失败: {str(e)}", exc_info=True)
         raise CustomException(
             status_code=500,
@@ -58,7 +59,7 @@ async def send_text_message(
         )
 
 async def send_voice_message(
-    db: Session,
+    db: AsyncSession,
     user_id: int,
     voice_url: str,
     duration: float
@@ -74,7 +75,7 @@ async def send_voice_message(
     try:
         async with db_transaction(db):
             # 检查用户是否存在
-            user = db.query(User).filter(User.id == user_id).first()
+            user = await db.get(User, user_id)
             if not user:
                 raise CustomException(
                     status_code=404,
@@ -93,8 +94,8 @@ async def send_voice_message(
             )
             
             db.add(interaction)
-            db.commit()
-            db.refresh(interaction)
+            await db.commit()
+            await db.refresh(interaction)
             
             logger.info(f"用户发送语音消息: 用户ID={user_id}")
             return interaction
@@ -102,7 +103,7 @@ async def send_voice_message(
     except CustomException as e:
         raise
     except Exception as e:
-        handle_database_error(db, e)
+        await handle_async_database_error(db, e)
         log_error("SendVoiceMessageError", f"发送语音消息失败: {str(e)}", exc_info=True)
         raise CustomException(
             status_code=500,
@@ -111,7 +112,7 @@ async def send_voice_message(
         )
 
 async def get_conversation_history(
-    db: Session,
+    db: AsyncSession,
     user_id: int,
     limit: int = 50,
     offset: int = 0
@@ -126,7 +127,7 @@ async def get_conversation_history(
     """
     try:
         # 检查用户是否存在
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await db.get(User, user_id)
         if not user:
             raise CustomException(
                 status_code=404,
@@ -135,14 +136,14 @@ async def get_conversation_history(
             )
         
         # 查询会话历史
-        interactions = (
-            db.query(Interaction)
-            .filter(Interaction.user_id == user_id)
+        result = await db.execute(
+            select(Interaction)
+            .where(Interaction.user_id == user_id)
             .order_by(Interaction.timestamp.desc())
             .offset(offset)
             .limit(limit)
-            .all()
         )
+        interactions = list(result.scalars().all())
         
         # 按时间升序返回
         interactions.reverse()
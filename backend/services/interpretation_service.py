@@ -1,14 +1,16 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 import logging
 
 from models import User, ExaminationReport, ReportInterpretation
-from utils.error_handler import CustomException, handle_database_error, log_error, db_transaction
+from utils.error_handler import CustomException, handle_async_database_error, log_error, db_transaction
+from utils.pagination import CursorPage, paginate
 
 logger = logging.getLogger("app.services.interpretation")
 
 async def create_report_interpretation(
-    db: Session,
+    db: AsyncSession,
     report_id: int,
     interpretation_content: str,
     suggestions: str
@@ -24,7 +26,7 @@ async def create_report_interpretation(
     try:
         async with db_transaction(db):
             # 检查报告是否存在
-            report = db.query(ExaminationReport).filter(ExaminationReport.id == report_id).first()
+            report = await db.get(ExaminationReport, report_id)
             if not report:
                 raise CustomException(
                     status_code=404,
@@ -41,9 +43,10 @@ async def create_report_interpretation(
                 )
             
             # 检查是否已存在解读
-            existing_interpretation = db.query(ReportInterpretation).filter(
+            result = await db.execute(select(ReportInterpretation).where(
                 ReportInterpretation.report_id == report_id
-            ).first()
+            ))
+            existing_interpretation = result.scalars().first()
             if existing_interpretation:
                 raise CustomException(
                     status_code=400,
@@ -66,8 +69,8 @@ async def create_report_interpretation(
             report.status = "interpreted"
             report.updated_at = datetime.now()
             
-            db.commit()
-            db.refresh(interpretation)
+            await db.commit()
+            await db.refresh(interpretation)
             
             logger.info(f"创建报告解读: 报告ID={report_id}, 解读ID={interpretation.id}")
             return interpretation
@@ -75,7 +78,7 @@ async def create_report_interpretation(
     except CustomException as e:
         raise
     except Exception as e:
-        handle_database_error(db, e)
+        await handle_async_database_error(db, e)
         log_error("CreateReportInterpretationError", f"创建报告解读失败: {str(e)}", exc_info=True)
         raise CustomException(
             status_code=500,
@@ -84,7 +87,7 @@ async def create_report_interpretation(
         )
 
 async def get_report_interpretation(
-    db: Session,
+    db: AsyncSession,
     report_id: int,
     user_id: int
 ) -> ReportInterpretation:
@@ -97,7 +100,7 @@ async def get_report_interpretation(
     """
     try:
         # 检查报告是否存在
-        report = db.query(ExaminationReport).filter(ExaminationReport.id == report_id).first()
+        report = await db.get(ExaminationReport, report_id)
         if not report:
             raise CustomException(
                 status_code=404,
@@ -114,9 +117,10 @@ async def get_report_interpretation(
             )
             
         # 获取报告解读
-        interpretation = db.query(ReportInterpretation).filter(
+        result = await db.execute(select(ReportInterpretation).where(
             ReportInterpretation.report_id == report_id
-        ).first()
+        ))
+        interpretation = result.scalars().first()
         
         if not interpretation:
             raise CustomException(
@@ -138,7 +142,7 @@ async def get_report_interpretation(
         )
 
 async def update_report_interpretation(
-    db: Session,
+    db: AsyncSession,
     interpretation_id: int,
     interpretation_content: str = None,
     suggestions: str = None
@@ -154,9 +158,7 @@ async def update_report_interpretation(
     try:
         async with db_transaction(db):
             # 检查解读是否存在
-            interpretation = db.query(ReportInterpretation).filter(
-                ReportInterpretation.id == interpretation_id
-            ).first()
+            interpretation = await db.get(ReportInterpretation, interpretation_id)
             if not interpretation:
                 raise CustomException(
                     status_code=404,
@@ -174,8 +176,8 @@ async def update_report_interpretation(
             # 更新时间
             interpretation.updated_at = datetime.now()
             
-            db.commit()
-            db.refresh(interpretation)
+            await db.commit()
+            await db.refresh(interpretation)
             
             logger.info(f"更新报告解读: 解读ID={interpretation_id}")
             return interpretation
@@ -183,7 +185,7 @@ async def update_report_interpretation(
     except CustomException as e:
         raise
     except Exception as e:
-        handle_database_error(db, e)
+        await handle_async_database_error(db, e)
         log_error("UpdateReportInterpretationError", f"更新报告解读失败: {str(e)}", exc_info=True)
         raise CustomException(
             status_code=500,
@@ -192,31 +194,35 @@ async def update_report_interpretation(
         )
 
 async def get_user_interpretations(
-    db: Session,
+    db: AsyncSession,
     user_id: int,
     limit: int = 50,
-    offset: int = 0
-) -> list[ReportInterpretation]:
+    offset: int = 0,
+    cursor: str = None
+) -> CursorPage:
     """
     获取用户的所有报告解读
     :param db: 数据库会话
     :param user_id: 用户ID
     :param limit: 返回的记录数量
-    :param offset: 偏移量
-    :return: 报告解读列表
+    :param offset: 偏移量（未传游标时使用）
+    :param cursor: 上一页返回的游标（可选）
+    :return: 报告解读列表，next_cursor 为下一页游标
     """
     try:
         # 查询用户的所有报告解读
-        interpretations = db.query(ReportInterpretation)
-        interpretations = interpretations.filter(ReportInterpretation.user_id == user_id)
-        interpretations = interpretations.order_by(ReportInterpretation.created_at.desc())
-        interpretations = interpretations.offset(offset)
-        interpretations = interpretations.limit(limit)
-        interpretations = interpretations.all()
+        query = select(ReportInterpretation)
+        query = query.where(ReportInterpretation.user_id == user_id)
+        # 按创建时间倒序排序
+        interpretations = await paginate(
+            db, query, (ReportInterpretation.created_at, ReportInterpretation.id), limit, offset, cursor
+        )
         
         logger.info(f"获取用户报告解读列表: 用户ID={user_id}, 数量={len(interpretations)}")
         return interpretations
         
+    except CustomException:
+        raise
     except Exception as e:
         log_error("GetUserInterpretationsError", f"获取用户报告解读列表失败: {str(e)}")
         raise CustomException(
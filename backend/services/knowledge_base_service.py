@@ -2,45 +2,104 @@
 知识库/规则库服务
 用于支持用户画像智能交互模块的AI动态子流程
 """
-import json
-import re
 from typing import Dict, List, Optional, Tuple, Any
 from sqlalchemy.orm import Session
-from models.user_profile import SymptomKnowledge
 from schemas.user_profile_schemas import SymptomExtraction, SymptomFollowUp
+from core.ai.nlu_engine import get_nlu_engine
+from services.symptom_knowledge_store import get_symptom_store, SymptomKnowledgeStore
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# 每个服务实例（即每个请求）最多记忆的输入分析结果数
+MAX_ANALYSES_PER_REQUEST = 32
+
+# 症状附近查找频率描述的范围（前后字符数）
+FREQUENCY_CONTEXT_CHARS = 10
+
+
+class UtteranceAnalysis:
+    """
+    单条用户输入的分析结果
+    频率、持续时间、程度由共享的 NLU 规则引擎一次抽取，症状实体由症状知识库自动机抽取，
+    同一请求内的各个知识库方法共享
+    """
+
+    def __init__(self, text: str, store: SymptomKnowledgeStore):
+        self.text = text
+        self.nlu = get_nlu_engine().parse(text)
+        # 整句范围内的频率、持续时间、程度
+        self.frequency = self.nlu.value("frequency")
+        self.duration = self.nlu.value("duration")
+        self.severity = self.nlu.value("severity")
+        self.no_more = self.nlu.has("no_more")
+
+        # 使用预构建的自动机一次扫描找出所有症状（重叠时取最长的症状词）
+        self.extractions: List[SymptomExtraction] = []
+        self.answered_keys: Dict[str, set] = {}
+        for start, end, _ in store.matcher.find_all(text):
+            symptom = text[start:end]
+            extraction = SymptomExtraction(
+                symptom=symptom,
+                frequency=self.frequency_near(start, end),
+                duration=self.duration,
+                severity=self.severity,
+                context=text
+            )
+            self.extractions.append(extraction)
+            answered = self.answered_keys.setdefault(symptom, set())
+            if extraction.frequency:
+                answered.add("frequency")
+            if extraction.duration:
+                answered.add("duration")
+            if extraction.severity:
+                answered.add("severity")
+
+    def frequency_near(self, start: int, end: int) -> Optional[str]:
+        """在指定位置前后 FREQUENCY_CONTEXT_CHARS 个字符内查找频率描述"""
+        return self.nlu.value(
+            "frequency",
+            max(0, start - FREQUENCY_CONTEXT_CHARS),
+            min(len(self.text), end + FREQUENCY_CONTEXT_CHARS)
+        )
+
 
 class KnowledgeBaseService:
     """知识库服务类，提供症状知识查询和规则处理"""
     
     def __init__(self, db: Session):
         self.db = db
+        # 请求内共享的知识库索引和输入分析结果，服务实例随请求创建
+        self._store: Optional[SymptomKnowledgeStore] = None
+        self._analyses: Dict[str, UtteranceAnalysis] = {}
+    
+    def _get_store(self) -> SymptomKnowledgeStore:
+        """获取知识库索引，同一请求内保持使用同一份索引"""
+        if self._store is None:
+            self._store = get_symptom_store(self.db)
+        return self._store
+    
+    def analyze(self, user_input: str) -> UtteranceAnalysis:
+        """分析用户输入，同一请求内相同的输入只分析一次"""
+        analysis = self._analyses.get(user_input)
+        if analysis is None:
+            if len(self._analyses) >= MAX_ANALYSES_PER_REQUEST:
+                self._analyses.clear()
+            analysis = UtteranceAnalysis(user_input, self._get_store())
+            self._analyses[user_input] = analysis
+        return analysis
     
     def get_symptom_knowledge(self, symptom: str) -> Optional[Dict]:
         """获取症状相关知识"""
         try:
-            # 查询症状知识库
-            knowledge = self.db.query(SymptomKnowledge).filter(
-                SymptomKnowledge.symptom.ilike(f"%{symptom}%")
-            ).first()
+            # 查询内存索引（JSON 字段已预先解析，查询结果已记忆）
+            entry = self._get_store().lookup(symptom, self.db)
             
-            if not knowledge:
+            if not entry:
                 logger.warning(f"未找到症状知识: {symptom}")
                 return None
             
-            # 解析JSON字段
-            follow_up_questions = json.loads(knowledge.follow_up_questions) if knowledge.follow_up_questions else []
-            related_symptoms = json.loads(knowledge.related_symptoms) if knowledge.related_symptoms else []
-            
-            return {
-                "symptom": knowledge.symptom,
-                "description": knowledge.description,
-                "follow_up_questions": follow_up_questions,
-                "related_symptoms": related_symptoms
-            }
+            return entry.to_dict()
         except Exception as e:
             logger.error(f"获取症状知识失败: {str(e)}")
             return None
@@ -48,117 +107,37 @@ class KnowledgeBaseService:
     def extract_symptom_entities(self, user_input: str) -> List[SymptomExtraction]:
         """从用户输入中提取症状实体"""
         try:
-            # 获取所有症状关键词
-            all_symptoms = self.db.query(SymptomKnowledge.symptom).all()
-            symptom_keywords = [item[0] for item in all_symptoms]
-            
-            # 构建正则表达式模式
-            pattern = r'(' + '|'.join(symptom_keywords) + r')'
-            
-            # 查找所有匹配的症状
-            matches = re.finditer(pattern, user_input, re.IGNORECASE)
-            
-            extractions = []
-            for match in matches:
-                symptom = match.group(0)
-                
-                # 提取频率信息
-                frequency = self._extract_frequency(user_input, match.start(), match.end())
-                
-                # 提取持续时间
-                duration = self._extract_duration(user_input)
-                
-                # 提取程度
-                severity = self._extract_severity(user_input)
-                
-                extractions.append(SymptomExtraction(
-                    symptom=symptom,
-                    frequency=frequency,
-                    duration=duration,
-                    severity=severity,
-                    context=user_input
-                ))
-            
-            return extractions
+            return list(self.analyze(user_input).extractions)
         except Exception as e:
             logger.error(f"提取症状实体失败: {str(e)}")
             return []
     
     def _extract_frequency(self, text: str, start: int, end: int) -> Optional[str]:
         """提取症状频率"""
-        # 常见频率关键词
-        frequency_keywords = ["经常", "总是", "偶尔", "有时", "很少", "从不", "每天", "每周", "每月"]
-        
-        # 在症状前后查找频率关键词
-        context_start = max(0, start - 10)
-        context_end = min(len(text), end + 10)
-        context = text[context_start:context_end]
-        
-        for keyword in frequency_keywords:
-            if keyword in context:
-                return keyword
-        
-        return None
+        return self.analyze(text).frequency_near(start, end)
     
     def _extract_duration(self, text: str) -> Optional[str]:
         """提取症状持续时间"""
-        # 常见时间模式
-        duration_patterns = [
-            r'(\d+天)',
-            r'(\d+周)',
-            r'(\d+月)',
-            r'(\d+年)',
-            r'(几天)',
-            r'(几周)',
-            r'(几个月)',
-            r'(几年)',
-            r'(最近)',
-            r'(这段时间)',
-            r'(一直)'
-        ]
-        
-        for pattern in duration_patterns:
-            match = re.search(pattern, text)
-            if match:
-                return match.group(0)
-        
-        return None
+        return self.analyze(text).duration
     
     def _extract_severity(self, text: str) -> Optional[str]:
         """提取症状程度"""
-        # 常见程度关键词
-        severity_keywords = ["轻微", "轻度", "中度", "严重", "剧烈", "非常", "特别", "有点"]
-        
-        for keyword in severity_keywords:
-            if keyword in text:
-                return keyword
-        
-        return None
+        return self.analyze(text).severity
     
     def generate_follow_up_questions(self, symptom: str, user_input: str) -> List[SymptomFollowUp]:
         """根据症状生成追问"""
         try:
             # 获取症状知识
-            knowledge = self.get_symptom_knowledge(symptom)
-            if not knowledge or not knowledge.get("follow_up_questions"):
+            entry = self._get_store().lookup(symptom, self.db)
+            if not entry or not entry.follow_up_questions:
                 return []
             
-            # 提取用户已回答的信息
-            extractions = self.extract_symptom_entities(user_input)
-            answered_keys = set()
-            
-            for extraction in extractions:
-                if extraction.symptom == symptom:
-                    if extraction.frequency:
-                        answered_keys.add("frequency")
-                    if extraction.duration:
-                        answered_keys.add("duration")
-                    if extraction.severity:
-                        answered_keys.add("severity")
+            # 用户已回答的信息（复用本请求内对该输入的分析结果）
+            answered_keys = self.analyze(user_input).answered_keys.get(symptom, set())
             
             # 生成未回答的追问
             follow_ups = []
-            for question_data in knowledge["follow_up_questions"]:
+            for question_data in entry.follow_up_questions:
                 key = question_data.get("key")
                 if key and key not in answered_keys:
                     follow_ups.append(SymptomFollowUp(
@@ -175,17 +154,11 @@ class KnowledgeBaseService:
     def should_continue_ai_subflow(self, symptom: str, collected_info: Dict) -> bool:
         """判断是否应该继续AI动态子流程"""
         try:
-            # 获取症状知识
-            knowledge = self.get_symptom_knowledge(symptom)
-            if not knowledge:
+            # 获取症状知识（需要收集的关键信息已在索引中预先计算）
+            entry = self._get_store().lookup(symptom, self.db)
+            if not entry:
                 return False
-            
-            # 获取所有需要收集的关键信息
-            required_keys = set()
-            for question_data in knowledge.get("follow_up_questions", []):
-                key = question_data.get("key")
-                if key:
-                    required_keys.add(key)
+            required_keys = entry.required_keys
             
             # 检查是否已收集所有关键信息
             collected_keys = set(collected_info.keys())
@@ -222,23 +195,22 @@ class KnowledgeBaseService:
             # 更新收集的信息
             updated_collected = current_collected.copy()
             
+            analysis = self.analyze(user_response)
+            
             # 提取频率
-            frequency = self._extract_frequency(user_response, 0, len(user_response))
-            if frequency:
-                updated_collected["frequency"] = frequency
+            if analysis.frequency:
+                updated_collected["frequency"] = analysis.frequency
             
             # 提取持续时间
-            duration = self._extract_duration(user_response)
-            if duration:
-                updated_collected["duration"] = duration
+            if analysis.duration:
+                updated_collected["duration"] = analysis.duration
             
             # 提取程度
-            severity = self._extract_severity(user_response)
-            if severity:
-                updated_collected["severity"] = severity
+            if analysis.severity:
+                updated_collected["severity"] = analysis.severity
             
             # 检查是否表示没有其他补充
-            if any(keyword in user_response for keyword in ["没有", "没有了", "没有了", "没有了", "no more", "no more"]):
+            if analysis.no_more:
                 updated_collected["no_more"] = True
             
             return updated_collected
@@ -1,17 +1,167 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 from datetime import datetime
-from typing import List
+from typing import Any, Dict, List, Sequence, Tuple
 import logging
-import random
 
 from models import User, UserProfile, HealthInfo, MedicalReport, UserPortrait, \
                      ExaminationItem, RecommendedPackage, PackageItem, Recommendation, ExaminationPackage
-from utils.error_handler import CustomException, handle_database_error, log_error, db_transaction
+from utils.error_handler import CustomException, handle_async_database_error, log_error, db_transaction
+from services.catalogue_service import get_catalogue
+from core.ai.recommendation_engine import PackagePlan, get_recommendation_engine
+from utils.metrics import Counter
+from utils.pagination import CursorPage, paginate
 
 logger = logging.getLogger("app.services.recommendation")
 
+
+class RecommendationCacheMetrics:
+    """
+    推荐结果复用指标
+    """
+
+    def __init__(self):
+        self.hits = Counter()
+        self.misses = Counter()
+
+    def reset(self) -> None:
+        for counter in vars(self).values():
+            counter.reset()
+
+    def snapshot(self) -> Dict[str, Any]:
+        data = {name: counter.value for name, counter in vars(self).items()}
+        lookups = data["hits"] + data["misses"]
+        data["hit_rate"] = round(data["hits"] / lookups, 4) if lookups else 0.0
+        return data
+
+
+recommendation_cache_metrics = RecommendationCacheMetrics()
+
+
+async def get_cached_packages(db: AsyncSession, user_id: int, fingerprint: str) -> List[RecommendedPackage]:
+    """
+    获取按指定指纹生成的推荐套餐
+    :param db: 数据库会话
+    :param user_id: 用户ID
+    :param fingerprint: 推荐结果指纹（RecommendationEngine.fingerprint）
+    :return: 套餐列表（已加载项目），同名套餐只保留最新的一个；没有时返回空列表
+    """
+    result = await db.execute(
+        select(RecommendedPackage)
+        .options(selectinload(RecommendedPackage.package_items))
+        .where(RecommendedPackage.user_id == user_id, RecommendedPackage.source_fingerprint == fingerprint)
+        .order_by(RecommendedPackage.id)
+    )
+    # 并发请求可能各生成了一份，按名称去重
+    latest: Dict[str, RecommendedPackage] = {}
+    for package in result.scalars().all():
+        latest[package.name] = package
+    return sorted(latest.values(), key=lambda package: package.id)
+
+
+def _package_rows(user_plans: Sequence[Tuple[int, PackagePlan]], now: datetime) -> List[Dict[str, Any]]:
+    return [
+        {
+            "user_id": user_id,
+            "name": plan.name,
+            "description": plan.description,
+            "total_price": plan.total_price,
+            "recommended_reason": plan.reason,
+            "source_fingerprint": plan.fingerprint,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for user_id, plan in user_plans
+    ]
+
+
+def _package_item_rows(
+    package_ids: Sequence[int],
+    user_plans: Sequence[Tuple[int, PackagePlan]],
+    now: datetime
+) -> List[Dict[str, Any]]:
+    return [
+        {
+            "package_id": package_id,
+            "item_id": item.id,
+            "item_name": item.name,
+            "item_price": item.price,
+            "created_at": now,
+        }
+        for package_id, (_, plan) in zip(package_ids, user_plans)
+        for item in plan.items
+    ]
+
+
+def _insert_ignoring_duplicates(db: Any, model: Any, index_elements: List[str]):
+    """
+    构建冲突时跳过的 INSERT（按唯一索引），PostgreSQL 与 SQLite 均为 ON CONFLICT DO NOTHING
+    :param db: 数据库会话（同步或异步）
+    :param model: ORM 模型
+    :param index_elements: 唯一索引的列名
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql_insert(model).on_conflict_do_nothing(index_elements=index_elements)
+    return sqlite_insert(model).on_conflict_do_nothing(index_elements=index_elements)
+
+
+async def create_recommended_packages(
+    db: AsyncSession,
+    user_plans: Sequence[Tuple[int, PackagePlan]]
+) -> List[RecommendedPackage]:
+    """
+    批量写入推荐套餐及其项目（不提交）
+    套餐和项目各一条 INSERT ... RETURNING，多行参数由 SQLAlchemy 合并为批量语句（insertmanyvalues），
+    数据库往返次数与套餐数、项目数无关（SQLite 不支持按参数顺序返回批量 RETURNING，套餐在 SQLite 上逐行插入）
+    :param db: 数据库会话
+    :param user_plans: (用户ID, 套餐方案) 列表
+    :return: 写入的套餐对象（顺序与 user_plans 一致），package_items 已填充，无需再次加载
+    """
+    if not user_plans:
+        return []
+    now = datetime.now()
+    packages = (await db.scalars(
+        insert(RecommendedPackage).returning(RecommendedPackage, sort_by_parameter_order=True),
+        _package_rows(user_plans, now)
+    )).all()
+    item_rows = _package_item_rows([package.id for package in packages], user_plans, now)
+    # 项目按 package_id 归属到套餐，不需要按参数顺序返回，各数据库上都能合并为批量语句
+    items = (await db.scalars(insert(PackageItem).returning(PackageItem), item_rows)).all() if item_rows else []
+
+    items_by_package: Dict[int, List[PackageItem]] = {package.id: [] for package in packages}
+    for item in items:
+        items_by_package[item.package_id].append(item)
+    for package in packages:
+        set_committed_value(package, "package_items", items_by_package[package.id])
+    return packages
+
+
+def insert_recommended_packages(db: Session, user_plans: Sequence[Tuple[int, PackagePlan]]) -> List[int]:
+    """
+    批量写入推荐套餐及其项目（同步版本，不提交，不构建 ORM 对象），供离线批量任务使用
+    :param db: 同步数据库会话
+    :param user_plans: (用户ID, 套餐方案) 列表
+    :return: 写入的套餐ID（顺序与 user_plans 一致）
+    """
+    if not user_plans:
+        return []
+    now = datetime.now()
+    package_ids = db.scalars(
+        insert(RecommendedPackage).returning(RecommendedPackage.id, sort_by_parameter_order=True),
+        _package_rows(user_plans, now)
+    ).all()
+    item_rows = _package_item_rows(package_ids, user_plans, now)
+    if item_rows:
+        db.execute(insert(PackageItem), item_rows)
+    return package_ids
+
+
 async def get_recommended_packages(
-    db: Session,
+    db: AsyncSession,
     user_id: int
 ) -> list[RecommendedPackage]:
     """
@@ -22,7 +172,7 @@ async def get_recommended_packages(
     """
     try:
         # 检查用户是否存在
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await db.get(User, user_id)
         if not user:
             raise CustomException(
                 status_code=404,
@@ -31,66 +181,33 @@ async def get_recommended_packages(
             )
             
         # 获取用户画像
-        user_portrait = db.query(UserPortrait).filter(UserPortrait.user_id == user_id).first()
+        result = await db.execute(select(UserPortrait).where(UserPortrait.user_id == user_id))
+        user_portrait = result.scalars().first()
         if not user_portrait:
             # 如果没有用户画像，先生成一个
             user_portrait = await generate_user_portrait(db, user_id)
         
-        # 获取所有可用的体检项目
-        all_items = db.query(ExaminationItem).filter(ExaminationItem.is_active == True).all()
-        
-        # 基于用户画像和健康信息生成推荐套餐
-        # 这里是简化的推荐逻辑，实际应用中应该有更复杂的算法
-        recommended_packages = []
+        # 获取所有可用的体检项目（来自目录快照，不查询数据库）
+        catalogue = await get_catalogue(db)
         
-        # 创建基础套餐
-        basic_package = RecommendedPackage(
-            user_id=user_id,
-            name="基础体检套餐",
-            description="适合健康状况良好的人群",
-            total_price=899.0,
-            recommended_reason="根据您的健康画像，推荐基础体检项目",
-            created_at=datetime.now()
-        )
-        db.add(basic_package)
-        db.flush()  # 为了获取id
+        engine = get_recommendation_engine(catalogue)
         
-        # 为基础套餐添加项目
-        basic_items = random.sample(all_items, 8)  # 随机选择8个项目
-        for item in basic_items:
-            package_item = PackageItem(
-                package_id=basic_package.id,
-                item_id=item.id,
-                item_name=item.name,
-                item_price=item.price
-            )
-            db.add(package_item)
+        # 画像、目录、规则和预算都未变化时，直接返回此前生成的套餐，不重新计算也不写入
+        fingerprint = engine.fingerprint(user_portrait)
+        recommended_packages = await get_cached_packages(db, user_id, fingerprint)
+        if recommended_packages:
+            recommendation_cache_metrics.hits.inc()
+            logger.info(f"复用用户推荐套餐: 用户ID={user_id}, 套餐数量={len(recommended_packages)}")
+            return recommended_packages
+        recommendation_cache_metrics.misses.inc()
         
-        # 创建全面套餐
-        comprehensive_package = RecommendedPackage(
-            user_id=user_id,
-            name="全面体检套餐",
-            description="适合关注全面健康的人群",
-            total_price=1899.0,
-            recommended_reason="根据您的健康画像，推荐全面体检项目",
-            created_at=datetime.now()
-        )
-        db.add(comprehensive_package)
-        db.flush()  # 为了获取id
+        # 推荐引擎按画像为目录中的全部项目打分，在各套餐预算内按分数挑选项目
+        plans = engine.recommend(user_portrait)
         
-        # 为全面套餐添加项目
-        comprehensive_items = random.sample(all_items, 15)  # 随机选择15个项目
-        for item in comprehensive_items:
-            package_item = PackageItem(
-                package_id=comprehensive_package.id,
-                item_id=item.id,
-                item_name=item.name,
-                item_price=item.price
-            )
-            db.add(package_item)
+        # 套餐和项目批量写入，返回的套餐对象已带有项目列表
+        recommended_packages = await create_recommended_packages(db, [(user_id, plan) for plan in plans])
         
-        db.commit()
-        recommended_packages.extend([basic_package, comprehensive_package])
+        await db.commit()
         
         logger.info(f"生成用户推荐套餐: 用户ID={user_id}, 套餐数量={len(recommended_packages)}")
         return recommended_packages
@@ -98,7 +215,7 @@ async def get_recommended_packages(
     except CustomException as e:
         raise
     except Exception as e:
-        handle_database_error(db, e)
+        await handle_async_database_error(db, e)
         log_error("GetRecommendedPackagesError", f"获取推荐套餐失败: {str(e)}", exc_info=True)
         raise CustomException(
             status_code=500,
@@ -107,7 +224,7 @@ async def get_recommended_packages(
         )
 
 async def adjust_recommended_items(
-    db: Session,
+    db: AsyncSession,
     package_id: int,
     add_items: list[int] = None,
     remove_items: list[int] = None
@@ -123,7 +240,7 @@ async def adjust_recommended_items(
     try:
         async with db_transaction(db):
             # 检查套餐是否存在
-            package = db.query(RecommendedPackage).filter(RecommendedPackage.id == package_id).first()
+            package = await db.get(RecommendedPackage, package_id)
             if not package:
                 raise CustomException(
                     status_code=404,
@@ -131,49 +248,76 @@ async def adjust_recommended_items(
                     error_type="PackageNotFound"
                 )
             
-            # 移除项目
-            if remove_items:
-                for item_id in remove_items:
-                    package_item = db.query(PackageItem).filter(
-                        PackageItem.package_id == package_id,
-                        PackageItem.item_id == item_id
-                    ).first()
-                    if package_item:
-                        db.delete(package_item)
+            # 所有修改按集合执行，数据库往返次数与调整的项目数无关
+            add_ids = list(dict.fromkeys(add_items or []))
+            remove_ids = list(dict.fromkeys(remove_items or []))
+            
+            # 一次查询检查要添加的项目是否存在
+            items_to_add = []
+            if add_ids:
+                result = await db.execute(
+                    select(ExaminationItem.id, ExaminationItem.name, ExaminationItem.price)
+                    .where(ExaminationItem.id.in_(add_ids))
+                )
+                found = {row.id: row for row in result}
+                missing = [item_id for item_id in add_ids if item_id not in found]
+                if missing:
+                    raise CustomException(
+                        status_code=404,
+                        message=f"体检项目不存在: {', '.join(str(item_id) for item_id in missing)}",
+                        error_type="ItemNotFound"
+                    )
+                items_to_add = [found[item_id] for item_id in add_ids]
             
-            # 添加项目
-            if add_items:
-                for item_id in add_items:
-                    # 检查项目是否存在
-                    item = db.query(ExaminationItem).filter(ExaminationItem.id == item_id).first()
-                    if not item:
-                        raise CustomException(
-                            status_code=404,
-                            message=f"体检项目不存在: {item_id}",
-                            error_type="ItemNotFound"
-                        )
-                    
-                    # 检查项目是否已在套餐中
-                    existing_item = db.query(PackageItem).filter(
-                        PackageItem.package_id == package_id,
-                        PackageItem.item_id == item_id
-                    ).first()
-                    if not existing_item:
-                        package_item = PackageItem(
-                            package_id=package_id,
-                            item_id=item_id,
-                            item_name=item.name,
-                            item_price=item.price
-                        )
-                        db.add(package_item)
+            # 批量移除项目
+            if remove_ids:
+                await db.execute(
+                    delete(PackageItem)
+                    .where(PackageItem.package_id == package_id, PackageItem.item_id.in_(remove_ids))
+                    .execution_options(synchronize_session=False)
+                )
             
-            # 更新套餐总价
-            package_items = db.query(PackageItem).filter(PackageItem.package_id == package_id).all()
-            package.total_price = sum(item.item_price for item in package_items)
-            package.updated_at = datetime.now()
+            # 批量添加项目，已在套餐中的项目由唯一索引跳过
+            if items_to_add:
+                now = datetime.now()
+                await db.execute(
+                    _insert_ignoring_duplicates(db, PackageItem, ["package_id", "item_id"]),
+                    [
+                        {
+                            "package_id": package_id,
+                            "item_id": item.id,
+                            "item_name": item.name,
+                            "item_price": item.price,
+                            "created_at": now,
+                        }
+                        for item in items_to_add
+                    ]
+                )
             
-            db.commit()
-            db.refresh(package)
+            # 在数据库中汇总套餐总价
+            result = await db.execute(
+                update(RecommendedPackage)
+                .where(RecommendedPackage.id == package_id)
+                .values(
+                    total_price=select(func.coalesce(func.sum(PackageItem.item_price), 0.0))
+                    .where(PackageItem.package_id == package_id)
+                    .scalar_subquery(),
+                    updated_at=datetime.now()
+                )
+                .returning(RecommendedPackage.total_price, RecommendedPackage.updated_at)
+                .execution_options(synchronize_session=False)
+            )
+            total_price, updated_at = result.one()
+            
+            await db.commit()
+            
+            # 加载调整后的项目列表，供调用方直接访问 package_items
+            result = await db.execute(
+                select(PackageItem).where(PackageItem.package_id == package_id).order_by(PackageItem.id)
+            )
+            set_committed_value(package, "total_price", float(total_price))
+            set_committed_value(package, "updated_at", updated_at)
+            set_committed_value(package, "package_items", list(result.scalars().all()))
             
             logger.info(f"调整推荐套餐项目: 套餐ID={package_id}")
             return package
@@ -181,7 +325,7 @@ async def adjust_recommended_items(
     except CustomException as e:
         raise
     except Exception as e:
-        handle_database_error(db, e)
+        await handle_async_database_error(db, e)
         log_error("AdjustRecommendedItemsError", f"调整推荐项目失败: {str(e)}", exc_info=True)
         raise CustomException(
             status_code=500,
@@ -190,39 +334,33 @@ async def adjust_recommended_items(
         )
 
 async def get_examination_items(
-    db: Session,
+    db: AsyncSession,
     category: str = None,
     keyword: str = None,
     limit: int = 50,
-    offset: int = 0
-) -> list[ExaminationItem]:
+    offset: int = 0,
+    cursor: str = None
+) -> CursorPage:
     """
     获取体检项目列表
     :param db: 数据库会话
     :param category: 项目分类（可选）
     :param keyword: 关键词搜索（可选）
     :param limit: 返回的记录数量
-    :param offset: 偏移量
-    :return: 体检项目列表
+    :param offset: 偏移量（未传游标时使用）
+    :param cursor: 上一页返回的游标（可选）
+    :return: 体检项目列表，next_cursor 为下一页游标
     """
     try:
-        # 构建查询
-        query = db.query(ExaminationItem).filter(ExaminationItem.is_active == True)
-        
-        # 按分类筛选
-        if category:
-            query = query.filter(ExaminationItem.category == category)
-        
-        # 按关键词搜索
-        if keyword:
-            query = query.filter(ExaminationItem.name.ilike(f"%{keyword}%"))
-        
-        # 排序并分页
-        items = query.order_by(ExaminationItem.name).offset(offset).limit(limit).all()
+        # 从目录快照中筛选：无关键词时按名称排序，有关键词时按相关度排序
+        catalogue = await get_catalogue(db)
+        items = catalogue.search(category, keyword, limit, offset, cursor)
         
         logger.info(f"获取体检项目列表: 数量={len(items)}")
         return items
         
+    except CustomException:
+        raise
     except Exception as e:
         log_error("GetExaminationItemsError", f"获取体检项目列表失败: {str(e)}")
         raise CustomException(
@@ -231,9 +369,44 @@ async def get_examination_items(
             error_type="ItemsListError"
         )
 
+async def search_examination_items(
+    db: AsyncSession,
+    category: str = None,
+    keyword: str = None,
+    limit: int = 50,
+    offset: int = 0,
+    cursor: str = None
+) -> CursorPage:
+    """
+    检索体检项目（带相关度和高亮）
+    :param db: 数据库会话
+    :param category: 项目分类（可选）
+    :param keyword: 关键词，在名称、分类、描述中检索（可选）
+    :param limit: 返回的记录数量
+    :param offset: 偏移量（未传游标时使用）
+    :param cursor: 上一页返回的游标（可选）
+    :return: 检索结果列表，有关键词时按相关度排序；next_cursor 为下一页游标
+    """
+    try:
+        catalogue = await get_catalogue(db)
+        hits = catalogue.search_hits(category, keyword, limit, offset, cursor=cursor)
+        
+        logger.info(f"检索体检项目: 关键词={keyword}, 数量={len(hits)}")
+        return hits
+        
+    except CustomException:
+        raise
+    except Exception as e:
+        log_error("SearchExaminationItemsError", f"检索体检项目失败: {str(e)}")
+        raise CustomException(
+            status_code=500,
+            message="获取体检项目列表失败，请稍后重试",
+            error_type="ItemsListError"
+        )
+
 # 这个函数在health_info_service.py中也有，为了避免循环导入，这里也定义一下
 async def create_recommendation(
-    db: Session,
+    db: AsyncSession,
     user_id: int,
     portraits_id: int,
     recommended_package_id: int,
@@ -250,7 +423,7 @@ async def create_recommendation(
     """
     try:
         # 检查用户是否存在
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await db.get(User, user_id)
         if not user:
             raise CustomException(
                 status_code=404,
@@ -259,7 +432,7 @@ async def create_recommendation(
             )
             
         # 检查用户画像是否存在
-        user_portrait = db.query(UserPortrait).filter(UserPortrait.id == portraits_id).first()
+        user_portrait = await db.get(UserPortrait, portraits_id)
         if not user_portrait:
             raise CustomException(
                 status_code=404,
@@ -268,7 +441,7 @@ async def create_recommendation(
             )
             
         # 检查推荐套餐是否存在
-        package = db.query(ExaminationPackage).filter(ExaminationPackage.id == recommended_package_id).first()
+        package = await db.get(ExaminationPackage, recommended_package_id)
         if not package:
             raise CustomException(
                 status_code=404,
@@ -286,8 +459,8 @@ async def create_recommendation(
         )
         
         db.add(recommendation)
-        db.commit()
-        db.refresh(recommendation)
+        await db.commit()
+        await db.refresh(recommendation)
         
         logger.info(f"创建推荐记录: 用户ID={user_id}, 画像ID={portraits_id}, 套餐ID={recommended_package_id}")
         return recommendation
@@ -295,7 +468,7 @@ async def create_recommendation(
     except CustomException as e:
         raise
     except Exception as e:
-        handle_database_error(db, e)
+        await handle_async_database_error(db, e)
         log_error("CreateRecommendationError", f"创建推荐记录失败: {str(e)}", exc_info=True)
         raise CustomException(
             status_code=500,
@@ -304,22 +477,24 @@ async def create_recommendation(
         )
 
 async def get_user_recommendations(
-    db: Session,
+    db: AsyncSession,
     user_id: int,
     skip: int = 0,
-    limit: int = 100
-) -> List[Recommendation]:
+    limit: int = 100,
+    cursor: str = None
+) -> CursorPage:
     """
     获取用户的推荐记录
     :param db: 数据库会话
     :param user_id: 用户ID
-    :param skip: 跳过的记录数
+    :param skip: 跳过的记录数（未传游标时使用）
     :param limit: 返回的最大记录数
-    :return: 推荐记录列表
+    :param cursor: 上一页返回的游标（可选）
+    :return: 推荐记录列表，next_cursor 为下一页游标
     """
     try:
         # 检查用户是否存在
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await db.get(User, user_id)
         if not user:
             raise CustomException(
                 status_code=404,
@@ -327,10 +502,11 @@ async def get_user_recommendations(
                 error_type="UserNotFound"
             )
         
-        # 获取推荐记录
-        recommendations = db.query(Recommendation).filter(
-            Recommendation.user_id == user_id
-        ).order_by(Recommendation.recommended_at.desc()).offset(skip).limit(limit).all()
+        # 获取推荐记录，按推荐时间倒序排序
+        recommendations = await paginate(
+            db, select(Recommendation).where(Recommendation.user_id == user_id),
+            (Recommendation.recommended_at, Recommendation.id), limit, skip, cursor
+        )
         
         return recommendations
         
@@ -345,7 +521,7 @@ async def get_user_recommendations(
         )
 
 async def generate_user_portrait(
-    db: Session,
+    db: AsyncSession,
     user_id: int
 ) -> UserPortrait:
     """
@@ -356,8 +532,10 @@ async def generate_user_portrait(
     """
     try:
         # 获取用户健康信息和体检报告
-        health_info = db.query(HealthInfo).filter(HealthInfo.user_id == user_id).first()
-        medical_reports = db.query(MedicalReport).filter(MedicalReport.user_id == user_id).all()
+        result = await db.execute(select(HealthInfo).where(HealthInfo.user_id == user_id))
+        health_info = result.scalars().first()
+        result = await db.execute(select(MedicalReport).where(MedicalReport.user_id == user_id))
+        medical_reports = result.scalars().all()
         
         # 这里应该有更复杂的用户画像生成逻辑
         # 为了演示，我们简单地创建一个用户画像
@@ -365,7 +543,8 @@ async def generate_user_portrait(
         recommended_frequency = "每年一次"
         
         # 检查是否已存在用户画像，如果有则更新，没有则创建
-        user_portrait = db.query(UserPortrait).filter(UserPortrait.user_id == user_id).first()
+        result = await db.execute(select(UserPortrait).where(UserPortrait.user_id == user_id))
+        user_portrait = result.scalars().first()
         
         if user_portrait:
             # 更新用户画像
@@ -382,8 +561,8 @@ async def generate_user_portrait(
             )
             db.add(user_portrait)
         
-        db.commit()
-        db.refresh(user_portrait)
+        await db.commit()
+        await db.refresh(user_portrait)
         
         return user_portrait
         
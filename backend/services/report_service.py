@@ -1,14 +1,16 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 import logging
 
 from models import User, Appointment, ExaminationReport, ReportInterpretation
-from utils.error_handler import CustomException, handle_database_error, log_error, db_transaction
+from utils.error_handler import CustomException, handle_async_database_error, log_error, db_transaction
+from utils.pagination import CursorPage, paginate
 
 logger = logging.getLogger("app.services.report")
 
 async def create_examination_report(
-    db: Session,
+    db: AsyncSession,
     appointment_id: int,
     report_data: dict,
     report_url: str
@@ -24,7 +26,7 @@ async def create_examination_report(
     try:
         async with db_transaction(db):
             # 检查预约是否存在
-            appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
+            appointment = await db.get(Appointment, appointment_id)
             if not appointment:
                 raise CustomException(
                     status_code=404,
@@ -41,9 +43,10 @@ async def create_examination_report(
                 )
             
             # 检查是否已存在报告
-            existing_report = db.query(ExaminationReport).filter(
+            result = await db.execute(select(ExaminationReport).where(
                 ExaminationReport.appointment_id == appointment_id
-            ).first()
+            ))
+            existing_report = result.scalars().first()
             if existing_report:
                 raise CustomException(
                     status_code=400,
@@ -62,8 +65,8 @@ async def create_examination_report(
             )
             
             db.add(examination_report)
-            db.commit()
-            db.refresh(examination_report)
+            await db.commit()
+            await db.refresh(examination_report)
             
             logger.info(f"创建体检报告: 预约ID={appointment_id}, 报告ID={examination_report.id}")
             return examination_report
@@ -71,7 +74,7 @@ async def create_examination_report(
     except CustomException as e:
         raise
     except Exception as e:
-        handle_database_error(db, e)
+        await handle_async_database_error(db, e)
         log_error("CreateExaminationReportError", f"创建体检报告失败: {str(e)}", exc_info=True)
         raise CustomException(
             status_code=500,
@@ -80,35 +83,41 @@ async def create_examination_report(
         )
 
 async def get_user_reports(
-    db: Session,
+    db: AsyncSession,
     user_id: int,
     status: str = None,
     limit: int = 50,
-    offset: int = 0
-) -> list[ExaminationReport]:
+    offset: int = 0,
+    cursor: str = None
+) -> CursorPage:
     """
     获取用户报告列表
     :param db: 数据库会话
     :param user_id: 用户ID
     :param status: 报告状态（可选）
     :param limit: 返回的记录数量
-    :param offset: 偏移量
-    :return: 报告列表
+    :param offset: 偏移量（未传游标时使用）
+    :param cursor: 上一页返回的游标（可选）
+    :return: 报告列表，next_cursor 为下一页游标
     """
     try:
         # 构建查询
-        query = db.query(ExaminationReport).filter(ExaminationReport.user_id == user_id)
+        query = select(ExaminationReport).where(ExaminationReport.user_id == user_id)
         
         # 按状态筛选
         if status:
-            query = query.filter(ExaminationReport.status == status)
+            query = query.where(ExaminationReport.status == status)
         
         # 按创建时间倒序排序
-        reports = query.order_by(ExaminationReport.created_at.desc()).offset(offset).limit(limit).all()
+        reports = await paginate(
+            db, query, (ExaminationReport.created_at, ExaminationReport.id), limit, offset, cursor
+        )
         
         logger.info(f"获取用户报告列表: 用户ID={user_id}, 数量={len(reports)}")
         return reports
         
+    except CustomException:
+        raise
     except Exception as e:
         log_error("GetUserReportsError", f"获取用户报告列表失败: {str(e)}")
         raise CustomException(
@@ -118,7 +127,7 @@ async def get_user_reports(
         )
 
 async def get_report_detail(
-    db: Session,
+    db: AsyncSession,
     report_id: int,
     user_id: int
 ) -> ExaminationReport:
@@ -131,7 +140,7 @@ async def get_report_detail(
     """
     try:
         # 检查报告是否存在
-        report = db.query(ExaminationReport).filter(ExaminationReport.id == report_id).first()
+        report = await db.get(ExaminationReport, report_id)
         if not report:
             raise CustomException(
                 status_code=404,
@@ -160,7 +169,7 @@ async def get_report_detail(
         )
 
 async def update_report_status(
-    db: Session,
+    db: AsyncSession,
     report_id: int,
     new_status: str
 ) -> ExaminationReport:
@@ -174,7 +183,7 @@ async def update_report_status(
     try:
         async with db_transaction(db):
             # 检查报告是否存在
-            report = db.query(ExaminationReport).filter(ExaminationReport.id == report_id).first()
+            report = await db.get(ExaminationReport, report_id)
             if not report:
                 raise CustomException(
                     status_code=404,
@@ -195,8 +204,8 @@ async def update_report_status(
             report.status = new_status
             report.updated_at = datetime.now()
             
-            db.commit()
-            db.refresh(report)
+            await db.commit()
+            await db.refresh(report)
             
             logger.info(f"更新报告状态: 报告ID={report_id}, 新状态={new_status}")
             return report
@@ -204,7 +213,7 @@ async def update_report_status(
     except CustomException as e:
         raise
     except Exception as e:
-        handle_database_error(db, e)
+        await handle_async_database_error(db, e)
         log_error("UpdateReportStatusError", f"更新报告状态失败: {str(e)}", exc_info=True)
         raise CustomException(
             status_code=500,
@@ -0,0 +1,226 @@
+"""
+症状知识库内存索引
+一次读取 symptom_knowledge 表并预先解析 JSON 字段，提供精确/模糊查询和症状词匹配自动机，
+对话流程中重复的症状查询不再访问数据库。
+
+查询顺序：
+1. 精确匹配（忽略大小写）
+2. 包含查询词的症状（与原 ILIKE '%x%' 语义一致，取最短的症状名）
+3. 查询词中包含的症状（如“经常头痛”命中“头痛”）
+4. PostgreSQL pg_trgm 相似度查询（需要 symptom 列上的三元组索引），结果连同未命中一起记忆
+"""
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from models.user_profile import SymptomKnowledge
+from utils import config
+from utils.aho_corasick import AhoCorasick, fold_case
+from utils.cache import cache
+
+logger = logging.getLogger("app.services.symptom_knowledge")
+
+# 缓存命名空间，用于跨进程失效通知
+SYMPTOM_KNOWLEDGE_NAMESPACE = "symptom_knowledge"
+
+# 模糊查询结果的最大记忆条数
+MAX_MEMOISED_LOOKUPS = 4096
+
+TRIGRAM_LOOKUP_SQL = text("""
+    SELECT symptom
+    FROM symptom_knowledge
+    WHERE symptom % :query AND similarity(symptom, :query) >= :min_similarity
+    ORDER BY similarity(symptom, :query) DESC, symptom
+    LIMIT 1
+""")
+
+
+def _parse_json_list(value: Any) -> List:
+    # 初始化脚本写入的是 JSON 字符串，接口写入的是列表，两种格式都兼容
+    if not value:
+        return []
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return []
+    return list(value) if isinstance(value, (list, tuple)) else []
+
+
+class SymptomEntry:
+    """
+    单条症状知识（已解析）
+    """
+
+    __slots__ = ("symptom", "description", "follow_up_questions", "related_symptoms", "required_keys")
+
+    def __init__(self, knowledge: Any):
+        """
+        :param knowledge: 包含 symptom、description、follow_up_questions、related_symptoms 属性的记录
+        """
+        self.symptom = knowledge.symptom
+        self.description = knowledge.description
+        self.follow_up_questions: List[Dict] = [
+            question for question in _parse_json_list(knowledge.follow_up_questions) if isinstance(question, dict)
+        ]
+        self.related_symptoms: List[str] = _parse_json_list(knowledge.related_symptoms)
+        # 追问需要收集的信息键
+        self.required_keys: FrozenSet[str] = frozenset(
+            question["key"] for question in self.follow_up_questions if question.get("key")
+        )
+
+    def to_dict(self) -> Dict:
+        """
+        转换为 KnowledgeBaseService.get_symptom_knowledge 的返回格式
+        """
+        return {
+            "symptom": self.symptom,
+            "description": self.description,
+            "follow_up_questions": self.follow_up_questions,
+            "related_symptoms": self.related_symptoms
+        }
+
+
+class SymptomKnowledgeStore:
+    """
+    症状知识库索引
+    构建后条目不再修改，模糊查询结果记忆在实例内，知识库变更时整体替换
+    """
+
+    def __init__(self, entries: List[SymptomEntry], is_postgresql: bool = False):
+        self.built_at = time.monotonic()
+        self.is_postgresql = is_postgresql
+        self.entries: Dict[str, SymptomEntry] = {}
+        for entry in entries:
+            self.entries.setdefault(fold_case(entry.symptom), entry)
+        # 按名称长度排序，包含查询时优先命中最短（最贴近）的症状
+        self._by_length: List[Tuple[str, SymptomEntry]] = sorted(
+            self.entries.items(), key=lambda pair: (len(pair[0]), pair[0])
+        )
+        self.matcher = AhoCorasick(entry.symptom for entry in self.entries.values())
+        self._lookups: Dict[str, Optional[SymptomEntry]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, db: Session) -> "SymptomKnowledgeStore":
+        """
+        从数据库加载全部症状知识
+        :param db: 数据库会话
+        :return: 症状知识库索引
+        """
+        # 只读取需要的列，兼容由建表脚本创建、缺少部分模型列的旧表
+        rows = db.query(
+            SymptomKnowledge.symptom,
+            SymptomKnowledge.description,
+            SymptomKnowledge.follow_up_questions,
+            SymptomKnowledge.related_symptoms
+        ).all()
+        entries = [SymptomEntry(row) for row in rows]
+        store = cls(entries, is_postgresql=db.get_bind().dialect.name == "postgresql")
+        logger.info(f"症状知识库索引已构建: 症状数={len(store.entries)}")
+        return store
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() - self.built_at >= config.SYMPTOM_KNOWLEDGE_REFRESH_INTERVAL
+
+    def _match_in_memory(self, key: str) -> Optional[SymptomEntry]:
+        entry = self.entries.get(key)
+        if entry is not None:
+            return entry
+        for name, entry in self._by_length:
+            if key in name:
+                return entry
+        match = self.matcher.find_first(key)
+        if match is not None:
+            return self.entries.get(fold_case(match[2]))
+        return None
+
+    def _match_trigram(self, db: Session, query: str) -> Optional[SymptomEntry]:
+        try:
+            # 使用独立连接，查询失败（如未安装 pg_trgm）不影响调用方会话中的事务
+            with db.get_bind().connect() as conn:
+                symptom = conn.execute(
+                    TRIGRAM_LOOKUP_SQL,
+                    {"query": query, "min_similarity": config.SYMPTOM_FUZZY_MIN_SIMILARITY}
+                ).scalar()
+        except Exception as e:
+            logger.warning(f"症状三元组模糊查询失败，后续仅使用内存匹配: {str(e)}")
+            self.is_postgresql = False
+            return None
+        return self.entries.get(fold_case(symptom)) if symptom else None
+
+    def lookup(self, symptom: str, db: Optional[Session] = None) -> Optional[SymptomEntry]:
+        """
+        查询症状知识
+        :param symptom: 症状名称或包含症状的描述
+        :param db: 数据库会话，提供时内存未命中会使用 PostgreSQL 三元组相似度查询兜底
+        :return: 症状知识条目，未找到时返回 None
+        """
+        if not symptom or not symptom.strip():
+            return None
+        key = fold_case(symptom.strip())
+        with self._lock:
+            if key in self._lookups:
+                return self._lookups[key]
+
+        entry = self._match_in_memory(key)
+        if entry is None and db is not None and self.is_postgresql:
+            entry = self._match_trigram(db, symptom.strip())
+
+        with self._lock:
+            if len(self._lookups) >= MAX_MEMOISED_LOOKUPS:
+                self._lookups.clear()
+            self._lookups[key] = entry
+        return entry
+
+
+# 当前进程的索引，首次使用时构建
+_store: Optional[SymptomKnowledgeStore] = None
+_store_lock = threading.Lock()
+
+
+def get_symptom_store(db: Session) -> SymptomKnowledgeStore:
+    """
+    获取症状知识库索引
+    :param db: 数据库会话（仅在需要构建时使用）
+    :return: 症状知识库索引
+    """
+    global _store
+    store = _store
+    if store is not None and not store.expired:
+        return store
+    with _store_lock:
+        if _store is None or _store.expired:
+            _store = SymptomKnowledgeStore.load(db)
+        return _store
+
+
+def reset_symptom_store() -> None:
+    """
+    丢弃本进程的症状知识库索引，下次使用时重新构建
+    """
+    global _store
+    with _store_lock:
+        _store = None
+
+
+async def invalidate_symptom_knowledge() -> None:
+    """
+    症状知识库变更后调用，失效本进程及其他进程的索引
+    """
+    reset_symptom_store()
+    await cache.invalidate_namespace(SYMPTOM_KNOWLEDGE_NAMESPACE)
+
+
+def _on_cache_invalidated(target: str) -> None:
+    if target.startswith(cache.make_key(SYMPTOM_KNOWLEDGE_NAMESPACE)):
+        reset_symptom_store()
+
+
+cache.add_invalidation_listener(_on_cache_invalidated)
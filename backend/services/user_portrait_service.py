@@ -1,12 +1,19 @@
+from sqlalchemy import or_, update
 from sqlalchemy.orm import Session
 from datetime import datetime
+import copy
 import logging
-import re
 import json
+import time
 from typing import Dict, List, Optional, Tuple, Any
 
+from core.ai.nlu_engine import get_nlu_engine
 from models import User, UserProfile, HealthInfo, MedicalReport, UserPortrait, UserSymptom, QuestionnaireProgress
+from services.flow_state_store import FlowStateCheckpointer, flow_state_store
+from utils import config
+from utils.database import SessionLocal
 from utils.error_handler import CustomException, handle_database_error, log_error, db_transaction
+from utils.json_patch import JsonColumnPatcher
 
 logger = logging.getLogger("app.services.user_portrait")
 
@@ -61,13 +68,102 @@ DEFAULT_SYMPTOM_QUESTIONS = [
     "有什么加重或缓解的因素吗？"
 ]
 
+# 问卷进度记录中的问卷标识
+PORTRAIT_QUESTIONNAIRE_ID = 1
+PORTRAIT_QUESTIONNAIRE_NAME = "用户画像问卷"
+
+
+def _state_from_progress(progress: QuestionnaireProgress, session_data: Dict[str, Any]) -> Dict[str, Any]:
+    """由数据库中的问卷进度构建流程状态"""
+    return {
+        "current_step": progress.current_step or MAIN_FLOW_STEPS[0],
+        "completed_steps": list(progress.completed_steps or []),
+        "current_state": progress.current_state or "normal",
+        "session_data": copy.deepcopy(session_data),
+        "dirty": False,
+        "touched_at": time.time()
+    }
+
+
+def _apply_state_to_progress(
+    progress: QuestionnaireProgress,
+    session_data: JsonColumnPatcher,
+    state: Dict[str, Any]
+) -> None:
+    """把流程状态写入问卷进度记录（不提交），会话数据只写入有变化的路径"""
+    completed_steps = list(state["completed_steps"])
+    progress.current_step = state["current_step"]
+    # JSON 列需要赋新对象才会被识别为已修改
+    progress.completed_steps = completed_steps
+    progress.current_state = state["current_state"]
+    session_data.write(copy.deepcopy(state["session_data"]))
+    progress.answered_questions = len(completed_steps)
+    progress.is_completed = state["current_step"] == "complete"
+    progress.state_touched_at = state["touched_at"]
+    progress.updated_at = datetime.now()
+
+
 class UserPortraitFlowService:
-    """用户画像生成流程服务"""
+    """
+    用户画像生成流程服务
+    流程状态保存在流程状态存储中，中间的问答只更新存储，关键节点才写入数据库（见 flow_state_store）
+    """
     
-    def __init__(self, db: Session, user_id: int):
+    def __init__(self, db: Session, user_id: int, state_store=None):
+        """
+        :param db: 数据库会话
+        :param user_id: 用户ID
+        :param state_store: 流程状态存储，默认使用全局存储
+        """
         self.db = db
         self.user_id = user_id
-        self.progress = self._get_or_create_progress()
+        self.state_store = state_store if state_store is not None else flow_state_store
+        self._progress: Optional[QuestionnaireProgress] = None
+        self._session_data: Optional[JsonColumnPatcher] = None
+        self.state = self._load_state()
+    
+    @property
+    def progress(self) -> QuestionnaireProgress:
+        """问卷进度记录，仅在首次加载状态或写入检查点时查询数据库"""
+        if self._progress is None:
+            self._progress = self._get_or_create_progress()
+        return self._progress
+    
+    @property
+    def session_data(self) -> JsonColumnPatcher:
+        """问卷进度记录中会话数据列的增量读写"""
+        if self._session_data is None:
+            self._session_data = JsonColumnPatcher(self.db, self.progress, "session_data")
+            self._session_data.load()
+        return self._session_data
+    
+    @property
+    def current_state(self) -> str:
+        """当前状态：normal 或 symptom_dynamic"""
+        return self.state["current_state"] or "normal"
+    
+    def _load_state(self) -> Dict[str, Any]:
+        """从流程状态存储读取状态，存储中没有时从数据库恢复"""
+        try:
+            state = self.state_store.get(self.user_id)
+        except Exception as e:
+            logger.warning(f"读取问卷流程状态失败，从数据库恢复: 用户ID={self.user_id}, 错误={str(e)}")
+            state = None
+        if state is None:
+            # 加载会话数据（含增量记录）后，列值即为合并后的数据
+            self.session_data
+            state = _state_from_progress(self.progress, self.progress.session_data)
+            self._store_state(state)
+        return state
+    
+    def _store_state(self, state: Dict[str, Any]) -> bool:
+        """写入流程状态存储，失败时返回 False"""
+        try:
+            self.state_store.set(self.user_id, state)
+            return True
+        except Exception as e:
+            logger.warning(f"写入问卷流程状态失败: 用户ID={self.user_id}, 错误={str(e)}")
+            return False
     
     def _get_or_create_progress(self) -> QuestionnaireProgress:
         """获取或创建问卷进度"""
@@ -78,8 +174,13 @@ class UserPortraitFlowService:
         if not progress:
             progress = QuestionnaireProgress(
                 user_id=self.user_id,
+                questionnaire_id=PORTRAIT_QUESTIONNAIRE_ID,
+                questionnaire_name=PORTRAIT_QUESTIONNAIRE_NAME,
+                total_questions=len(MAIN_FLOW_STEPS),
+                answered_questions=0,
                 current_step=MAIN_FLOW_STEPS[0],
                 completed_steps=[],
+                current_state="normal",
                 session_data={}
             )
             self.db.add(progress)
@@ -88,73 +189,54 @@ class UserPortraitFlowService:
         
         return progress
     
-    def _update_progress(self, **kwargs) -> None:
-        """更新进度信息"""
+    def _update_progress(self, checkpoint: bool = False, **kwargs) -> None:
+        """
+        更新流程状态
+        :param checkpoint: 是否同时写入数据库（步骤完成等关键节点）
+        :param kwargs: current_step、completed_steps、current_state、session_data
+        """
         for key, value in kwargs.items():
-            if hasattr(self.progress, key):
-                setattr(self.progress, key, value)
-        
-        self.progress.updated_at = datetime.now()
+            if key in self.state:
+                self.state[key] = value
+        
+        self.state["touched_at"] = time.time()
+        self.state["dirty"] = True
+        if checkpoint:
+            self.checkpoint()
+        elif not self._store_state(self.state):
+            # 状态存储不可用时直接写入数据库，保证进度不丢失
+            self.checkpoint()
+    
+    def checkpoint(self) -> None:
+        """把当前流程状态（及本会话中待提交的其他修改）写入数据库"""
+        _apply_state_to_progress(self.progress, self.session_data, self.state)
         self.db.commit()
-        self.db.refresh(self.progress)
+        self.state["dirty"] = False
+        self._store_state(self.state)
     
     def get_current_step(self) -> str:
         """获取当前步骤"""
-        return self.progress.current_step
+        return self.state["current_step"]
     
     def get_completed_steps(self) -> List[str]:
         """获取已完成步骤"""
-        return self.progress.completed_steps or []
+        return self.state["completed_steps"] or []
     
     def _extract_symptom_entities(self, text: str) -> Dict[str, str]:
         """
         NLU - 从用户文本中提取症状实体
-        简单实现：基于关键词匹配和规则提取
+        使用共享的规则引擎（core/ai/nlu_rules.json）一次抽取症状、频率和严重程度
         """
-        entities = {}
-        
-        # 提取症状名称（简化版，实际应用需要更复杂的NLP模型）
-        symptom_keywords = list(SYMPTOM_QUESTIONNAIRES.keys())
-        matched_symptom = None
-        
-        for symptom in symptom_keywords:
-            if symptom in text:
-                matched_symptom = symptom
-                break
-        
-        if not matched_symptom:
-            # 尝试从文本中提取可能的症状
-            symptom_pattern = re.compile(r'最近\w*(头晕|头痛|胃痛|胸闷|乏力|失眠|不适|难受|疼痛|异常)\w*')
-            match = symptom_pattern.search(text)
-            if match:
-                matched_symptom = match.group(1)
-        
-        entities["symptom"] = matched_symptom
-        
-        # 提取频率
-        frequency_patterns = {
-            "经常": re.compile(r'经常|频繁|总是|常常'),
-            "偶尔": re.compile(r'偶尔|有时|时不时'),
-            "持续": re.compile(r'持续|一直|不断'),
-            "最近": re.compile(r'最近|近\w*天|这几天')
-        }
+        result = get_nlu_engine().parse(text)
+        entities = {"symptom": result.value("symptom")}
         
-        for freq, pattern in frequency_patterns.items():
-            if pattern.search(text):
-                entities["frequency"] = freq
-                break
-        
-        # 提取严重程度
-        severity_patterns = {
-            "严重": re.compile(r'严重|很|非常|厉害'),
-            "中等": re.compile(r'一般|中等|有点'),
-            "轻微": re.compile(r'轻微|稍微|不太')
-        }
+        frequency = result.value("frequency")
+        if frequency:
+            entities["frequency"] = frequency
         
-        for severity, pattern in severity_patterns.items():
-            if pattern.search(text):
-                entities["severity"] = severity
-                break
+        severity = result.value("severity")
+        if severity:
+            entities["severity"] = severity
         
         return entities
     
@@ -165,12 +247,12 @@ class UserPortraitFlowService:
     def process_main_flow_step(self, step: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """处理主流程步骤"""
         # 保存当前步骤的数据
-        session_data = self.progress.session_data or {}
+        session_data = self.state["session_data"]
         session_data[step] = data
         
         # 检查是否是症状步骤，需要特殊处理
         if step == "symptoms" and data.get("has_symptoms", False):
-            # 进入AI动态子流程
+            # 进入AI动态子流程（中间状态只写入状态存储）
             self._update_progress(
                 current_state="symptom_dynamic",
                 session_data=session_data
@@ -212,6 +294,7 @@ class UserPortraitFlowService:
             next_step = "complete"
         
         self._update_progress(
+            checkpoint=next_step != "complete",
             current_step=next_step,
             completed_steps=completed_steps,
             current_state="normal",
@@ -235,7 +318,7 @@ class UserPortraitFlowService:
     
     def process_dynamic_question(self, answer: str) -> Dict[str, Any]:
         """处理动态追问"""
-        session_data = self.progress.session_data or {}
+        session_data = self.state["session_data"]
         symptom_dynamic = session_data.get("symptom_dynamic")
         
         if not symptom_dynamic:
@@ -263,7 +346,7 @@ class UserPortraitFlowService:
                 "step": "symptoms"
             }
         else:
-            # 动态追问结束，保存症状信息到数据库
+            # 动态追问结束，保存症状信息到数据库（随下方检查点一起提交）
             self._save_symptom_data(symptom_dynamic)
             
             # 退出动态流程，继续主流程
@@ -277,6 +360,7 @@ class UserPortraitFlowService:
             next_step = MAIN_FLOW_STEPS[current_index + 1]
             
             self._update_progress(
+                checkpoint=True,
                 current_step=next_step,
                 completed_steps=completed_steps,
                 current_state="normal",
@@ -319,7 +403,6 @@ class UserPortraitFlowService:
         )
         
         self.db.add(user_symptom)
-        self.db.commit()
     
     def generate_final_user_portrait(self, session_data: Dict[str, Any]) -> UserPortrait:
         """基于收集的所有信息生成最终用户画像"""
@@ -407,7 +490,8 @@ class UserPortraitFlowService:
             )
             self.db.add(user_portrait)
         
-        self.db.commit()
+        # 画像与问卷进度在同一事务中提交
+        self.checkpoint()
         self.db.refresh(user_portrait)
         
         logger.info(f"生成用户画像: 用户ID={self.user_id}, 健康风险={health_risk}, 关注领域={len(focus_areas)}个")
@@ -513,13 +597,14 @@ class UserPortraitFlowService:
             next_step = "complete"
         
         self._update_progress(
+            checkpoint=next_step != "complete",
             current_step=next_step,
             completed_steps=completed_steps
         )
         
         if next_step == "complete":
             # 生成最终用户画像
-            user_portrait = self.generate_final_user_portrait(self.progress.session_data or {})
+            user_portrait = self.generate_final_user_portrait(self.state["session_data"])
             return {
                 "next_action": "complete",
                 "message": "用户画像生成完成",
@@ -535,6 +620,7 @@ class UserPortraitFlowService:
     def reset_flow(self) -> Dict[str, Any]:
         """重置流程"""
         self._update_progress(
+            checkpoint=True,
             current_step=MAIN_FLOW_STEPS[0],
             completed_steps=[],
             current_state="normal",
@@ -548,6 +634,52 @@ class UserPortraitFlowService:
         }
 
 
+def _checkpoint_flow_state(user_id: int, state: Dict[str, Any]) -> None:
+    """
+    在独立会话中把流程状态写入问卷进度记录（后台检查点使用）
+    读取状态到提交之间请求可能已写入更新的状态，先以条件 UPDATE 认领该行（同时持有行锁直到提交），
+    记录中的状态修改时间不早于本次状态时跳过，不会用旧状态覆盖
+    """
+    db = SessionLocal()
+    try:
+        claimed = db.execute(
+            update(QuestionnaireProgress)
+            .where(
+                QuestionnaireProgress.user_id == user_id,
+                or_(
+                    QuestionnaireProgress.state_touched_at.is_(None),
+                    QuestionnaireProgress.state_touched_at < state["touched_at"]
+                )
+            )
+            .values(state_touched_at=state["touched_at"])
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not claimed:
+            # 记录缺失（已被删除，不再恢复）或已写入更新的状态
+            db.rollback()
+            return
+        progress = db.query(QuestionnaireProgress).filter(
+            QuestionnaireProgress.user_id == user_id
+        ).first()
+        session_data = JsonColumnPatcher(db, progress, "session_data")
+        session_data.load()
+        _apply_state_to_progress(progress, session_data, state)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+# 空闲流程状态检查点线程，应用启动时启动
+flow_state_checkpointer = FlowStateCheckpointer(
+    flow_state_store,
+    _checkpoint_flow_state,
+    idle_seconds=config.FLOW_STATE_IDLE_CHECKPOINT
+)
+
+
 async def get_questionnaire_progress(db: Session, user_id: int) -> Dict[str, Any]:
     """
     获取用户问卷进度
@@ -568,7 +700,7 @@ async def get_questionnaire_progress(db: Session, user_id: int) -> Dict[str, Any
         return {
             "current_step": service.get_current_step(),
             "completed_steps": service.get_completed_steps(),
-            "current_state": service.progress.current_state or "normal"
+            "current_state": service.current_state
         }
         
     except CustomException as e:
@@ -603,7 +735,7 @@ async def process_questionnaire_step(
             )
         
         # 检查是否是当前应该处理的步骤
-        if step != service.get_current_step() and service.progress.current_state != "symptom_dynamic":
+        if step != service.get_current_step() and service.current_state != "symptom_dynamic":
             raise CustomException(
                 status_code=400,
                 message=f"当前应该处理的步骤是: {service.get_current_step()}",
@@ -637,7 +769,7 @@ async def process_dynamic_question_answer(
         service = UserPortraitFlowService(db, user_id)
         
         # 检查是否处于动态追问状态
-        if service.progress.current_state != "symptom_dynamic":
+        if service.current_state != "symptom_dynamic":
             raise CustomException(
                 status_code=400,
                 message="当前未处于动态追问状态",
@@ -4,14 +4,16 @@ import re
 from datetime import datetime
 from sqlalchemy.orm import Session
 
-from models.user_profile import UserPortrait, SymptomKnowledge, ConversationHistory, UserFlowState
+from models.user_profile import UserPortrait, SymptomKnowledge, UserFlowState
 from schemas.user_profile_schemas import (
     UserProfileProcessRequest, UserProfileProcessResponse, 
     UserProfileInitializeResponse, NLUResponse, NLUExtractedEntity
 )
 from services.knowledge_base_service import KnowledgeBaseService
+from services.conversation_log import conversation_log
 from utils.logger import setup_logger
-from utils.database import get_db
+from utils.error_handler import db_transaction
+from utils.json_patch import JsonColumnPatcher
 
 logger = setup_logger(__name__)
 
@@ -77,9 +79,8 @@ class UserProfileService:
         """
         初始化用户画像收集流程
         """
-        # 获取或创建用户流程状态
-        db = next(get_db())
-        try:
+        # 使用注入的会话，在一个事务中获取或创建用户流程状态
+        async with db_transaction(self.db) as db:
             # 检查是否已有流程状态
             flow_state = db.query(UserFlowState).filter(UserFlowState.user_id == user_id).first()
             
@@ -88,9 +89,9 @@ class UserProfileService:
                 flow_state.current_main_step = "basic_info"
                 flow_state.current_sub_step = 0
                 flow_state.is_ai_sub_process = False
-                flow_state.temp_data = {}
+                # 整体清空会话数据，同时清除增量记录
+                JsonColumnPatcher(db, flow_state, "temp_data").replace({})
                 flow_state.updated_at = datetime.utcnow()
-                db.commit()
             else:
                 # 创建新的流程状态
                 flow_state = UserFlowState(
@@ -101,52 +102,58 @@ class UserProfileService:
                     temp_data={}
                 )
                 db.add(flow_state)
-                db.commit()
-            
-            # 返回初始欢迎消息
-            return UserProfileInitializeResponse(
-                message="您好！我是您的健康助手，接下来我将通过几个步骤了解您的基本情况，以便为您提供更精准的健康建议。我们先从基本信息开始，请问您的姓名是？",
-                step_type="text"
-            )
-        finally:
-            db.close()
+        
+        # 返回初始欢迎消息
+        return UserProfileInitializeResponse(
+            message="您好！我是您的健康助手，接下来我将通过几个步骤了解您的基本情况，以便为您提供更精准的健康建议。我们先从基本信息开始，请问您的姓名是？",
+            step_type="text"
+        )
     
     async def process_user_input(self, request: UserProfileProcessRequest, user_id: int) -> UserProfileProcessResponse:
         """
         处理用户输入，根据当前流程状态返回响应
+        整轮处理使用注入的会话，作为一个事务提交
         """
-        db = next(get_db())
+        db = self.db
         try:
+            # 记录用户消息的接收时间，对话历史在处理成功后统一写入
+            received_at = datetime.utcnow()
+            
             # 获取用户流程状态
             flow_state = db.query(UserFlowState).filter(UserFlowState.user_id == user_id).first()
             if not flow_state:
                 # 如果没有流程状态，初始化一个
                 return await self.initialize_profile(user_id)
             
-            # 保存对话历史
-            conversation = ConversationHistory(
+            # 读取会话数据（含增量记录），处理过程中直接修改 flow_state.temp_data
+            temp_data = JsonColumnPatcher(db, flow_state, "temp_data")
+            temp_data.load()
+            
+            async with db_transaction(db):
+                # 根据当前流程状态处理用户输入
+                if request.is_ai_sub_process:
+                    # AI动态子流程处理
+                    response = await self._process_ai_sub_process(request, flow_state, db)
+                else:
+                    # 主流程处理
+                    response = await self._process_main_flow(request, flow_state, db)
+                
+                # 只写入本轮有变化的会话数据路径
+                temp_data.write()
+            
+            # 保存用户消息和AI回复到对话历史（异步批量写入，不占用本次请求的提交）
+            conversation_log.append(
                 user_id=user_id,
                 message=request.user_input,
                 sender="user",
                 main_step=request.main_step,
                 sub_step=request.sub_step,
-                is_ai_sub_process=request.is_ai_sub_process
+                is_ai_sub_process=request.is_ai_sub_process,
+                extracted_entities=None,
+                response_data=None,
+                created_at=received_at
             )
-            db.add(conversation)
-            
-            # 根据当前流程状态处理用户输入
-            if request.is_ai_sub_process:
-                # AI动态子流程处理
-                response = await self._process_ai_sub_process(request, flow_state, db)
-            else:
-                # 主流程处理
-                response = await self._process_main_flow(request, flow_state, db)
-            
-            # 更新流程状态
-            db.commit()
-            
-            # 保存AI回复到对话历史
-            ai_conversation = ConversationHistory(
+            conversation_log.append(
                 user_id=user_id,
                 message=response.message,
                 sender="ai",
@@ -156,20 +163,18 @@ class UserProfileService:
                 extracted_entities=response.extracted_entities,
                 response_data=response.dict()
             )
-            db.add(ai_conversation)
-            db.commit()
             
             return response
         except Exception as e:
+            # 事务内的异常已由 db_transaction 回滚
             logger.error(f"处理用户输入失败: {str(e)}")
-            db.rollback()
+            if db.in_transaction():
+                db.rollback()
             return UserProfileProcessResponse(
                 message="抱歉，处理您的输入时出现了问题，请稍后再试。",
                 step_type="text",
                 next_step=request.sub_step
             )
-        finally:
-            db.close()
     
     async def _process_main_flow(self, request: UserProfileProcessRequest, flow_state: UserFlowState, db) -> UserProfileProcessResponse:
         """
@@ -646,7 +651,7 @@ class UserProfileService:
         flow_state.temp_data = {}
         flow_state.updated_at = datetime.utcnow()
         
-        db.commit()
+        # 由 process_user_input 的事务统一提交
         
         return UserProfileProcessResponse(
             message="感谢您的配合，您的用户画像已收集完成！这些信息将帮助我们为您提供更精准的健康建议。",
@@ -1,10 +1,15 @@
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from pydantic import EmailStr
-from passlib.context import CryptContext
+from typing import Set
+import asyncio
 import logging
 
 from models import User
 from schemas import user_schemas
+from utils.database import SessionLocal
+from utils.security import invalidate_principal
+from utils.password_hashing import password_hashing_pool, password_policy
 from utils.error_handler import (
     CustomException,
     handle_database_error,
@@ -12,11 +17,14 @@ from utils.error_handler import (
     db_transaction
 )
 
-# 密码哈希上下文
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# 密码哈希上下文（算法由 PASSWORD_HASH_SCHEME 配置，成本由对应算法的 PASSWORD_HASH_*_ROUNDS 配置）
+pwd_context = password_policy.context
 
 logger = logging.getLogger("app.services.user")
 
+# 进行中的后台重新哈希任务，保留引用避免任务被回收
+_rehash_tasks: Set[asyncio.Task] = set()
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
@@ -48,6 +56,77 @@ def get_password_hash(password: str) -> str:
         )
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    在密码哈希工作池中验证密码，不阻塞事件循环
+    :param plain_password: 明文密码
+    :param hashed_password: 哈希密码
+    :return: 密码是否匹配
+    :raises CustomException: 工作池排队已满时抛出 429
+    """
+    return await password_hashing_pool.run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    在密码哈希工作池中生成密码哈希，不阻塞事件循环
+    :param password: 明文密码
+    :return: 密码哈希
+    :raises CustomException: 工作池排队已满时抛出 429
+    """
+    return await password_hashing_pool.run(get_password_hash, password)
+
+
+def _store_rehashed_password(user_id: int, old_hash: str, new_hash: str) -> bool:
+    """
+    保存重新计算的密码哈希
+    只在密码哈希仍为旧值时更新，期间用户修改过密码则放弃；不修改 updated_at
+    :return: 是否已更新
+    """
+    with SessionLocal() as db:
+        try:
+            result = db.execute(
+                update(User)
+                .where(User.id == user_id, User.password_hash == old_hash)
+                .values(password_hash=new_hash, updated_at=User.updated_at)
+            )
+            db.commit()
+            return result.rowcount > 0
+        except Exception as e:
+            handle_database_error(db, e)
+            raise
+
+
+async def _rehash_password(user_id: int, username: str, password: str, old_hash: str) -> None:
+    try:
+        new_hash = await password_hashing_pool.run(password_policy.hash, password)
+        if await asyncio.to_thread(_store_rehashed_password, user_id, old_hash, new_hash):
+            await invalidate_principal(username)
+            password_hashing_pool.metrics.rehashed.inc()
+            logger.info(
+                f"密码哈希已按当前策略更新: 用户ID={user_id}, "
+                f"{password_policy.describe(old_hash)} -> {password_policy.describe(new_hash)}"
+            )
+    except Exception as e:
+        # 工作池繁忙或写入失败时放弃，下次登录再试
+        password_hashing_pool.metrics.rehash_failures.inc()
+        log_error("PasswordRehashError", f"重新哈希密码失败: 用户ID={user_id}, {str(e)}")
+
+
+def schedule_rehash(user: User, password: str) -> None:
+    """
+    密码哈希的算法或成本与当前策略不一致时，在后台按当前策略重新哈希
+    不等待完成，登录响应不增加哈希耗时
+    :param user: 已通过密码校验的用户
+    :param password: 本次登录的明文密码
+    """
+    if not password_policy.needs_update(user.password_hash):
+        return
+    task = asyncio.create_task(_rehash_password(user.id, user.username, password, user.password_hash))
+    _rehash_tasks.add(task)
+    task.add_done_callback(_rehash_tasks.discard)
+
+
 async def create_user(
     db: Session,
     user_data: user_schemas.UserCreate
@@ -78,7 +157,7 @@ async def create_user(
             )
         
         # 生成密码哈希
-        password_hash = get_password_hash(user_data.password)
+        password_hash = await get_password_hash_async(user_data.password)
         
         # 创建用户对象
         db_user = User(
@@ -91,6 +170,8 @@ async def create_user(
         db.add(db_user)
         db.commit()
         db.refresh(db_user)
+        # 清除该用户名此前缓存的"用户不存在"结果
+        await invalidate_principal(db_user.username)
         
         logger.info(f"用户创建成功: {db_user.username} (ID: {db_user.id})")
         return db_user
@@ -154,6 +235,7 @@ async def update_user_profile(
                     message="用户不存在",
                     error_type="UserNotFound"
                 )
+            previous_username = user.username
             
             # 更新用户资料
             update_data = profile_data.dict(exclude_unset=True)
@@ -176,12 +258,14 @@ async def update_user_profile(
             
             # 如果有密码更新，生成新的密码哈希
             if "password" in update_data:
-                user.password_hash = get_password_hash(update_data["password"])
+                user.password_hash = await get_password_hash_async(update_data["password"])
                 # 删除密码字段，避免返回明文密码
                 del update_data["password"]
             
             db.commit()
             db.refresh(user)
+            # 密码、邮箱等变更后失效认证用户缓存，旧令牌不会再读到旧的密码哈希
+            await invalidate_principal(previous_username, user.username)
             
             logger.info(f"用户资料更新成功: {user.username} (ID: {user.id})")
             return user
@@ -222,6 +306,7 @@ async def delete_user(db: Session, user_id: int) -> bool:
             # 删除用户
             db.delete(user)
             db.commit()
+            await invalidate_principal(user.username)
             
             logger.info(f"用户删除成功: {user.username} (ID: {user.id})")
             return True
@@ -255,10 +340,15 @@ async def authenticate_user(db: Session, username: str, password: str) -> User o
             return None
         
         # 验证密码
-        if not verify_password(password, user.password_hash):
+        if not await verify_password_async(password, user.password_hash):
             return None
         
+        # 旧算法或旧成本的哈希在后台升级
+        schedule_rehash(user, password)
         return user
+    except CustomException:
+        # 密码哈希工作池繁忙（429）等需要返回给客户端的错误
+        raise
     except Exception as e:
         log_error("UserAuthenticationError", f"用户认证失败: {str(e)}")
         return None
\ No newline at end of file
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+更新套餐项目表结构脚本
+调整套餐时按 (package_id, item_id) 唯一索引 ON CONFLICT DO NOTHING 批量添加项目，
+已有数据库需要先清除重复的套餐项目再创建该索引，否则添加项目会因缺少匹配的唯一约束而失败。脚本可重复执行。
+"""
+
+from sqlalchemy import create_engine, text
+from utils.database import DATABASE_URL
+import logging
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def update_package_items_table():
+    """
+    清除package_items中的重复项目并创建唯一索引uq_package_items_package_item
+    """
+    engine = create_engine(DATABASE_URL)
+
+    with engine.connect() as conn:
+        # 开始事务
+        trans = conn.begin()
+
+        try:
+            # 重复项目的套餐，删除后按剩余项目重新计算总价
+            result = conn.execute(text("""
+                SELECT DISTINCT package_id FROM package_items
+                GROUP BY package_id, item_id
+                HAVING COUNT(*) > 1
+            """))
+            package_ids = [row[0] for row in result]
+
+            if package_ids:
+                # 同一套餐中的同一项目只保留最早的一条
+                result = conn.execute(text("""
+                    DELETE FROM package_items
+                    WHERE id NOT IN (
+                        SELECT MIN(id) FROM package_items GROUP BY package_id, item_id
+                    )
+                """))
+                logger.info(f"删除重复的套餐项目 {result.rowcount} 条，涉及套餐 {len(package_ids)} 个")
+
+                for package_id in package_ids:
+                    conn.execute(text("""
+                        UPDATE recommended_packages
+                        SET total_price = (
+                            SELECT COALESCE(SUM(item_price), 0) FROM package_items
+                            WHERE package_items.package_id = recommended_packages.id
+                        )
+                        WHERE id = :package_id
+                    """), {"package_id": package_id})
+            else:
+                logger.info("没有重复的套餐项目")
+
+            logger.info("创建唯一索引 uq_package_items_package_item")
+            conn.execute(text("""
+                CREATE UNIQUE INDEX IF NOT EXISTS uq_package_items_package_item
+                ON package_items (package_id, item_id)
+            """))
+
+            # 提交事务
+            trans.commit()
+            logger.info("表结构更新成功")
+
+        except Exception as e:
+            # 回滚事务
+            trans.rollback()
+            logger.error(f"更新表结构失败: {str(e)}")
+            raise
+
+if __name__ == "__main__":
+    update_package_items_table()
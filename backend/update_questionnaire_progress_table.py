@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+更新问卷进度表结构脚本
+问卷流程状态改为保存在 questionnaire_progress 的 current_step、completed_steps、current_state、session_data、
+state_touched_at 列中，已有数据库中由 create_all 建成的表不会自动添加这些列，查询问卷进度会因列不存在而失败；
+PostgreSQL 上 session_data 需为 JSONB，否则 JsonColumnPatcher 的 jsonb_set 增量更新会因类型不符而失败。脚本可重复执行。
+"""
+
+from sqlalchemy import create_engine, inspect, text
+from utils.database import DATABASE_URL
+import logging
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def update_questionnaire_progress_table():
+    """
+    添加questionnaire_progress缺失的流程状态列，并将session_data列转换为JSONB（仅PostgreSQL）
+    """
+    engine = create_engine(DATABASE_URL)
+    is_postgresql = engine.dialect.name == "postgresql"
+
+    with engine.connect() as conn:
+        # 开始事务
+        trans = conn.begin()
+
+        try:
+            inspector = inspect(conn)
+            if not inspector.has_table("questionnaire_progress"):
+                logger.info("表questionnaire_progress不存在，启动时按模型创建")
+                trans.commit()
+                return
+
+            columns = {column["name"]: column for column in inspector.get_columns("questionnaire_progress")}
+
+            # 检查并添加缺失的列
+            columns_to_add = [
+                ("current_step", "VARCHAR(50)"),
+                ("completed_steps", "JSON"),
+                ("current_state", "VARCHAR(50) DEFAULT 'normal'"),
+                ("session_data", "JSONB" if is_postgresql else "JSON"),
+                ("state_touched_at", "DOUBLE PRECISION" if is_postgresql else "FLOAT")
+            ]
+
+            for column_name, column_type in columns_to_add:
+                if column_name not in columns:
+                    logger.info(f"添加列 {column_name}")
+                    conn.execute(text(f"""
+                        ALTER TABLE questionnaire_progress
+                        ADD COLUMN {column_name} {column_type}
+                    """))
+
+            # 检查session_data列类型
+            if is_postgresql and "session_data" in columns:
+                result = conn.execute(text("""
+                    SELECT data_type FROM information_schema.columns
+                    WHERE table_schema = 'public'
+                    AND table_name = 'questionnaire_progress'
+                    AND column_name = 'session_data'
+                """))
+                data_type = result.fetchone()[0]
+
+                if data_type == "jsonb":
+                    logger.info("列session_data已是JSONB，无需更新")
+                else:
+                    logger.info(f"将列session_data从{data_type}转换为JSONB")
+                    conn.execute(text("""
+                        ALTER TABLE questionnaire_progress
+                        ALTER COLUMN session_data TYPE JSONB USING session_data::jsonb
+                    """))
+
+            # 提交事务
+            trans.commit()
+            logger.info("表结构更新成功")
+
+        except Exception as e:
+            # 回滚事务
+            trans.rollback()
+            logger.error(f"更新表结构失败: {str(e)}")
+            raise
+
+if __name__ == "__main__":
+    update_questionnaire_progress_table()
@@ -0,0 +1,124 @@
+"""
+Aho-Corasick 多模式匹配
+一次构建自动机后，对任意文本只需线性扫描一遍即可找出所有关键词，
+用于症状等关键词词典的实体抽取，避免每条消息都拼接、编译正则表达式
+"""
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def fold_case(text: str) -> str:
+    """
+    逐字符转小写，保证结果与原文等长（个别字符小写后长度变化时保留原字符），匹配位置可直接映射回原文
+    """
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    return "".join(ch if len(ch.lower()) != 1 else ch.lower() for ch in text)
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick 自动机
+    构建完成后只读，可在多线程间共享
+    """
+
+    def __init__(self, keywords: Iterable[str], ignore_case: bool = True):
+        """
+        :param keywords: 关键词列表，空白和重复的关键词会被忽略
+        :param ignore_case: 是否忽略大小写
+        """
+        self.ignore_case = ignore_case
+        # 每个状态的转移表、失败指针和输出（以该状态结尾的关键词下标）
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+        self.keywords: List[str] = []
+
+        seen = set()
+        for keyword in keywords:
+            if not keyword or not keyword.strip():
+                continue
+            key = fold_case(keyword) if ignore_case else keyword
+            if key in seen:
+                continue
+            seen.add(key)
+            self._insert(key, len(self.keywords))
+            self.keywords.append(keyword)
+        self._build_failure_links()
+
+    def _insert(self, key: str, index: int) -> None:
+        state = 0
+        for ch in key:
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][ch] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(index)
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                # 合并失败链上的输出，扫描时无需再沿失败指针收集
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    def iter_matches(self, text: str) -> Iterable[Tuple[int, int, str]]:
+        """
+        找出文本中所有关键词出现的位置（允许重叠）
+        :param text: 待匹配文本
+        :return: (起始位置, 结束位置, 关键词) 的迭代器，按结束位置递增
+        """
+        if not self.keywords or not text:
+            return
+        haystack = fold_case(text) if self.ignore_case else text
+        goto, fail, output, keywords = self._goto, self._fail, self._output, self.keywords
+        state = 0
+        for position, ch in enumerate(haystack):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for index in output[state]:
+                end = position + 1
+                yield end - len(keywords[index]), end, keywords[index]
+
+    def find_all(self, text: str, overlapping: bool = False) -> List[Tuple[int, int, str]]:
+        """
+        找出文本中的关键词
+        :param text: 待匹配文本
+        :param overlapping: 是否返回重叠的匹配；默认按“最左最长”规则返回互不重叠的匹配
+        :return: 按起始位置排序的 (起始位置, 结束位置, 关键词) 列表
+        """
+        matches = sorted(self.iter_matches(text), key=lambda match: (match[0], -(match[1] - match[0])))
+        if overlapping:
+            return matches
+        selected = []
+        last_end = 0
+        for match in matches:
+            if match[0] >= last_end:
+                selected.append(match)
+                last_end = match[1]
+        return selected
+
+    def find_first(self, text: str) -> Optional[Tuple[int, int, str]]:
+        """
+        找出文本中最左最长的一个关键词
+        :param text: 待匹配文本
+        :return: (起始位置, 结束位置, 关键词)，没有匹配时返回 None
+        """
+        matches = self.find_all(text)
+        return matches[0] if matches else None
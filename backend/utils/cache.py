@@ -0,0 +1,572 @@
+"""
+两级缓存模块
+第一级为进程内 LRU/TTL 缓存，第二级为可选的 Redis 缓存（未配置 REDIS_URL 或 Redis 不可用时自动降级为仅进程内缓存）
+提供 @cached 装饰器缓存异步服务函数的结果，并发的相同请求只会触发一次加载（single-flight）
+
+用法示例：
+    @cached("catalogue", ttl=600, key_builder=lambda db, category=None: category or "all")
+    async def load_catalogue(db, category=None): ...
+
+    await load_catalogue.invalidate(db, category="血液")  # 失效单个键
+    await load_catalogue.invalidate_all()                 # 失效整个命名空间
+
+注意：写入 Redis 的值需要可 JSON 序列化；缓存 ORM 对象等不可序列化的值时请使用 local_only=True
+"""
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from utils import config
+from utils.metrics import Counter
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis 为可选依赖
+    aioredis = None
+
+logger = logging.getLogger("app.cache")
+
+# 未命中标记（缓存值本身可能为 None）
+MISSING = object()
+
+# 默认键构造时忽略的参数名
+DEFAULT_EXCLUDED_ARGS = ("db", "self", "cls")
+
+# 键后缀超过该长度时改用摘要，避免 Redis 键过长
+MAX_KEY_SUFFIX_LENGTH = 200
+
+# Redis 出错后暂停访问的时间(秒)，避免每次请求都等待超时
+REDIS_RETRY_INTERVAL = 30.0
+
+
+class CacheMetrics:
+    """
+    缓存指标
+    """
+
+    def __init__(self):
+        self.local_hits = Counter()
+        self.redis_hits = Counter()
+        self.misses = Counter()
+        self.loads = Counter()
+        self.load_errors = Counter()
+        self.coalesced = Counter()  # 等待同键加载结果而未重复加载的次数
+        self.evictions = Counter()
+        self.invalidations = Counter()
+        self.stale_loads = Counter()  # 加载期间键被失效、结果未写入缓存的次数
+        self.redis_errors = Counter()
+
+    def reset(self) -> None:
+        for counter in vars(self).values():
+            counter.reset()
+
+    def snapshot(self) -> Dict[str, Any]:
+        data = {name: counter.value for name, counter in vars(self).items()}
+        lookups = data["local_hits"] + data["redis_hits"] + data["misses"]
+        data["hit_rate"] = round((data["local_hits"] + data["redis_hits"]) / lookups, 4) if lookups else 0.0
+        return data
+
+
+class LocalCache:
+    """
+    进程内 LRU/TTL 缓存
+    超过最大条目数时淘汰最久未使用的条目，过期条目在读取时惰性清除
+    """
+
+    def __init__(self, max_entries: int, metrics: Optional[CacheMetrics] = None):
+        self.max_entries = max_entries
+        self.metrics = metrics or CacheMetrics()
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        """
+        读取缓存
+        :param key: 缓存键
+        :return: 缓存值，未命中或已过期时返回 MISSING
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return MISSING
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """
+        写入缓存
+        :param key: 缓存键
+        :param value: 缓存值
+        :param ttl: 过期时间(秒)
+        """
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.metrics.evictions.inc()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_prefix(self, prefix: str) -> int:
+        """
+        删除指定前缀的所有键
+        :param prefix: 键前缀
+        :return: 删除的条目数
+        """
+        with self._lock:
+            keys = [key for key in self._data if key.startswith(prefix)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class TwoTierCache:
+    """
+    两级缓存
+    读取顺序：进程内缓存 -> Redis -> 加载函数；Redis 命中的值会回填进程内缓存。
+    失效操作同时作用于两级缓存，并通过 Redis 频道通知其他进程清除各自的进程内缓存
+    """
+
+    def __init__(
+        self,
+        redis_url: str = "",
+        key_prefix: str = "hes",
+        max_local_entries: int = 2048,
+        default_ttl: float = 300.0,
+        redis_client: Any = None
+    ):
+        """
+        :param redis_url: Redis 连接地址，留空则只使用进程内缓存
+        :param key_prefix: 键前缀
+        :param max_local_entries: 进程内缓存最大条目数
+        :param default_ttl: 默认过期时间(秒)
+        :param redis_client: 直接传入的 Redis 客户端（如 fakeredis），优先于 redis_url
+        """
+        self.key_prefix = key_prefix
+        self.default_ttl = default_ttl
+        self.metrics = CacheMetrics()
+        self.local = LocalCache(max_local_entries, self.metrics)
+        self.redis_url = redis_url
+        self._redis = redis_client
+        self._redis_retry_at = 0.0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # 加载期间键被失效的加载（以其结果 Future 标识），结果不再写入缓存
+        self._stale_loads: Set[asyncio.Future] = set()
+        self._listeners: List[Callable[[str], Any]] = []
+        self._subscriber_task: Optional[asyncio.Task] = None
+        self.invalidation_channel = f"{key_prefix}:cache:invalidate"
+
+    # ---------- 键 ----------
+
+    def make_key(self, namespace: str, suffix: str = "") -> str:
+        """
+        构造完整缓存键
+        :param namespace: 命名空间
+        :param suffix: 键后缀
+        :return: 形如 <前缀>:<命名空间>:<后缀> 的缓存键
+        """
+        return f"{self.key_prefix}:{namespace}:{suffix}"
+
+    # ---------- Redis ----------
+
+    @property
+    def redis_enabled(self) -> bool:
+        return self._redis is not None or (bool(self.redis_url) and aioredis is not None)
+
+    def _get_redis(self):
+        if self._redis is None and self.redis_url and aioredis is not None:
+            self._redis = aioredis.from_url(
+                self.redis_url,
+                socket_timeout=config.REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=config.REDIS_SOCKET_TIMEOUT
+            )
+        if self._redis is None or time.monotonic() < self._redis_retry_at:
+            return None
+        return self._redis
+
+    def _redis_failed(self, action: str, error: Exception) -> None:
+        self.metrics.redis_errors.inc()
+        self._redis_retry_at = time.monotonic() + REDIS_RETRY_INTERVAL
+        logger.warning(f"Redis {action}失败，{REDIS_RETRY_INTERVAL:.0f}秒内仅使用进程内缓存: {str(error)}")
+
+    async def _redis_get(self, key: str) -> Any:
+        client = self._get_redis()
+        if client is None:
+            return MISSING
+        try:
+            raw = await client.get(key)
+        except Exception as e:
+            self._redis_failed("读取", e)
+            return MISSING
+        if raw is None:
+            return MISSING
+        try:
+            return json.loads(raw)
+        except ValueError:
+            logger.warning(f"Redis 缓存值无法解析，已忽略: {key}")
+            return MISSING
+
+    async def _redis_set(self, key: str, value: Any, ttl: float) -> None:
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            raw = json.dumps(value, ensure_ascii=False)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"缓存值无法序列化，仅写入进程内缓存: {key}, {str(e)}")
+            return
+        try:
+            await client.set(key, raw, px=max(int(ttl * 1000), 1))
+        except Exception as e:
+            self._redis_failed("写入", e)
+
+    # ---------- 读写 ----------
+
+    async def get(self, key: str, local_only: bool = False, ttl: Optional[float] = None) -> Any:
+        """
+        读取缓存
+        :param key: 完整缓存键
+        :param local_only: 是否只读取进程内缓存
+        :param ttl: Redis 命中后回填进程内缓存的过期时间(秒)，默认使用 default_ttl
+        :return: 缓存值，未命中时返回 MISSING
+        """
+        value = self.local.get(key)
+        if value is not MISSING:
+            self.metrics.local_hits.inc()
+            return value
+        if not local_only:
+            value = await self._redis_get(key)
+            if value is not MISSING:
+                self.metrics.redis_hits.inc()
+                self.local.set(key, value, self.default_ttl if ttl is None else ttl)
+                return value
+        self.metrics.misses.inc()
+        return MISSING
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None, local_only: bool = False) -> None:
+        """
+        写入缓存
+        :param key: 完整缓存键
+        :param value: 缓存值
+        :param ttl: 过期时间(秒)，默认使用 default_ttl
+        :param local_only: 是否只写入进程内缓存
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        self.local.set(key, value, ttl)
+        if not local_only:
+            await self._redis_set(key, value, ttl)
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None,
+        local_only: bool = False
+    ) -> Any:
+        """
+        读取缓存，未命中时调用加载函数并写入缓存
+        同一进程内同一键的并发未命中只会调用一次加载函数，其余请求等待并共享其结果；
+        加载期间该键被失效时，结果只返回给已在等待的请求，不写入缓存，之后的请求重新加载
+        :param key: 完整缓存键
+        :param loader: 无参异步加载函数
+        :param ttl: 过期时间(秒)
+        :param local_only: 是否只使用进程内缓存
+        :return: 缓存值或加载结果
+        """
+        value = await self.get(key, local_only, ttl)
+        if value is not MISSING:
+            return value
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.metrics.coalesced.inc()
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            self.metrics.loads.inc()
+            value = await loader()
+            if future in self._stale_loads:
+                # 加载期间数据已变更，结果可能是旧值
+                self.metrics.stale_loads.inc()
+            else:
+                await self.set(key, value, ttl, local_only)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            self.metrics.load_errors.inc()
+            future.set_exception(e)
+            # 没有其他等待者时避免出现 "Future exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            self._stale_loads.discard(future)
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    # ---------- 失效 ----------
+
+    def add_invalidation_listener(self, callback: Callable[[str], Any]) -> None:
+        """
+        注册失效回调
+        本进程或其他进程触发失效时以失效的键（或以 * 结尾的前缀）调用，可用于同步清理派生数据
+        :param callback: 回调函数，可以是普通函数或协程函数
+        """
+        self._listeners.append(callback)
+
+    async def _apply_invalidation(self, target: str) -> None:
+        if target.endswith("*"):
+            self.local.delete_prefix(target[:-1])
+            loading = [key for key in self._inflight if key.startswith(target[:-1])]
+        else:
+            self.local.delete(target)
+            loading = [target] if target in self._inflight else []
+        # 正在加载的键：结果不写入缓存，之后的请求不再等待这次加载
+        for key in loading:
+            self._stale_loads.add(self._inflight.pop(key))
+        self.metrics.invalidations.inc()
+        for callback in self._listeners:
+            try:
+                result = callback(target)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"缓存失效回调执行失败: {target}, {str(e)}")
+
+    async def _publish_invalidation(self, target: str) -> None:
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            await client.publish(self.invalidation_channel, target)
+        except Exception as e:
+            self._redis_failed("发布失效通知", e)
+
+    async def delete(self, key: str) -> None:
+        """
+        失效单个缓存键
+        :param key: 完整缓存键
+        """
+        await self._apply_invalidation(key)
+        client = self._get_redis()
+        if client is not None:
+            try:
+                await client.delete(key)
+            except Exception as e:
+                self._redis_failed("删除", e)
+        await self._publish_invalidation(key)
+
+    async def invalidate_namespace(self, namespace: str) -> None:
+        """
+        失效整个命名空间
+        :param namespace: 命名空间
+        """
+        prefix = self.make_key(namespace)
+        await self._apply_invalidation(prefix + "*")
+        client = self._get_redis()
+        if client is not None:
+            try:
+                batch = []
+                async for key in client.scan_iter(match=prefix + "*", count=500):
+                    batch.append(key)
+                    if len(batch) >= 500:
+                        await client.unlink(*batch)
+                        batch = []
+                if batch:
+                    await client.unlink(*batch)
+            except Exception as e:
+                self._redis_failed("批量删除", e)
+        await self._publish_invalidation(prefix + "*")
+
+    async def clear(self) -> None:
+        """
+        清空进程内缓存（不影响 Redis）
+        """
+        self.local.clear()
+
+    # ---------- 生命周期 ----------
+
+    async def _listen_invalidations(self) -> None:
+        while True:
+            client = self._get_redis()
+            if client is None:
+                await asyncio.sleep(REDIS_RETRY_INTERVAL)
+                continue
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.invalidation_channel)
+                async for message in pubsub.listen():
+                    target = message.get("data")
+                    if isinstance(target, bytes):
+                        target = target.decode("utf-8")
+                    if isinstance(target, str):
+                        await self._apply_invalidation(target)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._redis_failed("订阅失效通知", e)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    async def start(self) -> None:
+        """
+        启动失效通知订阅（仅启用 Redis 时）
+        应用启动时调用
+        """
+        if self.redis_enabled and self._subscriber_task is None:
+            self._subscriber_task = asyncio.create_task(self._listen_invalidations())
+
+    async def close(self) -> None:
+        """
+        停止订阅并关闭 Redis 连接
+        应用关闭时调用
+        """
+        if self._subscriber_task is not None:
+            self._subscriber_task.cancel()
+            try:
+                await self._subscriber_task
+            except asyncio.CancelledError:
+                pass
+            self._subscriber_task = None
+        if self._redis is not None:
+            try:
+                await self._redis.aclose()
+            except Exception as e:
+                logger.warning(f"关闭 Redis 连接失败: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取缓存状态
+        :return: 缓存指标及配置
+        """
+        return {
+            "enabled": config.CACHE_ENABLED,
+            "redis_enabled": self.redis_enabled,
+            "redis_available": self.redis_enabled and time.monotonic() >= self._redis_retry_at,
+            "local_entries": len(self.local),
+            "local_max_entries": self.local.max_entries,
+            "inflight": len(self._inflight),
+            **self.metrics.snapshot()
+        }
+
+
+def _default_key_builder(func: Callable, exclude: Tuple[str, ...]) -> Callable[..., str]:
+    """
+    生成默认键构造函数：按参数名绑定调用参数，忽略数据库会话等参数后序列化为键后缀
+    """
+    signature = inspect.signature(func)
+
+    def build(*args, **kwargs) -> str:
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        parts = {
+            name: value for name, value in bound.arguments.items()
+            if name not in exclude and not isinstance(value, (Session, AsyncSession))
+        }
+        suffix = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=repr)
+        if len(suffix) > MAX_KEY_SUFFIX_LENGTH:
+            suffix = hashlib.sha1(suffix.encode("utf-8")).hexdigest()
+        return suffix
+
+    return build
+
+
+def cached(
+    namespace: str,
+    ttl: Optional[float] = None,
+    key_builder: Optional[Callable[..., str]] = None,
+    local_only: bool = False,
+    exclude: Tuple[str, ...] = DEFAULT_EXCLUDED_ARGS,
+    cache_instance: Optional[TwoTierCache] = None
+):
+    """
+    缓存异步函数结果的装饰器
+    :param namespace: 命名空间，同一命名空间的键可以统一失效
+    :param ttl: 过期时间(秒)，默认使用 CACHE_DEFAULT_TTL
+    :param key_builder: 键构造函数，接收与被装饰函数相同的参数并返回键后缀；默认按参数值构造
+    :param local_only: 是否只使用进程内缓存（缓存值不可 JSON 序列化时使用）
+    :param exclude: 默认键构造时忽略的参数名
+    :param cache_instance: 使用的缓存实例，默认为模块级 cache
+    :return: 装饰器；被装饰函数额外提供 invalidate(*args, **kwargs)、invalidate_all() 和 cache_key(*args, **kwargs)
+    """
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        build_suffix = key_builder or _default_key_builder(func, exclude)
+
+        def target() -> TwoTierCache:
+            return cache_instance or cache
+
+        def cache_key(*args, **kwargs) -> str:
+            return target().make_key(namespace, str(build_suffix(*args, **kwargs)))
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not config.CACHE_ENABLED:
+                return await func(*args, **kwargs)
+            return await target().get_or_load(
+                cache_key(*args, **kwargs),
+                lambda: func(*args, **kwargs),
+                ttl=ttl,
+                local_only=local_only
+            )
+
+        async def invalidate(*args, **kwargs) -> None:
+            await target().delete(cache_key(*args, **kwargs))
+
+        async def invalidate_all() -> None:
+            await target().invalidate_namespace(namespace)
+
+        wrapper.cache_key = cache_key
+        wrapper.invalidate = invalidate
+        wrapper.invalidate_all = invalidate_all
+        wrapper.namespace = namespace
+        return wrapper
+
+    return decorator
+
+
+# 全局缓存实例
+cache = TwoTierCache(
+    redis_url=config.REDIS_URL,
+    key_prefix=config.CACHE_KEY_PREFIX,
+    max_local_entries=config.CACHE_LOCAL_MAX_ENTRIES,
+    default_ttl=config.CACHE_DEFAULT_TTL
+)
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """
+    获取全局缓存状态
+    :return: 缓存指标字典
+    """
+    return cache.stats()
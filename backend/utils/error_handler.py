@@ -4,17 +4,13 @@ from datetime import datetime
 from fastapi import HTTPException, Request
 from fastapi.responses import JSONResponse
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.middleware.base import BaseHTTPMiddleware
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("app.log"),
-        logging.StreamHandler()
-    ]
-)
+from utils.logger import configure_logging
+
+# 配置日志（经队列由后台线程写入控制台和轮转文件）
+configure_logging()
 
 logger = logging.getLogger("app")
 
@@ -61,6 +57,22 @@ def handle_database_error(db_session, exception: Exception) -> None:
     log_error("DatabaseError", str(exception), exc_info=True)
 
 
+async def handle_async_database_error(db_session, exception: Exception) -> None:
+    """
+    处理异步会话的数据库错误并执行回滚
+    :param db_session: 异步数据库会话对象
+    :param exception: 捕获的异常
+    """
+    try:
+        if db_session and hasattr(db_session, 'rollback'):
+            await db_session.rollback()
+            log_error("DatabaseError", f"事务已回滚: {str(exception)}")
+    except Exception as rollback_error:
+        log_error("RollbackError", f"回滚失败: {str(rollback_error)}")
+    
+    log_error("DatabaseError", str(exception), exc_info=True)
+
+
 def create_error_response(error_type: str, message: str, status_code: int = 500) -> dict:
     """
     创建统一的错误响应格式
@@ -198,7 +210,7 @@ def handle_exceptions(func):
 class db_transaction:
     """
     数据库事务上下文管理器
-    确保数据库操作的原子性，自动提交或回滚
+    确保数据库操作的原子性，自动提交或回滚，同时支持 Session 与 AsyncSession
     """
     def __init__(self, db_session):
         self.db_session = db_session
@@ -207,14 +219,21 @@ class db_transaction:
         return self.db_session
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
+        is_async = isinstance(self.db_session, AsyncSession)
         try:
             if exc_type is not None:
                 # 发生异常，执行回滚
-                handle_database_error(self.db_session, exc_val)
+                if is_async:
+                    await handle_async_database_error(self.db_session, exc_val)
+                else:
+                    handle_database_error(self.db_session, exc_val)
                 return False  # 不抑制异常，让上层处理
             else:
                 # 没有异常，提交事务
-                self.db_session.commit()
+                if is_async:
+                    await self.db_session.commit()
+                else:
+                    self.db_session.commit()
                 return True
         except Exception as e:
             # 提交或回滚过程中发生错误
@@ -222,7 +241,10 @@ class db_transaction:
             # 再次尝试回滚
             if hasattr(self.db_session, 'rollback'):
                 try:
-                    self.db_session.rollback()
+                    if is_async:
+                        await self.db_session.rollback()
+                    else:
+                        self.db_session.rollback()
                 except:
                     pass
             return False
\ No newline at end of file
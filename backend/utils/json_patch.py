@@ -0,0 +1,260 @@
+"""
+JSON 列增量更新
+问卷会话数据（UserFlowState.temp_data、QuestionnaireProgress.session_data）随答题不断增长，
+整列重写的写入量与问卷长度成正比。JsonColumnPatcher 记录加载时的列值，写入时只提交有变化的路径：
+
+- PostgreSQL：列类型为 JSONB，修改合并为一条 UPDATE，使用 jsonb_set 按路径写入，列表追加使用 || 拼接
+- 其他数据库：修改按路径写入附属表 json_field_entries，读取时叠加到列值上；整体替换时清除附属记录
+
+用法示例：
+    patcher = JsonColumnPatcher(db, flow_state, "temp_data")
+    data = patcher.load()              # 合并后的数据，同时设置为实例的列值
+    data["basic_info"]["name"] = "张三"  # 直接修改
+    patcher.write()                    # 只写入 /basic_info/name
+
+注意：非 PostgreSQL 数据库上列值本身不包含增量记录，读取必须通过 load()
+"""
+import copy
+import json
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Text, cast, delete, func, insert, inspect, literal, or_, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from models.json_patch import JsonFieldEntry
+
+logger = logging.getLogger("app.json_patch")
+
+# 修改操作：("set", 路径, 新值) 或 ("append", 列表路径, 追加的元素列表)
+PatchOp = Tuple[str, Tuple, Any]
+
+
+def diff_json(old: Any, new: Any, path: Tuple = ()) -> Optional[List[PatchOp]]:
+    """
+    计算两个 JSON 值之间的修改操作
+    字典逐键比较（只新增或修改的键递归处理），列表只识别尾部追加，其余变化整体写入该路径
+    :param old: 原值
+    :param new: 新值
+    :param path: 当前路径
+    :return: 修改操作列表；无法用修改操作表达（如删除了键、类型变化）时返回 None，由调用方整体写入
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        if any(key not in new for key in old):
+            return None
+        ops: List[PatchOp] = []
+        for key, value in new.items():
+            child_path = path + (str(key),)
+            if key not in old:
+                ops.append(("set", child_path, value))
+            elif old[key] != value:
+                child_ops = diff_json(old[key], value, child_path)
+                ops.extend(child_ops if child_ops is not None else [("set", child_path, value)])
+        return ops
+    if isinstance(old, list) and isinstance(new, list):
+        if len(new) >= len(old) and new[:len(old)] == old:
+            added = new[len(old):]
+            return [("append", path, added)] if added else []
+        return None
+    return None if old != new else []
+
+
+def _pointer(path: Sequence) -> str:
+    # RFC 6901 JSON Pointer
+    return "".join("/" + str(segment).replace("~", "~0").replace("/", "~1") for segment in path)
+
+
+def _parse_pointer(pointer: str) -> List[str]:
+    return [segment.replace("~1", "/").replace("~0", "~") for segment in pointer.split("/")[1:]]
+
+
+def _apply_entry(data: Dict, segments: List[str], value: Any) -> bool:
+    # 按路径写入附属记录，父节点缺失时返回 False
+    node: Any = data
+    for segment in segments[:-1]:
+        if isinstance(node, dict):
+            node = node.get(segment)
+        elif isinstance(node, list) and segment.isdigit() and int(segment) < len(node):
+            node = node[int(segment)]
+        else:
+            return False
+    last = segments[-1]
+    if isinstance(node, dict):
+        node[last] = copy.deepcopy(value)
+        return True
+    if isinstance(node, list) and last.isdigit():
+        index = int(last)
+        if index < len(node):
+            node[index] = copy.deepcopy(value)
+            return True
+        if index == len(node):
+            node.append(copy.deepcopy(value))
+            return True
+    return False
+
+
+class JsonColumnPatcher:
+    """
+    单个 ORM 实例上一个 JSON 列的增量读写
+    实例需已持久化（有主键），写入在调用方的事务中执行，由调用方提交
+    """
+
+    def __init__(self, db: Session, instance: Any, column: str):
+        """
+        :param db: 数据库会话
+        :param instance: ORM 实例
+        :param column: JSON 列的属性名
+        """
+        self.db = db
+        self.instance = instance
+        self.column = column
+        self.model = type(instance)
+        self.is_postgresql = db.get_bind().dialect.name == "postgresql"
+        self._snapshot: Any = None
+        self._loaded = False
+        self.writes = 0
+
+    @property
+    def _row_id(self) -> int:
+        return inspect(self.instance).identity[0]
+
+    def _owner_filter(self):
+        return (
+            (JsonFieldEntry.table_name == self.model.__tablename__)
+            & (JsonFieldEntry.row_id == self._row_id)
+            & (JsonFieldEntry.column_name == self.column)
+        )
+
+    def load(self) -> Dict:
+        """
+        读取列值（非 PostgreSQL 时叠加附属表中的增量记录），并设置为实例的列值
+        :return: 可直接修改的字典，修改后调用 write() 写入
+        """
+        data = getattr(self.instance, self.column)
+        data = copy.deepcopy(data) if isinstance(data, dict) else {}
+        if not self.is_postgresql:
+            rows = self.db.execute(
+                select(JsonFieldEntry.path, JsonFieldEntry.value)
+                .where(self._owner_filter())
+                .order_by(JsonFieldEntry.id)
+            ).all()
+            for pointer, value in rows:
+                if not _apply_entry(data, _parse_pointer(pointer), value):
+                    logger.warning(f"JSON 增量记录无法应用，已忽略: {self.model.__tablename__}.{self.column} {pointer}")
+        # 设置为已提交的值，避免 ORM 把整列当作修改写回
+        set_committed_value(self.instance, self.column, data)
+        self._snapshot = copy.deepcopy(data)
+        self._loaded = True
+        return data
+
+    def write(self, new_value: Optional[Dict] = None) -> int:
+        """
+        写入自加载（或上次写入）以来的修改
+        :param new_value: 新的列值，默认使用实例当前的列值（load() 返回的字典被原地修改后的结果）
+        :return: 写入的修改操作数，整体写入时为 1
+        """
+        if not self._loaded:
+            raise RuntimeError("JsonColumnPatcher.write() 之前需要先调用 load()")
+        if new_value is None:
+            new_value = getattr(self.instance, self.column)
+
+        # 调用方直接给列赋了新值，ORM 会整体写入，这里只需清除增量记录
+        if inspect(self.instance).attrs[self.column].history.has_changes():
+            self._clear_entries()
+            self._snapshot = copy.deepcopy(new_value)
+            return 1
+
+        ops = diff_json(self._snapshot, new_value)
+        if ops is None:
+            self.replace(new_value)
+            return 1
+        if ops:
+            if self.is_postgresql:
+                self._write_jsonb(ops)
+            else:
+                self._write_entries(ops)
+            self.writes += len(ops)
+        if new_value is not getattr(self.instance, self.column):
+            set_committed_value(self.instance, self.column, new_value)
+        self._snapshot = copy.deepcopy(new_value)
+        return len(ops)
+
+    def replace(self, value: Dict) -> None:
+        """
+        整体写入列值，并清除增量记录
+        :param value: 新的列值
+        """
+        self.db.execute(
+            update(self.model)
+            .where(inspect(self.model).primary_key[0] == self._row_id)
+            .values({self.column: value})
+            .execution_options(synchronize_session=False)
+        )
+        self._clear_entries()
+        set_committed_value(self.instance, self.column, value)
+        self._snapshot = copy.deepcopy(value)
+        self._loaded = True
+
+    def _clear_entries(self) -> None:
+        if not self.is_postgresql:
+            self.db.execute(delete(JsonFieldEntry).where(self._owner_filter()))
+
+    def _write_jsonb(self, ops: List[PatchOp]) -> None:
+        # 所有修改嵌套为一个表达式，一条 UPDATE 完成；各操作的路径互不包含，追加时直接引用原列值
+        # 列按 JSONB 参与运算：未执行 update_questionnaire_progress_table.py 的旧库中列仍为 json
+        column = cast(getattr(self.model, self.column), JSONB)
+        expr = func.coalesce(column, cast(literal("{}"), JSONB))
+        for kind, path, value in ops:
+            json_path = literal(list(path), ARRAY(Text))
+            if kind == "append":
+                current = func.coalesce(column.op("#>")(json_path), cast(literal("[]"), JSONB))
+                new = current.op("||")(cast(literal(json.dumps(value, ensure_ascii=False, default=str)), JSONB))
+            else:
+                new = cast(literal(json.dumps(value, ensure_ascii=False, default=str)), JSONB)
+            expr = func.jsonb_set(expr, json_path, new, True)
+        self.db.execute(
+            update(self.model)
+            .where(inspect(self.model).primary_key[0] == self._row_id)
+            .values({self.column: expr})
+            .execution_options(synchronize_session=False)
+        )
+
+    def _write_entries(self, ops: List[PatchOp]) -> None:
+        table_name = self.model.__tablename__
+        row_id = self._row_id
+        rows = []
+        replaced = []
+        for kind, path, value in ops:
+            if kind == "append":
+                # 追加的元素按下标逐条记录
+                base = len(self._get_path(self._snapshot, path))
+                for offset, item in enumerate(value):
+                    rows.append((_pointer(path + (str(base + offset),)), item))
+            else:
+                pointer = _pointer(path)
+                replaced.append(pointer)
+                rows.append((pointer, value))
+        if replaced:
+            # 同一路径及其子路径的旧记录已被覆盖
+            self.db.execute(
+                delete(JsonFieldEntry).where(
+                    self._owner_filter(),
+                    or_(*[
+                        or_(JsonFieldEntry.path == pointer, JsonFieldEntry.path.startswith(pointer + "/", autoescape=True))
+                        for pointer in replaced
+                    ])
+                )
+            )
+        self.db.execute(insert(JsonFieldEntry), [
+            {"table_name": table_name, "row_id": row_id, "column_name": self.column, "path": pointer, "value": value}
+            for pointer, value in rows
+        ])
+
+    @staticmethod
+    def _get_path(data: Any, path: Tuple) -> Any:
+        # diff_json 只沿字典向下递归，路径中都是字典键
+        for segment in path:
+            data = data[segment]
+        return data
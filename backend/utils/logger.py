@@ -1,57 +1,262 @@
+"""
+日志模块
+所有日志经根日志记录器上的 QueueHandler 放入有界队列，由后台线程（QueueListener）写入控制台和按日期命名的文件，
+调用 logger.info 等方法时不再同步写磁盘：
+
+- 日志文件按日期命名（logs/backend/app_<日期>.log），日期变化时切换到新文件，保留最近 LOG_BACKUP_COUNT 天；
+  已有文件不会被重命名，多个进程（fork 的工作进程、多 worker 部署）以追加方式写入同一文件，互不覆盖
+- 队列容量为 LOG_QUEUE_SIZE，队列满时按 LOG_QUEUE_OVERFLOW 处理：drop 丢弃新日志（默认），block 最多等待 1 秒后丢弃；
+  丢弃条数计入指标，并在队列恢复后补记一条警告
+- 进程 fork 后在子进程中重新启动写入线程，进程退出时写完队列中剩余的日志
+"""
+import atexit
 import logging
+import logging.handlers
 import os
-from datetime import datetime
+import queue
+import threading
+from datetime import date
+from typing import Any, Dict, Optional
+
+from utils import config
+from utils.metrics import Counter
 
 # 确保日志目录存在
 LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'logs', 'backend')
 os.makedirs(LOG_DIR, exist_ok=True)
 
+# 日志文件名前缀，每天的文件为 app_<日期>.log
+LOG_FILE_PREFIX = 'app'
+
 # 获取当前日期作为日志文件名的一部分
-current_date = datetime.now().strftime('%Y-%m-%d')
-LOG_FILE = os.path.join(LOG_DIR, f'app_{current_date}.log')
+current_date = date.today().strftime('%Y-%m-%d')
+LOG_FILE = os.path.join(LOG_DIR, f'{LOG_FILE_PREFIX}_{current_date}.log')
 
 # 配置日志格式
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 
+# 队列满时 block 策略的最长等待时间（秒）
+BLOCK_TIMEOUT = 1.0
+
+
+class DailyFileHandler(logging.FileHandler):
+    """
+    按日期命名的日志文件处理器
+    记录的日期变化时关闭当前文件并打开新日期的文件，不重命名已有文件；超出保留天数的旧文件被删除
+    """
+
+    def __init__(self, directory: str, prefix: str, backup_count: int, encoding: Optional[str] = None):
+        """
+        :param directory: 日志目录
+        :param prefix: 文件名前缀
+        :param backup_count: 保留的历史日志文件数，0 表示不删除
+        :param encoding: 文件编码
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.backup_count = backup_count
+        self.current_date = date.today()
+        super().__init__(self._path(self.current_date), encoding=encoding, delay=True)
+
+    def _path(self, day: date) -> str:
+        return os.path.join(self.directory, f"{self.prefix}_{day:%Y-%m-%d}.log")
+
+    def _remove_expired(self) -> None:
+        if self.backup_count <= 0:
+            return
+        current = os.path.basename(self.baseFilename)
+        names = sorted(
+            name for name in os.listdir(self.directory)
+            if name.startswith(f"{self.prefix}_") and name.endswith(".log") and name != current
+        )
+        for name in names[:-self.backup_count]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                # 其他进程已删除
+                pass
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # handle() 已持有处理器锁
+        day = date.fromtimestamp(record.created)
+        if day != self.current_date:
+            if self.stream is not None:
+                self.stream.close()
+                self.stream = None
+            self.current_date = day
+            self.baseFilename = self._path(day)
+            self._remove_expired()
+        super().emit(record)
+
+
+class LoggingMetrics:
+    """
+    日志队列指标
+    """
+
+    def __init__(self):
+        self.enqueued = Counter()
+        self.dropped = Counter()
+
+    def reset(self) -> None:
+        for counter in vars(self).values():
+            counter.reset()
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    有界队列日志处理器
+    队列满时按溢出策略丢弃日志，不抛出异常也不无限阻塞调用方
+    """
+
+    def __init__(self, log_queue: queue.Queue, overflow: str, metrics: LoggingMetrics):
+        """
+        :param log_queue: 有界日志队列
+        :param overflow: 溢出策略，drop 或 block
+        :param metrics: 日志队列指标
+        """
+        super().__init__(log_queue)
+        self.overflow = overflow
+        self.metrics = metrics
+        self._unreported = 0
+        self._unreported_lock = threading.Lock()
+
+    def _put(self, record: logging.LogRecord) -> bool:
+        try:
+            if self.overflow == "block":
+                self.queue.put(record, timeout=BLOCK_TIMEOUT)
+            else:
+                self.queue.put_nowait(record)
+            return True
+        except queue.Full:
+            return False
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if not self._put(record):
+            self.metrics.dropped.inc()
+            with self._unreported_lock:
+                self._unreported += 1
+            return
+        self.metrics.enqueued.inc()
+        if self._unreported:
+            with self._unreported_lock:
+                dropped, self._unreported = self._unreported, 0
+            if dropped:
+                notice = logging.LogRecord(
+                    "app.logging", logging.WARNING, __file__, 0,
+                    f"日志队列已满，丢弃了 {dropped} 条日志", None, None
+                )
+                if not self._put(notice):
+                    with self._unreported_lock:
+                        self._unreported += dropped
+
+
+class LoggingPipeline:
+    """
+    异步日志管道：根日志记录器 -> 有界队列 -> 后台写入线程 -> 控制台 / 按日期命名的文件
+    """
+
+    def __init__(self):
+        self.metrics = LoggingMetrics()
+        self.handler: Optional[BoundedQueueHandler] = None
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self._lock = threading.Lock()
+
+    def _output_handlers(self):
+        formatter = logging.Formatter(LOG_FORMAT)
+        console_handler = logging.StreamHandler()
+        file_handler = DailyFileHandler(LOG_DIR, LOG_FILE_PREFIX, config.LOG_BACKUP_COUNT, encoding='utf-8')
+        for output in (console_handler, file_handler):
+            output.setLevel(logging.INFO)
+            output.setFormatter(formatter)
+        return console_handler, file_handler
+
+    def _start_listener(self) -> None:
+        self.listener = logging.handlers.QueueListener(
+            self.handler.queue, *self._output_handlers(), respect_handler_level=True
+        )
+        self.listener.start()
+
+    def configure(self) -> None:
+        """
+        为根日志记录器安装队列处理器并启动写入线程（只执行一次）
+        """
+        with self._lock:
+            if self.handler is not None:
+                return
+            overflow = config.LOG_QUEUE_OVERFLOW if config.LOG_QUEUE_OVERFLOW in ("drop", "block") else "drop"
+            self.handler = BoundedQueueHandler(queue.Queue(maxsize=config.LOG_QUEUE_SIZE), overflow, self.metrics)
+            root = logging.getLogger()
+            root.setLevel(logging.INFO)
+            root.addHandler(self.handler)
+            self._start_listener()
+            atexit.register(self.stop)
+            if hasattr(os, "register_at_fork"):
+                os.register_at_fork(after_in_child=self._restart_in_child)
+
+    def _restart_in_child(self) -> None:
+        # 写入线程不会随 fork 复制到子进程，换用新队列并重新启动
+        if self.handler is None:
+            return
+        self._lock = threading.Lock()
+        self.handler.queue = queue.Queue(maxsize=config.LOG_QUEUE_SIZE)
+        self._start_listener()
+
+    def stop(self) -> None:
+        """
+        写完队列中剩余的日志并停止写入线程
+        """
+        with self._lock:
+            if self.listener is not None:
+                self.listener.stop()
+                for output in self.listener.handlers:
+                    output.close()
+                self.listener = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取日志队列状态
+        :return: 队列容量、当前积压条数、已入队与丢弃条数
+        """
+        return {
+            "queue_size": config.LOG_QUEUE_SIZE,
+            "queue_depth": self.handler.queue.qsize() if self.handler is not None else 0,
+            "overflow": self.handler.overflow if self.handler is not None else None,
+            "enqueued": self.metrics.enqueued.value,
+            "dropped": self.metrics.dropped.value,
+        }
+
+
+# 全局日志管道
+logging_pipeline = LoggingPipeline()
+
+
+def configure_logging() -> None:
+    """
+    配置全局异步日志管道（重复调用无副作用）
+    """
+    logging_pipeline.configure()
+
+
 def setup_logger(name=None):
     """
     设置日志记录器
-    
+    日志经根日志记录器的队列处理器异步写出，记录器本身不再挂载处理器
+
     Args:
         name: 日志记录器的名称，如果为None，则返回根日志记录器
-    
+
     Returns:
         logging.Logger: 配置好的日志记录器
     """
+    configure_logging()
+
     # 获取或创建日志记录器
     logger = logging.getLogger(name)
-    
-    # 避免重复配置
-    if logger.handlers:
-        return logger
-    
+
     # 设置日志级别
     logger.setLevel(logging.INFO)
-    
-    # 创建控制台处理器
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-    
-    # 创建文件处理器
-    file_handler = logging.FileHandler(LOG_FILE, encoding='utf-8')
-    file_handler.setLevel(logging.INFO)
-    
-    # 创建格式化器
-    formatter = logging.Formatter(LOG_FORMAT)
-    
-    # 设置处理器的格式化器
-    console_handler.setFormatter(formatter)
-    file_handler.setFormatter(formatter)
-    
-    # 添加处理器到日志记录器
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
-    
+
     return logger
 
 # 创建默认的日志记录器
@@ -63,4 +268,4 @@ debug = default_logger.debug
 warning = default_logger.warning
 error = default_logger.error
 exception = default_logger.exception
-critical = default_logger.critical
\ No newline at end of file
+critical = default_logger.critical
@@ -0,0 +1,98 @@
+"""
+进程内指标工具
+提供线程安全的计数器和延迟直方图，供连接池、缓存等模块上报运行指标
+"""
+import threading
+from typing import Dict, Iterable
+
+# 默认的延迟分桶（毫秒）
+DEFAULT_LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class LatencyHistogram:
+    """
+    延迟直方图
+    以毫秒为单位统计耗时分布，分桶为累计计数（与 Prometheus 的 le 语义一致）
+    """
+
+    def __init__(self, buckets_ms: Iterable[float] = DEFAULT_LATENCY_BUCKETS_MS):
+        self._buckets = tuple(sorted(buckets_ms))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        清空统计数据
+        """
+        with self._lock:
+            self._counts = [0] * (len(self._buckets) + 1)
+            self._count = 0
+            self._sum_ms = 0.0
+            self._max_ms = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """
+        记录一次耗时
+        :param seconds: 耗时（秒）
+        """
+        elapsed_ms = seconds * 1000.0
+        with self._lock:
+            index = len(self._buckets)
+            for i, bound in enumerate(self._buckets):
+                if elapsed_ms <= bound:
+                    index = i
+                    break
+            self._counts[index] += 1
+            self._count += 1
+            self._sum_ms += elapsed_ms
+            if elapsed_ms > self._max_ms:
+                self._max_ms = elapsed_ms
+
+    def snapshot(self) -> Dict:
+        """
+        获取当前统计快照
+        :return: 包含分桶计数、总次数、总耗时、最大耗时、平均耗时的字典
+        """
+        with self._lock:
+            buckets = {}
+            cumulative = 0
+            for bound, count in zip(self._buckets, self._counts):
+                cumulative += count
+                buckets[f"le_{bound}ms"] = cumulative
+            buckets["le_inf"] = cumulative + self._counts[-1]
+            return {
+                "buckets": buckets,
+                "count": self._count,
+                "sum_ms": round(self._sum_ms, 3),
+                "max_ms": round(self._max_ms, 3),
+                "avg_ms": round(self._sum_ms / self._count, 3) if self._count else 0.0
+            }
+
+
+class Counter:
+    """
+    线程安全计数器
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        """
+        计数增加
+        :param amount: 增加量
+        """
+        with self._lock:
+            self._value += amount
+
+    def reset(self) -> None:
+        """
+        计数清零
+        """
+        with self._lock:
+            self._value = 0
+
+    @property
+    def value(self) -> int:
+        return self._value
@@ -0,0 +1,228 @@
+"""
+N-gram 倒排索引
+中文没有空格分词，按字符二元组（bigram）建立倒排索引，可在名称、描述等多个字段上做相关度检索：
+
+- 每个字段的文本按空白和标点切分为片段，片段内取全部二元组，单字片段和单字查询使用一元组
+- 相关度 = 命中的查询 n-gram 的 idf 之和（按字段加权），完整包含查询片段的字段额外加分
+- 命中的查询 n-gram 少于 min_coverage 比例的文档不返回
+构建完成后只读，可在多线程间共享
+"""
+import html
+import math
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from utils.aho_corasick import AhoCorasick, fold_case
+
+
+# 空白和标点都作为片段分隔
+_SEPARATOR = re.compile(r"[\W_]+")
+
+
+def _segments(text: str) -> List[str]:
+    return [segment for segment in _SEPARATOR.split(fold_case(text)) if segment] if text else []
+
+
+def query_grams(text: str) -> List[str]:
+    """
+    查询文本的 n-gram（去重，保持顺序）
+    :param text: 查询文本
+    :return: 二元组列表，单字片段取一元组
+    """
+    grams = []
+    for segment in _segments(text):
+        if len(segment) == 1:
+            grams.append(segment)
+        else:
+            grams.extend(segment[i:i + 2] for i in range(len(segment) - 1))
+    return list(dict.fromkeys(grams))
+
+
+def _document_grams(text: str) -> Set[str]:
+    grams = set()
+    for segment in _segments(text):
+        grams.update(segment)
+        grams.update(segment[i:i + 2] for i in range(len(segment) - 1))
+    return grams
+
+
+class NGramIndex:
+    """
+    多字段 n-gram 倒排索引
+    """
+
+    def __init__(
+        self,
+        documents: Sequence[Dict[str, Optional[str]]],
+        field_weights: Dict[str, float],
+        phrase_bonus: float = 1.0,
+        min_coverage: float = 0.5,
+        tie_breaker: Optional[Sequence[int]] = None
+    ):
+        """
+        :param documents: 文档列表，每个文档为 {字段名: 文本}，检索结果使用文档在列表中的下标
+        :param field_weights: 参与检索的字段及权重
+        :param phrase_bonus: 字段完整包含查询片段时的加分（乘以字段权重）
+        :param min_coverage: 文档至少命中的查询 n-gram 比例
+        :param tie_breaker: 每个文档的次序值，相关度相同时次序值小的在前（默认按文档下标）
+        """
+        self.field_weights = dict(field_weights)
+        self.phrase_bonus = phrase_bonus
+        self.min_coverage = min_coverage
+        self.size = len(documents)
+        self._tie_breaker = np.asarray(tie_breaker if tie_breaker is not None else range(self.size), dtype=np.int64)
+        self._max_bonus_per_phrase = phrase_bonus * sum(self.field_weights.values())
+        # 检索和加分在小写文本上进行
+        self._texts: List[Dict[str, str]] = [
+            {field: fold_case(document.get(field) or "") for field in self.field_weights}
+            for document in documents
+        ]
+        # n-gram -> (文档下标数组, 各文档中包含该 n-gram 的字段权重之和)
+        postings: Dict[str, Dict[int, float]] = {}
+        for doc_index, texts in enumerate(self._texts):
+            for field, weight in self.field_weights.items():
+                for gram in _document_grams(texts[field]):
+                    doc_weights = postings.setdefault(gram, {})
+                    doc_weights[doc_index] = doc_weights.get(doc_index, 0.0) + weight
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for gram, doc_weights in postings.items():
+            idf = math.log(1.0 + self.size / len(doc_weights))
+            self._postings[gram] = (
+                np.fromiter(doc_weights.keys(), dtype=np.int64, count=len(doc_weights)),
+                np.fromiter(doc_weights.values(), dtype=np.float64, count=len(doc_weights)) * idf,
+            )
+
+    def search(
+        self,
+        query: str,
+        candidates: Optional[Set[int]] = None,
+        limit: Optional[int] = None,
+        after: Optional[Tuple[float, int]] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        按相关度检索
+        :param query: 查询文本
+        :param candidates: 只在这些文档中检索（可选，如按分类筛选后的文档）
+        :param limit: 只返回相关度最高的前若干条（可选）
+        :param after: 上一页最后一条的 (相关度, 次序值)，只返回排在其后的文档（可选，用于游标分页）
+        :return: (文档下标, 相关度) 列表，按相关度降序
+        """
+        grams = query_grams(query)
+        if not grams or not self.size:
+            return []
+        # 每个 n-gram 的倒排列表中文档不重复，可直接按下标累加
+        scores = np.zeros(self.size, dtype=np.float64)
+        matched = np.zeros(self.size, dtype=np.int32)
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting is None:
+                continue
+            docs, weights = posting
+            scores[docs] += weights
+            matched[docs] += 1
+
+        selected = matched >= max(1.0, self.min_coverage * len(grams))
+        if candidates is not None:
+            mask = np.zeros(self.size, dtype=bool)
+            mask[list(candidates)] = True
+            selected &= mask
+        doc_indices = np.flatnonzero(selected)
+        base_scores = scores[doc_indices]
+
+        phrases = _segments(query)
+        max_bonus = self._max_bonus_per_phrase * len(phrases)
+        if after is not None:
+            after_score, after_tie = after
+            # 最终分不低于基础分，基础分高于游标相关度的文档一定排在游标之前
+            keep = base_scores <= after_score
+            doc_indices, base_scores = doc_indices[keep], base_scores[keep]
+            # 加上加分上限仍低于游标相关度的文档一定排在游标之后，其余按最终分精确比较
+            near = np.flatnonzero(base_scores + max_bonus >= after_score)
+            if len(near):
+                near_scores = self._final_scores(doc_indices[near], base_scores[near], phrases)
+                near_ties = self._tie_breaker[doc_indices[near]]
+                before = (near_scores > after_score) | ((near_scores == after_score) & (near_ties <= after_tie))
+                keep = np.ones(len(doc_indices), dtype=bool)
+                keep[near[before]] = False
+                doc_indices, base_scores = doc_indices[keep], base_scores[keep]
+
+        if limit is not None and limit < len(doc_indices):
+            # 加分不超过上限，基础分低于第 limit 名基础分减去加分上限的文档不可能进入前 limit 名
+            kth = np.partition(base_scores, len(base_scores) - limit)[len(base_scores) - limit]
+            keep = base_scores >= kth - max_bonus
+            doc_indices, base_scores = doc_indices[keep], base_scores[keep]
+
+        final_scores = self._final_scores(doc_indices, base_scores, phrases)
+        order = np.lexsort((self._tie_breaker[doc_indices], -final_scores))
+        if limit is not None:
+            order = order[:limit]
+        return list(zip(doc_indices[order].tolist(), final_scores[order].tolist()))
+
+    def tie_rank(self, doc_index: int) -> int:
+        """
+        :param doc_index: 文档下标
+        :return: 文档的次序值，与相关度一起作为游标
+        """
+        return int(self._tie_breaker[doc_index])
+
+    def _final_scores(self, doc_indices: np.ndarray, base_scores: np.ndarray, phrases: List[str]) -> np.ndarray:
+        # 基础分加上完整包含查询片段的字段加分
+        final_scores = base_scores.copy()
+        for row, doc_index in enumerate(doc_indices.tolist()):
+            texts = self._texts[doc_index]
+            for field, weight in self.field_weights.items():
+                for phrase in phrases:
+                    if phrase in texts[field]:
+                        final_scores[row] += self.phrase_bonus * weight
+        return final_scores
+
+
+class Highlighter:
+    """
+    查询命中片段高亮
+    按查询的 n-gram 标记命中字符，相邻或重叠的命中合并为一段；文本其余部分做 HTML 转义
+    """
+
+    def __init__(self, query: str, pre_tag: str = "<em>", post_tag: str = "</em>"):
+        self.pre_tag = pre_tag
+        self.post_tag = post_tag
+        self.matcher = AhoCorasick(query_grams(query))
+
+    def highlight(self, text: Optional[str]) -> Optional[str]:
+        """
+        :param text: 原文
+        :return: 带高亮标记的文本，没有命中时返回 None
+        """
+        if not text or not len(self.matcher):
+            return None
+        marked = [False] * len(text)
+        for start, end, _ in self.matcher.iter_matches(text):
+            for position in range(start, end):
+                marked[position] = True
+        if not any(marked):
+            return None
+        parts = []
+        position = 0
+        while position < len(text):
+            end = position
+            while end < len(text) and marked[end] == marked[position]:
+                end += 1
+            piece = html.escape(text[position:end])
+            parts.append(f"{self.pre_tag}{piece}{self.post_tag}" if marked[position] else piece)
+            position = end
+        return "".join(parts)
+
+    def highlight_fields(self, fields: Dict[str, Optional[str]], names: Iterable[str]) -> Dict[str, str]:
+        """
+        :param fields: {字段名: 原文}
+        :param names: 需要高亮的字段
+        :return: {字段名: 高亮文本}，只包含有命中的字段
+        """
+        highlights = {}
+        for name in names:
+            highlighted = self.highlight(fields.get(name))
+            if highlighted is not None:
+                highlights[name] = highlighted
+        return highlights
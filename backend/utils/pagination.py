@@ -0,0 +1,158 @@
+"""
+游标（keyset）分页
+列表按 (排序列, id) 倒序返回，游标记录上一页最后一条的排序值，下一页用
+(排序列, id) < (游标值) 的条件从索引中直接定位，翻页耗时与页码无关：
+
+- 游标对客户端不透明（base64url 编码的 JSON），只能原样传回
+- 同时传入游标和偏移量时以游标为准，未传游标时仍按偏移量分页，兼容旧客户端
+- 排序列应与 id 一起建立组合索引；可为空的时间列按 coalesce(列, NULL_DATETIME) 排序，
+  值为 NULL 的记录排在最早，不会被跳过（此时排序无法直接使用组合索引，只用于按用户筛选）；其他类型的排序列需非空
+- 正序遍历（如流式导出）可用 sort_keys、cursor_condition 和 row_cursor 自行拼接查询
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Iterable, List, Optional, Sequence
+
+from sqlalchemy import ColumnElement, DateTime, Select, func, literal, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from utils.error_handler import CustomException
+
+
+# 可为空的时间排序列中，NULL 按该值参与排序和生成游标
+NULL_DATETIME = datetime(1970, 1, 1)
+
+
+class CursorPage(list):
+    """
+    一页结果
+    与普通列表用法相同，另带下一页游标，没有更多数据时为 None
+    """
+
+    def __init__(self, items: Iterable = (), next_cursor: Optional[str] = None):
+        super().__init__(items)
+        self.next_cursor = next_cursor
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    编码游标
+    :param values: 排序值（时间按 ISO 格式保存）
+    :return: 游标字符串
+    """
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """
+    解码游标
+    :param cursor: 游标字符串
+    :param size: 排序值个数
+    :return: 排序值列表（时间仍为 ISO 字符串，由调用方按列类型转换）
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw.decode("utf-8"))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise CustomException(
+            status_code=400,
+            message="无效的分页游标",
+            error_type="InvalidCursor"
+        )
+    return values
+
+
+def _nullable_datetime(column) -> bool:
+    return isinstance(column.type, DateTime) and bool(column.nullable)
+
+
+def sort_keys(sort_columns: Sequence) -> List[ColumnElement]:
+    """
+    排序键表达式
+    :param sort_columns: 排序列
+    :return: 可为空的时间列替换为 coalesce(列, NULL_DATETIME)，其他列原样返回
+    """
+    return [
+        func.coalesce(column, literal(NULL_DATETIME, column.type)) if _nullable_datetime(column) else column
+        for column in sort_columns
+    ]
+
+
+def row_cursor(row: Any, sort_columns: Sequence) -> str:
+    """
+    由一页最后一条记录生成游标
+    :param row: ORM 对象或查询结果行（按列名取值）
+    :param sort_columns: 排序列
+    :return: 游标字符串
+    """
+    values = []
+    for column in sort_columns:
+        value = getattr(row, column.key)
+        if value is None and _nullable_datetime(column):
+            value = NULL_DATETIME
+        values.append(value)
+    return encode_cursor(values)
+
+
+def _cursor_values(cursor: str, sort_columns: Sequence) -> List[Any]:
+    values = decode_cursor(cursor, len(sort_columns))
+    try:
+        return [
+            datetime.fromisoformat(value) if isinstance(column.type, DateTime) else value
+            for column, value in zip(sort_columns, values)
+        ]
+    except (TypeError, ValueError):
+        raise CustomException(
+            status_code=400,
+            message="无效的分页游标",
+            error_type="InvalidCursor"
+        )
+
+
+def cursor_condition(sort_columns: Sequence, cursor: str, descending: bool = True) -> ColumnElement:
+    """
+    游标之后的记录的筛选条件
+    :param sort_columns: 排序列，最后一列须唯一（通常为 id）
+    :param cursor: 上一页返回的游标
+    :param descending: 是否倒序遍历
+    :return: (排序键) < 游标值（正序时为 >）
+    """
+    values = tuple_(*_cursor_values(cursor, sort_columns))
+    keys = tuple_(*sort_keys(sort_columns))
+    return keys < values if descending else keys > values
+
+
+async def paginate(
+    db: AsyncSession,
+    query: Select,
+    sort_columns: Sequence,
+    limit: int,
+    offset: int = 0,
+    cursor: Optional[str] = None
+) -> CursorPage:
+    """
+    按 sort_columns 倒序分页查询
+    :param db: 数据库会话
+    :param query: 已添加筛选条件、未排序的查询
+    :param sort_columns: 排序列，最后一列须唯一（通常为 id）
+    :param limit: 返回的记录数量
+    :param offset: 偏移量（未传游标时使用）
+    :param cursor: 上一页返回的游标（可选）
+    :return: 一页结果，多取一条判断是否还有下一页
+    """
+    if cursor:
+        query = query.where(cursor_condition(sort_columns, cursor))
+    elif offset:
+        query = query.offset(offset)
+    query = query.order_by(*(key.desc() for key in sort_keys(sort_columns))).limit(limit + 1)
+    rows = (await db.execute(query)).scalars().all()
+    if len(rows) <= limit:
+        return CursorPage(rows)
+    last = rows[limit - 1]
+    return CursorPage(rows[:limit], row_cursor(last, sort_columns))
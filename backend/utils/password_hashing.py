@@ -0,0 +1,230 @@
+"""
+密码哈希策略与工作池
+
+哈希策略：
+每个哈希按 Modular Crypt Format 保存自身的算法与成本（如 $2b$12$...），策略规定新哈希使用的算法
+（PASSWORD_HASH_SCHEME）与该算法的成本（PASSWORD_HASH_BCRYPT_ROUNDS / PASSWORD_HASH_PBKDF2_ROUNDS）。算法或成本与策略不一致的旧哈希仍可校验，
+并被视为过期，登录成功后按当前策略重新哈希，调整成本无需用户重置密码。
+
+工作池：
+bcrypt 单次计算约 100-300 毫秒，在 async 接口中直接调用会阻塞事件循环，同一进程的其他请求全部停顿。
+哈希与校验提交到专用的有界线程池中执行（bcrypt 计算期间释放 GIL，线程可并行）：
+
+- 同时计算的任务数为 PASSWORD_HASH_WORKERS，另有最多 PASSWORD_HASH_MAX_QUEUE 个任务排队
+- 排队已满时立即拒绝（429），登录突发不会无限堆积、拖慢所有请求
+- 记录排队等待耗时、计算耗时、当前排队数和拒绝次数
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from passlib.context import CryptContext
+
+from utils import config
+from utils.error_handler import CustomException
+from utils.metrics import Counter, LatencyHistogram
+
+logger = logging.getLogger("app.password_hashing")
+
+# 可校验的哈希算法；不是当前策略算法的哈希视为过期
+SUPPORTED_SCHEMES = ("bcrypt", "pbkdf2_sha256")
+
+# 各算法的默认成本与允许的最低成本（bcrypt 为对数轮数，pbkdf2_sha256 为迭代次数）
+DEFAULT_ROUNDS = {"bcrypt": 12, "pbkdf2_sha256": 600000}
+MIN_ROUNDS = {"bcrypt": 10, "pbkdf2_sha256": 100000}
+
+
+class PasswordHashPolicy:
+    """
+    密码哈希策略
+    """
+
+    def __init__(self, scheme: str = "bcrypt", rounds: Optional[int] = None):
+        """
+        :param scheme: 新哈希使用的算法（SUPPORTED_SCHEMES 之一）
+        :param rounds: 成本参数（bcrypt 为以 2 为底的对数轮数，pbkdf2_sha256 为迭代次数），默认取该算法的 DEFAULT_ROUNDS
+        :raises ValueError: 算法不支持或成本低于该算法的 MIN_ROUNDS
+        """
+        if scheme not in SUPPORTED_SCHEMES:
+            raise ValueError(f"不支持的密码哈希算法: {scheme}")
+        if rounds is None:
+            rounds = DEFAULT_ROUNDS[scheme]
+        if rounds < MIN_ROUNDS[scheme]:
+            raise ValueError(f"密码哈希成本过低: {scheme} 的成本为 {rounds}，最低为 {MIN_ROUNDS[scheme]}")
+        self.scheme = scheme
+        self.rounds = rounds
+        schemes = [scheme] + [other for other in SUPPORTED_SCHEMES if other != scheme]
+        # 最小与最大成本都等于策略成本：成本高于或低于策略的哈希都会在登录时按策略重新计算
+        self.context = CryptContext(
+            schemes=schemes,
+            default=scheme,
+            deprecated=schemes[1:],
+            **{f"{scheme}__rounds": rounds, f"{scheme}__min_rounds": rounds, f"{scheme}__max_rounds": rounds}
+        )
+
+    def hash(self, password: str) -> str:
+        """
+        :param password: 明文密码
+        :return: 按当前策略生成的哈希
+        """
+        return self.context.hash(password)
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        """
+        :param password: 明文密码
+        :param hashed_password: 任意支持算法与成本的哈希
+        :return: 是否匹配
+        """
+        return self.context.verify(password, hashed_password)
+
+    def needs_update(self, hashed_password: str) -> bool:
+        """
+        :param hashed_password: 已保存的哈希
+        :return: 算法或成本与当前策略不一致时返回 True
+        """
+        try:
+            return self.context.needs_update(hashed_password)
+        except ValueError:
+            return False
+
+    def describe(self, hashed_password: str) -> Optional[Dict[str, Any]]:
+        """
+        :param hashed_password: 已保存的哈希
+        :return: {"algorithm": 算法, "cost": 成本}，无法识别时返回 None
+        """
+        scheme = self.context.identify(hashed_password)
+        if scheme is None:
+            return None
+        return {"algorithm": scheme, "cost": self.context.handler(scheme).from_string(hashed_password).rounds}
+
+
+class PasswordHashingMetrics:
+    """
+    密码哈希工作池指标
+    """
+
+    def __init__(self):
+        self.wait_latency = LatencyHistogram()
+        self.hash_latency = LatencyHistogram()
+        self.completed = Counter()
+        self.rejected = Counter()
+        self.rehashed = Counter()
+        self.rehash_failures = Counter()
+
+    def reset(self) -> None:
+        """
+        清空统计数据
+        """
+        for metric in vars(self).values():
+            metric.reset()
+
+
+class PasswordHashingPool:
+    """
+    有界的密码哈希线程池
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        """
+        :param workers: 工作线程数（同时计算的哈希数）
+        :param max_queue: 最多排队等待的任务数，超出时拒绝
+        """
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.metrics = PasswordHashingMetrics()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        # 已提交且未结束的任务数（计算中 + 排队中）
+        self._pending = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        当前排队等待的任务数
+        """
+        return max(0, self._pending - self.workers)
+
+    def _release(self, future: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, func: Callable[..., Any], *args) -> Any:
+        """
+        在工作池中执行哈希计算
+        :param func: 同步的哈希或校验函数
+        :param args: 函数参数
+        :return: 函数返回值
+        :raises CustomException: 排队已满时抛出 429
+        """
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self.metrics.rejected.inc()
+                raise CustomException(
+                    status_code=429,
+                    message="请求过多，请稍后重试",
+                    error_type="TooManyRequests"
+                )
+            self._pending += 1
+
+        submitted_at = time.perf_counter()
+
+        def task():
+            started_at = time.perf_counter()
+            self.metrics.wait_latency.observe(started_at - submitted_at)
+            try:
+                return func(*args)
+            finally:
+                self.metrics.hash_latency.observe(time.perf_counter() - started_at)
+                self.metrics.completed.inc()
+
+        try:
+            future = self._executor.submit(task)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        # 任务结束或在开始前被取消时释放名额
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        """
+        关闭工作池，等待进行中的任务结束
+        应用关闭时调用
+        """
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取工作池状态
+        :return: 配置、当前计算中/排队中的任务数及耗时分布
+        """
+        pending = self._pending
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "running": min(pending, self.workers),
+            "queue_depth": max(0, pending - self.workers),
+            "completed": self.metrics.completed.value,
+            "rejected": self.metrics.rejected.value,
+            "rehashed": self.metrics.rehashed.value,
+            "rehash_failures": self.metrics.rehash_failures.value,
+            "wait_latency": self.metrics.wait_latency.snapshot(),
+            "hash_latency": self.metrics.hash_latency.snapshot(),
+        }
+
+
+# 全局密码哈希策略
+password_policy = PasswordHashPolicy(
+    config.PASSWORD_HASH_SCHEME,
+    {
+        "bcrypt": config.PASSWORD_HASH_BCRYPT_ROUNDS,
+        "pbkdf2_sha256": config.PASSWORD_HASH_PBKDF2_ROUNDS,
+    }.get(config.PASSWORD_HASH_SCHEME)
+)
+
+# 全局密码哈希工作池
+password_hashing_pool = PasswordHashingPool(config.PASSWORD_HASH_WORKERS, config.PASSWORD_HASH_MAX_QUEUE)
@@ -1,4 +1,5 @@
 from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
 import jwt
 import os
 from fastapi import Depends, HTTPException
@@ -6,8 +7,11 @@ from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 
 from models import User
+from utils import config
+from utils.cache import cached
 from utils.database import get_db
 from utils.error_handler import log_error, CustomException
+from utils.metrics import Counter
 
 # 从环境变量中获取JWT配置
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key")
@@ -60,12 +64,77 @@ def verify_token(token: str, credentials_exception: HTTPException) -> dict:
         log_error("JWTTokenVerificationError", f"验证JWT令牌失败: {str(e)}")
         raise credentials_exception
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+class Principal:
+    """
+    已认证用户
+    与 User 字段一致的只读对象，脱离数据库会话使用，可在多个请求间共享
+    """
+
+    __slots__ = ("id", "username", "email", "password_hash", "is_active", "created_at", "updated_at")
+
+    def __init__(self, user: User):
+        self.id = user.id
+        self.username = user.username
+        self.email = user.email
+        self.password_hash = user.password_hash
+        self.is_active = user.is_active
+        self.created_at = user.created_at
+        self.updated_at = user.updated_at
+
+    def __repr__(self) -> str:
+        return f"<Principal id={self.id} username={self.username}>"
+
+
+class PrincipalCacheMetrics:
+    """
+    认证用户缓存指标
+    """
+
+    def __init__(self):
+        self.lookups = Counter()
+        self.loads = Counter()
+        self.invalidations = Counter()
+
+    def reset(self) -> None:
+        for counter in vars(self).values():
+            counter.reset()
+
+    def snapshot(self) -> Dict[str, Any]:
+        data = {name: counter.value for name, counter in vars(self).items()}
+        data["hits"] = data["lookups"] - data["loads"]
+        data["hit_rate"] = round(data["hits"] / data["lookups"], 4) if data["lookups"] else 0.0
+        return data
+
+
+principal_cache_metrics = PrincipalCacheMetrics()
+
+
+@cached("principal", ttl=config.PRINCIPAL_CACHE_TTL, key_builder=lambda db, username: username, local_only=True)
+async def _load_principal(db: Session, username: str) -> Optional[Principal]:
+    principal_cache_metrics.loads.inc()
+    user = db.query(User).filter(User.username == username).first()
+    return Principal(user) if user is not None else None
+
+
+async def invalidate_principal(*usernames: str) -> None:
+    """
+    失效认证用户缓存
+    用户被创建、删除或状态、密码、用户名等变更后调用，其他进程经缓存模块的失效通知同步清除
+    :param usernames: 用户名（令牌主体）
+    """
+    for username in set(usernames):
+        if username:
+            principal_cache_metrics.invalidations.inc()
+            await _load_principal.invalidate(None, username)
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
     """
     获取当前认证的用户
+    按令牌主体缓存 PRINCIPAL_CACHE_TTL 秒，命中时不查询数据库
     :param token: JWT令牌
-    :param db: 数据库会话
-    :return: 用户对象
+    :param db: 数据库会话（仅缓存未命中时使用）
+    :return: 已认证用户
     """
     credentials_exception = HTTPException(
         status_code=401,
@@ -81,7 +150,8 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
-        user = db.query(User).filter(User.username == username).first()
+        principal_cache_metrics.lookups.inc()
+        user = await _load_principal(db, username)
         if user is None:
             raise credentials_exception
         return user
@@ -91,7 +161,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         log_error("GetCurrentUserError", f"获取当前用户失败: {str(e)}")
         raise credentials_exception
 
-async def get_current_admin_user(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_admin_user(current_user: Principal = Depends(get_current_user)) -> Principal:
     """
     获取当前认证的管理员用户
     :param current_user: 当前认证的用户